@@ -0,0 +1,20 @@
+"""Бенчмарк пакетного бэктеста Supertrend по многим тикерам: python -m benchmarks.bench_batch"""
+from strategies.batch import backtest_supertrend_batch
+from strategies.supertrend import SupertrendStrategy
+from benchmarks.common import make_ohlc, measure, report
+
+
+def main():
+    # 200 тикеров по ~квартал 5-минутных баров
+    datasets = {f"T{i:03d}": make_ohlc(60 * 78, seed=i, freq='5min') for i in range(200)}
+    bars = sum(len(df) for df in datasets.values())
+
+    seconds = measure(lambda: [SupertrendStrategy(df, 1000).backtest() for df in datasets.values()], repeat=1)
+    report("supertrend per-ticker backtest", bars, seconds)
+
+    seconds = measure(lambda: backtest_supertrend_batch(datasets, 1000), repeat=1)
+    report("supertrend batch backtest", bars, seconds)
+
+
+if __name__ == "__main__":
+    main()
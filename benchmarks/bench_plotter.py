@@ -0,0 +1,64 @@
+"""Бенчмарк построения графиков: полный ряд со встроенным plotly.js против прореженного с общим plotly.min.js.
+
+Запуск: python -m benchmarks.bench_plotter
+"""
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from utils.plotter import plot_ticker_trades
+from benchmarks.common import make_ohlc
+
+
+def make_trades(data, count=200, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(data), count, replace=False))
+    return pd.DataFrame({
+        'Date': data.index[rows],
+        'Trade Type': np.where(np.arange(count) % 4 < 2, 'Long', 'Short'),
+        'Action': np.where(np.arange(count) % 2 == 0, 'Open', 'Close'),
+        'Price': data['close'].to_numpy()[rows],
+        'Ticker': 'AAPL',
+    })
+
+
+def plot_full(data, trades, output_file):
+    """Прежний способ: все бары в go.Scatter, plotly.js встроен в файл"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=data.index, y=data['close'], name='AAPL', line=dict(color='blue')))
+    for (trade_type, action), group in trades.groupby(['Trade Type', 'Action']):
+        fig.add_trace(go.Scatter(x=group['Date'], y=group['Price'], mode='markers', name=f'{trade_type} {action}'))
+    pio.write_html(fig, file=output_file, auto_open=False)
+
+
+def main():
+    datasets = {
+        '1m (7 дней)': make_ohlc(7 * 390, freq='1min'),
+        '1m (год)': make_ohlc(252 * 390, freq='1min'),
+        '1d (40 лет)': make_ohlc(40 * 252, freq='1D'),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name, data in datasets.items():
+            trades = make_trades(data)
+            before = os.path.join(directory, 'before.html')
+            after = os.path.join(directory, 'after.html')
+
+            start = time.perf_counter()
+            plot_full(data, trades, before)
+            before_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            plot_ticker_trades(('AAPL', data, trades, '1m', after))
+            after_seconds = time.perf_counter() - start
+
+            shared = os.path.join(directory, 'plotly.min.js')
+            shared_size = os.path.getsize(shared) if os.path.exists(shared) else 0
+            print(f"{name:<14} {len(data):>8} bars  before {os.path.getsize(before) / 1024 ** 2:>7.2f} MB {before_seconds:>6.2f} s  "
+                  f"after {os.path.getsize(after) / 1024 ** 2:>7.2f} MB {after_seconds:>6.2f} s "
+                  f"(+ общий plotly.min.js {shared_size / 1024 ** 2:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Бенчмарк движка симуляции торговли: python -m benchmarks.bench_simulator"""
+from strategies.ledger import PositionLedger
+from strategies.supertrend import SupertrendStrategy
+from strategies.trade_log import TradeLog
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from benchmarks.common import make_ohlc, measure, report
+
+
+def main():
+    # Год минутных баров (~252 торговых дня по 390 минут)
+    df = make_ohlc(252 * 390)
+    for strategy_class in (SupertrendStrategy, TrendlinesWithBreaksStrategy):
+        strategy = strategy_class(df.copy(), 1000)
+        signals = strategy.generate_signals()
+
+        def run():
+            strategy.trades = TradeLog()
+            strategy.ledger = PositionLedger(strategy.initial_balance)
+            strategy.simulate_trading(signals)
+
+        seconds = measure(run)
+        report(f"{strategy_class.__name__} ({len(signals)} signals)", len(df), seconds)
+
+
+if __name__ == "__main__":
+    main()
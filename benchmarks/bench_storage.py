@@ -0,0 +1,41 @@
+"""Бенчмарк загрузки исторических данных из разных форматов: python -m benchmarks.bench_storage"""
+import importlib.util
+import os
+import tempfile
+import pandas as pd
+from utils.storage import STORAGE_BACKENDS, get_storage, normalize_data
+from benchmarks.common import make_ohlc, measure
+
+
+def write_yfinance_csv(path, data):
+    """CSV в формате yfinance: двухуровневый заголовок и колонки с заглавной буквы"""
+    data = data.rename(columns=str.title)
+    data.columns = pd.MultiIndex.from_product([data.columns, ['AAPL']], names=['Price', 'Ticker'])
+    data.index.name = 'Date'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data.to_csv(path)
+
+
+def main():
+    datasets = {
+        '1m': make_ohlc(7 * 390, freq='1min'),  # 7 дней минутных баров, как в INTERVALS
+        '1m_year': make_ohlc(252 * 390, freq='1min'),
+        '1d': make_ohlc(40 * 252, freq='1D'),  # ~40 лет дневных баров
+    }
+    formats = [name for name in STORAGE_BACKENDS if name in ('csv', 'npy') or importlib.util.find_spec('pyarrow')]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for interval, data in datasets.items():
+            csv_storage = get_storage('csv', directory)
+            write_yfinance_csv(csv_storage.path('AAPL', interval), data)
+            normalized = normalize_data(data)
+            for name in formats:
+                storage = get_storage(name, directory)
+                if name != 'csv':
+                    storage.write('AAPL', interval, normalized)
+                seconds = measure(lambda: storage.read('AAPL', interval), repeat=5)
+                print(f"{interval:<8} {name:<8} {len(data):>8} rows {seconds * 1000:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Бенчмарк рекурсии полос Supertrend: python -m benchmarks.bench_supertrend"""
+import strategies.supertrend as supertrend_module
+from strategies.supertrend import supertrend
+from benchmarks.common import make_ohlc, measure, report
+
+
+def main():
+    # Год минутных баров (~252 торговых дня по 390 минут)
+    df = make_ohlc(252 * 390)
+    njit = supertrend_module.njit
+
+    if njit is not None:
+        supertrend(df.copy())  # прогрев JIT-компиляции
+        report("supertrend (numba)", len(df), measure(lambda: supertrend(df.copy())))
+
+    supertrend_module.njit = None
+    try:
+        report("supertrend (python/numpy)", len(df), measure(lambda: supertrend(df.copy())))
+    finally:
+        supertrend_module.njit = njit
+
+
+if __name__ == "__main__":
+    main()
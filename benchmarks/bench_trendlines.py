@@ -0,0 +1,14 @@
+"""Бенчмарк генерации сигналов Trendlines with Breaks: python -m benchmarks.bench_trendlines"""
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from benchmarks.common import make_ohlc, measure, report
+
+
+def main():
+    # Год минутных баров (~252 торговых дня по 390 минут)
+    df = make_ohlc(252 * 390)
+    seconds = measure(lambda: TrendlinesWithBreaksStrategy(df.copy(), 1000).generate_signals())
+    report("trendlines generate_signals", len(df), seconds)
+
+
+if __name__ == "__main__":
+    main()
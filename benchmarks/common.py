@@ -0,0 +1,29 @@
+import time
+import numpy as np
+import pandas as pd
+
+
+def make_ohlc(n, seed=0, freq='1min'):
+    """Синтетические OHLCV данные для бенчмарков."""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    open_ = close + rng.normal(0, 0.05, n)
+    high = np.maximum(open_, close) + rng.uniform(0, 0.1, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 0.1, n)
+    volume = rng.integers(1_000, 100_000, n).astype(float)
+    index = pd.date_range('2024-01-02 09:30', periods=n, freq=freq, tz='UTC')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+
+def measure(func, repeat=3):
+    """Возвращает лучшее время выполнения func() в секундах."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name, bars, seconds):
+    print(f"{name:<40} {bars:>10} bars {seconds * 1000:>10.2f} ms {bars / seconds:>14,.0f} bars/s")
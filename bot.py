@@ -1,53 +1,76 @@
-import importlib
-from config.config import TICKERS, INTERVALS, INITIAL_BALANCE, WHOLE_SHARES_ONLY
-from utils.data_loader import download_all_data, load_data
-from utils.logger import setup_logging
+from config.config import TICKERS, INTERVALS, MAX_WORKERS, PORTFOLIO_BACKTEST, OFFLINE_MODE
+from utils.company_info import company_info_cache
+from utils.data_cache import data_cache
+from utils.data_loader import download_all_data
+from utils.logger import setup_logging, stop_logging
 from utils.plotter import save_plot_as_html, load_stock_data, create_price_plots
-from utils.results_saver import save_trade_results, save_summary_results
+from utils.profiler import profiler
+from utils.results_saver import save_trade_results, save_summary_results, save_portfolio_results
+from utils.runner import STRATEGIES, make_jobs, run_backtests, run_portfolio_backtest
 import logging
 import os
+import time
 import pandas as pd
 
 def main():
     log_file = 'logs/bot.log'
     setup_logging(log_file)
     logger = logging.getLogger(__name__)
+    started_at = time.time()
+    start, start_cpu = time.perf_counter(), time.process_time()
 
-    logger.info("Starting data download...")
-    download_all_data()
-    logger.info("Data download completed.")
-
-    strategies = {
-        "supertrend": "SupertrendStrategy",
-        "trendlines_with_breaks": "TrendlinesWithBreaksStrategy"
-    }
-
-    for strategy_name, strategy_class_name in strategies.items():
-        for interval in INTERVALS:
-            all_results = []
-
-            for ticker in TICKERS:
-                data = load_data(ticker, interval)
-                if data is None or data.empty:
-                    logger.warning(f"No data for {ticker} with interval {interval}, skipping...")
-                    continue
-
-                logger.info(f"Running backtest for {strategy_class_name} on {ticker} with interval {interval}...")
-                module = importlib.import_module(f'strategies.{strategy_name}')
-                strategy_class = getattr(module, strategy_class_name)
-                strategy = strategy_class(data, INITIAL_BALANCE, WHOLE_SHARES_ONLY)
-                results = strategy.backtest()
-                logger.info(f"Results for {strategy_class_name} on {ticker} with interval {interval}: {results}")
-                save_trade_results(strategy_name, ticker, interval, results)
-                
-                all_results.append((ticker, results))
-
-            save_summary_results(all_results, strategy_name, interval)
-
-            stock_data = load_stock_data(TICKERS, 'data/historical_data', interval)
-            trades_df = pd.concat([pd.DataFrame(result['trades']) for _, result in all_results], ignore_index=True)
-            trades_df['Ticker'] = [ticker for ticker, result in all_results for _ in result['trades']]
-            create_price_plots(stock_data, trades_df, strategy_name, interval)
+    if OFFLINE_MODE:
+        logger.info("Offline mode: using saved data and company info only.")
+    else:
+        logger.info("Starting data download...")
+        with profiler.stage('download'):
+            download_all_data()
+        logger.info("Data download completed.")
+        # Сведения о компаниях загружаются один раз за запуск, отчеты читают их из кэша
+        with profiler.stage('company_info'):
+            company_info_cache.prefetch(TICKERS)
+
+    jobs = make_jobs(STRATEGIES, INTERVALS, TICKERS)
+    job_results = run_backtests(jobs, max_workers=MAX_WORKERS)
+
+    # Результаты группируются по (стратегия, интервал) в порядке задач
+    grouped_results = {}
+    for (strategy_name, interval, ticker), results, _ in job_results:
+        all_results = grouped_results.setdefault((strategy_name, interval), [])
+        if results is None:
+            continue
+        # Полный словарь results содержит журнал сделок и кривую стоимости, в лог пишутся только итоги
+        metrics = results['metrics']
+        logger.info("Results for %s on %s with interval %s: final value %.2f, return %.2f%%, %d trades, sharpe %.2f, max drawdown %.2f%%",
+                    STRATEGIES[strategy_name], ticker, interval, metrics['final_value'], metrics['return_pct'],
+                    metrics['num_trades'], metrics['sharpe'], metrics['max_drawdown_pct'])
+        with profiler.stage('save_trades', strategy=strategy_name, ticker=ticker, interval=interval):
+            save_trade_results(strategy_name, ticker, interval, results)
+        all_results.append((ticker, results))
+
+    for (strategy_name, interval), all_results in grouped_results.items():
+        with profiler.context(strategy=strategy_name, interval=interval):
+            with profiler.stage('summary'):
+                save_summary_results(all_results, strategy_name, interval)
+
+            with profiler.stage('plots'):
+                stock_data = load_stock_data(TICKERS, 'data/historical_data', interval)
+                trades_df = pd.concat([result['trades'].assign(Ticker=ticker) for ticker, result in all_results], ignore_index=True)
+                create_price_plots(stock_data, trades_df, strategy_name, interval)
+
+            if PORTFOLIO_BACKTEST:
+                with profiler.stage('portfolio'):
+                    portfolio = run_portfolio_backtest(strategy_name, interval, TICKERS)
+                    if portfolio is not None:
+                        save_portfolio_results(portfolio, strategy_name, interval)
+
+    data_cache.log_stats()
+
+    # Этапы бэктестов выполняются в процессах пула, их время суммируется и может превышать общее время запуска
+    profiler.save_report(started_at=started_at, total_wall_s=time.perf_counter() - start,
+                         total_cpu_s=time.process_time() - start_cpu, max_workers=MAX_WORKERS, jobs=len(jobs))
+    print(profiler.table())
+    stop_logging()
 
 if __name__ == "__main__":
     main()
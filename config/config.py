@@ -14,6 +14,32 @@ INTERVALS = {
 # Общие параметры
 INITIAL_BALANCE = 1000 # Начальный баланс в долларах
 WHOLE_SHARES_ONLY = True # Только целые акции (True) или доли акций (False)
+BATCH_BACKTESTS = False # Пакетный бэктест Supertrend сразу по всем тикерам интервала (результаты совпадают с обычным режимом)
+PORTFOLIO_BACKTEST = False # Дополнительно запускать бэктест портфеля с общим балансом по всем тикерам
+PORTFOLIO_POSITION_SIZE = 0.1 # Доля стоимости портфеля на одну позицию (не больше свободных денег)
+INTRABAR_EXITS = False # Проверять тейк-профит и стоп-лосс внутри каждого бара по high/low (False - только по close на барах с сигналами)
+INTRABAR_FILL = 'level' # Цена выхода внутри бара: 'level' (по уровню, стоп-лосс при гэпе - по цене открытия, при касании обоих уровней первым считается стоп-лосс), 'close' (по закрытию бара)
+MAX_WORKERS = None # Количество процессов для бэктестов (None - все ядра, 1 - последовательно)
+LOG_LEVEL = 'INFO' # Уровень логирования: 'DEBUG', 'INFO', 'WARNING', 'ERROR'
+LOG_TRADES = False # Подробный режим: писать в лог каждую сделку, включая выходы по тейк-профиту/стоп-лоссу (замедляет большие переборы)
+PROFILE_MEMORY = False # Пиковая память каждого этапа в отчете запуска через tracemalloc (заметно замедляет расчеты)
+PROFILE_JOB = None # Задача для cProfile, например ('supertrend', '1h', 'AAPL'): статистика в logs/profile_*.prof и .prof.txt
+DATA_STORAGE_FORMAT = 'npy' # Формат хранения исторических данных: 'csv', 'parquet', 'feather' (нужен pyarrow), 'npy'
+DATA_SYNC_MODE = 'incremental' # Опции: 'missing' (скачивать только отсутствующие файлы), 'incremental' (докачивать новые бары)
+RESAMPLE_INTERVALS = True # Строить 15m и 30m из 5m, 1wk и 1mo из 1d вместо отдельного скачивания
+DOWNLOAD_WORKERS = 4 # Количество потоков для скачивания данных
+DOWNLOAD_BATCH_SIZE = 11 # Количество тикеров в одном запросе
+DOWNLOAD_RETRIES = 3 # Количество повторов запроса при ошибке
+DOWNLOAD_BACKOFF = 1.0 # Начальная задержка между повторами в секундах (удваивается с каждой попыткой)
+OFFLINE_MODE = False # Работать без сети: не скачивать данные и сведения о компаниях, использовать только сохраненные
+COMPANY_INFO_TTL_DAYS = 30 # Срок хранения сведений о компаниях (название, страна, биржа) в кэше на диске, в днях
+DATA_CACHE_MAX_MB = 1024 # Объем памяти для кэша загруженных данных в каждом процессе (МБ)
+INDICATOR_CACHE_MAX_MB = 256 # Объем памяти для кэша индикаторов в каждом процессе (МБ)
+INDICATOR_CACHE_DIRECTORY = None # Каталог для кэша индикаторов на диске (например, 'data/indicator_cache'), None - только в памяти
+FEATURES_FLOAT32 = False # Хранить индикаторы стратегий в float32 (меньше памяти, возможны отличия в сигналах на границах)
+PLOT_MAX_POINTS = 4000 # Максимум точек линии цены на графике (прореживание min/max с сохранением баров сделок), 0 - все бары
+PLOT_PLOTLYJS = 'directory' # Подключение plotly.js: 'directory' (один plotly.min.js рядом с графиками), 'cdn', True (встроить в каждый файл)
+PLOT_WORKERS = 1 # Количество процессов для построения графиков (1 - последовательно)
 
 # Параметры для стратегии Supertrend
 BOLLINGER_PERIOD = 20 # Период для расчета Bollinger Bands
@@ -27,6 +53,24 @@ SUPER_TREND_STOP_LOSS_PERCENT = 0.10 # 10% Stop Loss
 TRENDLINES_LENGTH = 18 # Длина для расчета пиков и впадин
 TRENDLINES_MULTIPLIER = 1.0 # Множитель для расчета наклона
 TRENDLINES_CALC_METHOD = 'Atr'  # Опции: 'Atr', 'Stdev', 'Linreg'
+TRENDLINES_SLOPE_MODE = 'compat'  # Опции: 'compat' (наклон по последнему бару истории, как раньше), 'point_in_time' (наклон на баре пика, без заглядывания в будущее)
 TRENDLINES_BACKPAINT = True # Раскрашивать ли линии в прошлом
 TRENDLINES_TRAIL_PERCENT_TP = 5.0  # 5% Take Profit
-TRENDLINES_TRAIL_PERCENT_SL = 3.0  # 3% Stop Loss
\ No newline at end of file
+TRENDLINES_TRAIL_PERCENT_SL = 3.0  # 3% Stop Loss
+
+# Перебор параметров (python -m utils.sweep): значения для каждого параметра стратегии,
+# не указанные параметры берутся из настроек выше
+SWEEP_GRIDS = {
+    "supertrend": {
+        "supertrend_period": [7, 10, 14],
+        "atr_multiplier": [2, 3, 4],
+        "take_profit_percent": [0.10, 0.20],
+        "stop_loss_percent": [0.05, 0.10]
+    },
+    "trendlines_with_breaks": {
+        "length": [10, 14, 18],
+        "mult": [0.5, 1.0],
+        "trail_percent_tp": [3.0, 5.0],
+        "trail_percent_sl": [2.0, 3.0]
+    }
+}
@@ -1,104 +1,168 @@
 import logging
+from contextlib import nullcontext
 import pandas as pd
+from config.config import FEATURES_FLOAT32, INTRABAR_EXITS, INTRABAR_FILL, LOG_TRADES
+from .features import FeatureStore
+from .signals import Signals
+from .ledger import PositionLedger, DIRECTIONS
+from .metrics import trades_equity
+from .simulator import simulate, BASE_RULES
+from .trade_log import TradeLog
 
 class BaseStrategy:
-    def __init__(self, data, initial_balance, whole_shares_only=True):
+    def __init__(self, data, initial_balance, whole_shares_only=True, params=None):
         self.data = data
         self.initial_balance = initial_balance
-        self.balance = initial_balance
         self.whole_shares_only = whole_shares_only
-        self.position = 0  # Количество акций в текущей позиции
-        self.position_type = None  # Тип позиции: Long или Short
-        self.trades = []  # Список сделок
+        self.params = self.resolve_params(params)  # Параметры стратегии (значения из config по умолчанию)
+        self.ledger = PositionLedger(initial_balance)  # Баланс, позиция и накопленная прибыль
+        self.trades = TradeLog()  # Журнал сделок
+        self.features = FeatureStore(data.index, float32=FEATURES_FLOAT32)  # Производные ряды (индикаторы)
+        self.stream = None  # Состояние индикаторов пошагового режима, создается при первом update()
+        self.profiler = None  # StageProfiler на время backtest(), для этапа indicators в generate_signals()
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.log_trades = LOG_TRADES  # Подробный журнал: запись в лог каждой сделки и каждого срабатывания уровней
+
+    @classmethod
+    def default_params(cls):
+        """Параметры стратегии по умолчанию. Переопределяется в стратегиях, значения берутся из config"""
+        return {}
+
+    @classmethod
+    def resolve_params(cls, params=None):
+        """Параметры по умолчанию, дополненные переданными. Неизвестные имена параметров - ошибка"""
+        resolved = cls.default_params()
+        unknown = set(params or {}) - set(resolved)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры для {cls.__name__}: {', '.join(sorted(unknown))}")
+        resolved.update(params or {})
+        return resolved
+
+    @property
+    def balance(self):
+        return self.ledger.balance
+
+    @property
+    def position(self):
+        """Количество акций в текущей позиции (отрицательное для Short)"""
+        return self.ledger.position
+
+    @property
+    def position_type(self):
+        """Тип позиции: Long, Short или None"""
+        return self.ledger.position_type
+
+    @property
+    def results(self):
+        """Текущие результаты по данным учета позиции, без пересчета журнала сделок"""
+        last_price = self.data['close'].iloc[-1]
+        return {
+            "initial_balance": self.initial_balance,
+            "final_value": self.ledger.market_value(last_price),
+            "realized_pnl": self.ledger.realized_pnl,
+            "unrealized_pnl": self.ledger.unrealized_pnl(last_price),
+            "trades": self.trades.to_frame()
+        }
+
+    def stage(self, name, **keys):
+        """Этап замера profiler, переданного в backtest(), или пустой контекст, если замер не включен"""
+        return self.profiler.stage(name, **keys) if self.profiler is not None else nullcontext({})
 
     def generate_signals(self):
         raise NotImplementedError("Should implement generate_signals()")
 
-    def backtest(self):
+    def update(self, bar):
+        """Пошаговый режим: обрабатывает один новый бар и возвращает сигнал ('buy', 'sell') или None.
+
+        bar - словарь или Series с ценами бара (high, low, close). Состояние индикаторов хранится
+        в self.stream и обновляется за O(1), без пересчета всей истории. Сигналы совпадают
+        с generate_signals() на той же последовательности баров.
+        """
+        raise NotImplementedError("Should implement update()")
+
+    def backtest(self, profiler=None):
+        """Бэктест на всех данных: сигналы, симуляция сделок и стоимость счета на каждом баре.
+
+        profiler - StageProfiler (utils.profiler) для замера этапов indicators, signals и simulation.
+        Этап indicators - построение всех рядов стратегии в generate_signals(), signals - остальная генерация сигналов.
+        """
         self.logger.info("Starting backtest...")
-        signals = self.generate_signals()
-        results = self.simulate_trading(signals)
+        self.profiler = profiler
+        try:
+            # Время этапа indicators внутри generate_signals() не входит в signals
+            with self.stage('signals', exclusive=True):
+                signals = self.generate_signals()
+            with self.stage('simulation'):
+                results = self.simulate_trading(signals)
+                # Стоимость счета на каждом баре для расчета показателей (strategies.metrics)
+                results["equity"] = trades_equity(self.data.index, self.data['close'].to_numpy(), results["trades"], self.initial_balance)
+        finally:
+            self.profiler = None
+        results["memory"] = {
+            "data_bytes": int(self.data.memory_usage(index=True).sum()),
+            "feature_bytes": self.features.nbytes
+        }
+        self.logger.info("Backtest memory: data %.2f MB, features %.2f MB in %d series",
+                         results['memory']['data_bytes'] / 1024 ** 2, results['memory']['feature_bytes'] / 1024 ** 2, len(self.features))
         self.logger.info("Backtest completed.")
         return results
 
     def record_trade(self, timestamp, trade_type, action, shares, price, profit, balance):
         """Записывает сделку в журнал"""
-        trade = {
-            'Date': timestamp.strftime('%d.%m.%Y %H:%M:%S%z'),
-            'Trade Type': trade_type,
-            'Action': action,
-            'Shares': shares,
-            'Price': price,
-            'Profit': profit,
-            'Balance': balance
-        }
-        self.trades.append(trade)
-        self.logger.info(f"{action} {shares} shares at {price} on {timestamp} as {trade_type} with profit {profit} and balance {balance}")
+        self.trades.append(timestamp, trade_type, action, shares, price, profit, balance)
+        if self.log_trades:
+            self.logger.info("%s %s shares at %s on %s as %s with profit %s and balance %s",
+                             action, shares, price, timestamp, trade_type, profit, balance)
     
     def simulate_trading(self, signals):
         """Запускает симуляцию торговли на основе сгенерированных сигналов"""
         self.logger.info("Starting trade simulation...")
-        for timestamp, signal in signals:
-            price = self.data.loc[timestamp, 'close']
-            if signal == 'buy':
-                self.open_position(price, timestamp, 'Long')
-            elif signal == 'sell':
-                self.close_position(price, timestamp, 'Long')
-            elif signal == 'short':
-                self.open_position(price, timestamp, 'Short')
-            elif signal == 'cover':
-                self.close_position(price, timestamp, 'Short')
-            self.apply_stop_loss_and_take_profit(price, timestamp)
-
-        # Закрытие всех открытых позиций в конце периода
-        if self.position != 0:
-            self.logger.info("Closing open position at the end of the period...")
-            self.close_position(self.data.iloc[-1]['close'], self.data.index[-1], self.position_type)
-
-        results = {
-            "initial_balance": self.initial_balance,
-            "final_value": self.balance + self.position * self.data.iloc[-1]['close'] * (1 if self.position_type == 'Long' else -1),
-            "trades": self.trades
-        }
-
+        results = self.run_simulation(signals, **self.simulation_params())
         self.logger.info("Trade simulation completed.")
         return results
 
+    def simulation_params(self):
+        """Правила обработки сигналов и уровни выхода для движка симуляции (simulate, simulate_portfolio)"""
+        return {"rules": BASE_RULES, "take_profit": None, "stop_loss": None, "signal_sets_entry": False}
+
+    def run_simulation(self, signals, rules, take_profit=None, stop_loss=None, signal_sets_entry=False):
+        """Запускает общий движок симуляции с правилами и уровнями стратегии"""
+        signals = Signals.from_list(self.data.index, signals)
+        index = self.data.index
+
+        def record(pos, trade_type, action, shares, price, profit, balance):
+            self.record_trade(index[pos], trade_type, action, shares, price, profit, balance)
+
+        # Проверка уровней внутри бара по high/low (INTRABAR_EXITS), иначе только по close на барах с сигналами
+        intrabar = {}
+        if INTRABAR_EXITS:
+            intrabar = {"high": self.data['high'].to_numpy(), "low": self.data['low'].to_numpy(), "intrabar_fill": INTRABAR_FILL}
+            if 'open' in self.data.columns:
+                # Стоп-лосс на баре с гэпом исполняется по цене открытия
+                intrabar["open_"] = self.data['open'].to_numpy()
+        simulate(self.data['close'].to_numpy(), signals, self.ledger, record, rules=rules,
+                 whole_shares_only=self.whole_shares_only, take_profit=take_profit,
+                 stop_loss=stop_loss, signal_sets_entry=signal_sets_entry, **intrabar)
+        return self.results
+
     def open_position(self, price, timestamp, trade_type):
-        """Открывает новую позицию"""
-        if self.position_type == trade_type:
-            self.logger.info(f"Already in a {trade_type} position, ignoring open signal.")
+        """Открывает новую позицию. При уже открытой позиции любого направления сигнал игнорируется, как в simulate()"""
+        if self.ledger.direction != 0:
+            if self.log_trades:
+                self.logger.info("Already in a %s position, ignoring open signal.", self.position_type)
             return
-        
+
         shares_to_trade = self.balance // price if self.whole_shares_only else self.balance / price
         if shares_to_trade > 0:
-            cost = shares_to_trade * price
-            if trade_type == 'Long':
-                self.position += shares_to_trade
-                self.balance -= cost
-            else:  # Short
-                self.position -= shares_to_trade
-                self.balance += cost
+            self.ledger.open(DIRECTIONS[trade_type], shares_to_trade, price)
             self.record_trade(timestamp, trade_type, 'Open', shares_to_trade, price, 0.0, self.balance)
-            self.position_type = trade_type
 
     def close_position(self, price, timestamp, trade_type):
         """Закрывает существующую позицию"""
-        if self.position == 0 or self.position_type != trade_type:
-            self.logger.info(f"No {trade_type} position to close, ignoring close signal.")
+        if self.position_type != trade_type:
+            if self.log_trades:
+                self.logger.info("No %s position to close, ignoring close signal.", trade_type)
             return
-        
-        proceeds = abs(self.position) * price
-        profit = (proceeds - sum(trade['Shares'] * trade['Price'] for trade in self.trades if trade['Action'] == 'Open')) * (1 if trade_type == 'Long' else -1)
-        if trade_type == 'Long':
-            self.balance += proceeds
-        else:  # Short
-            self.balance -= proceeds
-        self.record_trade(timestamp, trade_type, 'Close', abs(self.position), price, profit, self.balance)
-        self.position = 0
-        self.position_type = None
-
-    def apply_stop_loss_and_take_profit(self, price, timestamp):
-        """Применяет стоп-лосс и тейк-профит уровни. Может быть переопределен в дочерних классах."""
-        pass  # В базовом классе этот метод не делает ничего, может быть переопределен в стратегиях
+
+        shares, profit = self.ledger.close(price)
+        self.record_trade(timestamp, trade_type, 'Close', shares, price, profit, self.balance)
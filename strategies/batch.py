@@ -0,0 +1,163 @@
+import logging
+import numpy as np
+import pandas as pd
+from .indicators import indicator
+from .metrics import bar_equity
+from .signals import BUY, SELL
+from .simulator import simulate_batch
+from .supertrend import SupertrendStrategy, SUPERTREND_RULES, bollinger_arrays
+from .trade_log import TradeLog
+
+try:
+    from numba import njit
+except ImportError:  # Numba необязательна, без нее используется цикл по барам, векторизованный по тикерам
+    njit = None
+
+logger = logging.getLogger(__name__)
+
+
+def align_left(arrays, fill=np.nan):
+    """Матрица (бары x тикеры), где ряд j занимает строки 0..len(arrays[j])-1, остальное заполнено fill.
+
+    Выравнивание по левому краю сохраняет причинность: значение на баре i каждого тикера
+    зависит только от его собственных баров 0..i, как при расчете по одному тикеру.
+    """
+    lengths = np.array([len(values) for values in arrays], dtype=np.int64)
+    matrix = np.full((lengths.max() if len(lengths) else 0, len(arrays)), fill, dtype=np.float64)
+    for j, values in enumerate(arrays):
+        matrix[:lengths[j], j] = values
+    return matrix, lengths
+
+
+def _trail_bands_2d(close, final_upperband, final_lowerband, supertrend):
+    """Рекурсия трейлинга полос Supertrend для матрицы (бары x тикеры). Изменяет массивы на месте."""
+    n, k = close.shape
+    for i in range(1, n):
+        for j in range(k):
+            if close[i, j] > final_upperband[i-1, j]:
+                supertrend[i, j] = True
+            elif close[i, j] < final_lowerband[i-1, j]:
+                supertrend[i, j] = False
+            else:
+                supertrend[i, j] = supertrend[i-1, j]
+                if supertrend[i, j] and final_lowerband[i, j] < final_lowerband[i-1, j]:
+                    final_lowerband[i, j] = final_lowerband[i-1, j]
+                if not supertrend[i, j] and final_upperband[i, j] > final_upperband[i-1, j]:
+                    final_upperband[i, j] = final_upperband[i-1, j]
+
+if njit is not None:
+    _trail_bands_2d_compiled = njit(cache=True)(_trail_bands_2d)
+
+def supertrend_bands_2d(close, final_upperband, final_lowerband):
+    """Тренд и трейлинг полос Supertrend сразу для всех тикеров матрицы.
+
+    Возвращает (supertrend, final_upperband, final_lowerband) из новых матриц. Результат по каждой
+    колонке совпадает с supertrend_bands() для этого тикера.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    upper = np.array(final_upperband, dtype=np.float64)
+    lower = np.array(final_lowerband, dtype=np.float64)
+    trend = np.ones(close.shape, dtype=np.bool_)
+    if njit is not None:
+        _trail_bands_2d_compiled(close, upper, lower, trend)
+        return trend, upper, lower
+
+    # Без Numba: цикл по барам, сравнения NaN дают False, как и в скалярной версии
+    for i in range(1, len(close)):
+        up = close[i] > upper[i-1]
+        down = ~up & (close[i] < lower[i-1])
+        keep = ~up & ~down
+        trend[i] = up | (keep & trend[i-1])
+        np.copyto(lower[i], lower[i-1], where=keep & trend[i] & (lower[i] < lower[i-1]))
+        np.copyto(upper[i], upper[i-1], where=keep & ~trend[i] & (upper[i] > upper[i-1]))
+    return trend, upper, lower
+
+
+def supertrend_signals_batch(high, low, close, lengths, params):
+    """Коды сигналов Supertrend (бары x тикеры) по выровненным матрицам цен.
+
+    talib работает только с одномерными рядами, поэтому ATR и Bollinger Bands считаются по колонкам
+    (вызовы C-функций через кэш индикаторов), а рекурсия полос и маски сигналов - сразу по матрице.
+    """
+    shape = close.shape
+    final_upperband = np.full(shape, np.nan)
+    final_lowerband = np.full(shape, np.nan)
+    upper_band = np.full(shape, np.nan)
+    lower_band = np.full(shape, np.nan)
+    for j, n in enumerate(lengths.tolist()):
+        column_high, column_low, column_close = high[:n, j], low[:n, j], close[:n, j]
+        atr = indicator('ATR', column_high, column_low, column_close, period=params['supertrend_period'])
+        hl2 = (column_high + column_low) / 2
+        final_upperband[:n, j] = hl2 + (params['atr_multiplier'] * atr)
+        final_lowerband[:n, j] = hl2 - (params['atr_multiplier'] * atr)
+        _, upper_band[:n, j], lower_band[:n, j] = bollinger_arrays(column_close, params['bollinger_period'], params['bollinger_num_std_dev'])
+
+    trend, _, _ = supertrend_bands_2d(close, final_upperband, final_lowerband)
+    in_flat = (close > lower_band) & (close < upper_band)
+    buy = trend & (close < lower_band) & ~in_flat
+    sell = ~trend & (close > upper_band) & ~in_flat & ~buy
+    codes = np.zeros(shape, dtype=np.int8)
+    codes[buy] = BUY
+    codes[sell] = SELL
+    return codes
+
+
+def backtest_supertrend_batch(datasets, initial_balance, whole_shares_only=True, params=None):
+    """Бэктест Supertrend сразу по многим тикерам.
+
+    datasets - словарь {тикер: DataFrame OHLCV}. Возвращает словарь {тикер: results} с теми же ключами
+    initial_balance, final_value, realized_pnl, unrealized_pnl, trades и equity, что и SupertrendStrategy.backtest().
+    Тикеры с недостаточным количеством данных пропускаются.
+    """
+    params = SupertrendStrategy.resolve_params(params)
+    tickers, indexes, highs, lows, closes = [], [], [], [], []
+    for ticker, data in datasets.items():
+        # То же, что prepare_data(), но без построения нового DataFrame для каждого тикера
+        columns = {column.lower(): column for column in data.columns}
+        for col in ['close', 'high', 'low']:
+            if col not in columns:
+                raise KeyError(f"DataFrame должен содержать столбец '{col}'.")
+        close = pd.to_numeric(data[columns['close']], errors='coerce').to_numpy(dtype=np.float64)
+        valid = ~np.isnan(close)
+        if valid.sum() < max(params['bollinger_period'], params['supertrend_period']):
+            logger.warning("Not enough data for Supertrend on %s, skipping...", ticker)
+            continue
+        tickers.append(ticker)
+        indexes.append(data.index[valid])
+        closes.append(close[valid])
+        highs.append(np.asarray(data[columns['high']].to_numpy(dtype=np.float64)[valid]))
+        lows.append(np.asarray(data[columns['low']].to_numpy(dtype=np.float64)[valid]))
+    if not tickers:
+        return {}
+
+    high, _ = align_left(highs)
+    low, _ = align_left(lows)
+    close, lengths = align_left(closes)
+
+    codes = supertrend_signals_batch(high, low, close, lengths, params)
+    simulation = simulate_batch(close, codes, lengths, initial_balance, SUPERTREND_RULES, whole_shares_only,
+                                take_profit=params['take_profit_percent'], stop_loss=params['stop_loss_percent'],
+                                signal_sets_entry=True)
+
+    trades = simulation['trades']
+    bounds = np.searchsorted(trades['column'], np.arange(len(tickers) + 1))
+    results = {}
+    for j, ticker in enumerate(tickers):
+        index = indexes[j]
+        part = slice(bounds[j], bounds[j + 1])
+        rows = trades['row'][part]
+        log = TradeLog.from_columns(index.as_unit('ns').asi8[rows], index.tz if len(rows) else None, trades['trade_type'][part],
+                                    trades['action'][part], trades['shares'][part], trades['price'][part],
+                                    trades['profit'][part], trades['balance'][part])
+        balance = float(simulation['balance'][j])
+        results[ticker] = {
+            "initial_balance": initial_balance,
+            "final_value": balance,
+            "realized_pnl": float(simulation['realized_pnl'][j]),
+            "unrealized_pnl": 0.0,
+            "trades": log.to_frame(),
+            "equity": pd.Series(bar_equity(closes[j], rows, trades['trade_type'][part], trades['action'][part],
+                                           trades['shares'][part], trades['balance'][part], initial_balance),
+                                index=index, name='Equity')
+        }
+    return results
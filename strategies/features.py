@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+
+class FeatureStore:
+    """Хранилище производных рядов стратегии (индикаторов, масок) отдельно от входных данных OHLCV.
+
+    Ряды хранятся как массивы NumPy с ключом (имя, параметры). При float32=True вещественные ряды
+    сохраняются в float32, что вдвое уменьшает память на минутных данных.
+    """
+
+    def __init__(self, index, float32=False):
+        self.index = index
+        self.float_dtype = np.float32 if float32 else np.float64
+        self._arrays = {}
+
+    @staticmethod
+    def key(name, **params):
+        return name, tuple(sorted(params.items()))
+
+    def put(self, name, values, **params):
+        """Сохраняет ряд и возвращает сохраненный массив"""
+        values = np.asarray(values)
+        if len(values) != len(self.index):
+            raise ValueError(f"Длина ряда '{name}' ({len(values)}) не совпадает с длиной данных ({len(self.index)}).")
+        if values.dtype.kind == 'f':
+            values = values.astype(self.float_dtype, copy=False)
+        self._arrays[self.key(name, **params)] = values
+        return values
+
+    def get(self, name, **params):
+        return self._arrays[self.key(name, **params)]
+
+    def __contains__(self, key):
+        return key in self._arrays
+
+    def __len__(self):
+        return len(self._arrays)
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._arrays.values())
+
+    def to_frame(self):
+        """Все ряды в виде DataFrame (для отладки и графиков). Имя колонки - имя ряда, если оно уникально"""
+        names = [name for name, _ in self._arrays]
+        columns = {}
+        for (name, params), values in self._arrays.items():
+            if names.count(name) > 1:
+                name = f"{name}[{', '.join(f'{k}={v}' for k, v in params)}]"
+            columns[name] = values
+        return pd.DataFrame(columns, index=self.index)
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import talib
+from config.config import INDICATOR_CACHE_MAX_MB, INDICATOR_CACHE_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+
+def rolling_max(values, window):
+    """Скользящий максимум за линейное время (алгоритм van Herk/Gil-Werman).
+
+    out[i] = max(values[i-window+1:i+1]), первые window-1 значений равны NaN.
+    Значения NaN во входных данных не поддерживаются, их нужно заменить заранее.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+
+    # Разбиваем ряд на блоки длины window и считаем префиксные и суффиксные максимумы в каждом блоке
+    padded = np.full(-(-n // window) * window, -np.inf)
+    padded[:n] = values
+    blocks = padded.reshape(-1, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    # Любое окно покрывает суффикс одного блока и префикс следующего
+    out[window - 1:] = np.maximum(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+
+def _pivot(values, length, sign):
+    values = sign * np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if length < 1 or n < length:
+        return out
+
+    nan_mask = np.isnan(values)
+    if length == 1:
+        is_pivot = np.ones(n, dtype=bool)
+    else:
+        # Максимум предыдущих length-1 баров, NaN заменяются на -inf и учитываются отдельно
+        previous = np.full(n, np.nan)
+        previous[1:] = rolling_max(np.where(nan_mask, -np.inf, values), length - 1)[:-1]
+        is_pivot = values > previous
+
+    nan_count = np.concatenate(([0], np.cumsum(nan_mask)))
+    window_has_nan = nan_count[length:] != nan_count[:n - length + 1]
+    out[length - 1:] = np.where(window_has_nan, np.nan, is_pivot[length - 1:])
+    return out
+
+
+def pivot_high(values, length):
+    """Пик: значение бара строго больше всех предыдущих length-1 значений окна.
+
+    Возвращает 1.0/0.0 для каждого бара и NaN там, где окно неполное или содержит NaN,
+    что совпадает с rolling(length).apply(lambda x: x.argmax() == len(x) - 1).
+    """
+    return _pivot(values, length, 1.0)
+
+
+def pivot_low(values, length):
+    """Впадина: значение бара строго меньше всех предыдущих length-1 значений окна."""
+    return _pivot(values, length, -1.0)
+
+
+# Реестр индикаторов: имя -> функция(*массивы float64, **параметры), возвращающая массив или кортеж массивов
+INDICATORS = {}
+
+def register_indicator(name):
+    def decorator(func):
+        INDICATORS[name] = func
+        return func
+    return decorator
+
+@register_indicator('ATR')
+def _atr(high, low, close, period):
+    return talib.ATR(high, low, close, timeperiod=period)
+
+@register_indicator('SMA')
+def _sma(close, period):
+    return talib.SMA(close, timeperiod=period)
+
+@register_indicator('BBANDS')
+def _bbands(close, period, num_std_dev):
+    return talib.BBANDS(close, timeperiod=period, nbdevup=num_std_dev, nbdevdn=num_std_dev, matype=0)
+
+@register_indicator('STDEV')
+def _stdev(close, period):
+    # Выборочное стандартное отклонение (ddof=1), как в pandas rolling().std()
+    return pd.Series(close).rolling(window=period).std().to_numpy()
+
+@register_indicator('PIVOT_HIGH')
+def _pivot_high(values, length):
+    return pivot_high(values, length)
+
+@register_indicator('PIVOT_LOW')
+def _pivot_low(values, length):
+    return pivot_low(values, length)
+
+def content_hash(values):
+    """Хэш содержимого массива (вместе с типом и формой)"""
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(f"{values.dtype.str}{values.shape}".encode(), digest_size=16)
+    digest.update(values.data)
+    return digest.hexdigest()
+
+class IndicatorCache:
+    """Мемоизация индикаторов по ключу (индикатор, параметры, хэши входных рядов).
+
+    Кэш в памяти ограничен по объему (LRU). Если задан directory, результаты также сохраняются
+    на диск в .npz и переиспользуются между процессами и запусками. Возвращаемые массивы
+    доступны только для чтения, так как они общие для всех вызовов.
+    """
+
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, name, inputs, params):
+        parts = [name, repr(sorted(params.items()))] + [content_hash(values) for values in inputs]
+        return hashlib.blake2b('|'.join(parts).encode(), digest_size=16).hexdigest()
+
+    def compute(self, name, *inputs, **params):
+        """Возвращает значение индикатора name, вычисляя его только при промахе кэша"""
+        if name not in INDICATORS:
+            raise KeyError(f"Неизвестный индикатор: {name}")
+        inputs = [np.asarray(values, dtype=np.float64) for values in inputs]
+        key = self.key(name, inputs, params)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+        result = self._read(name, key)
+        if result is not None:
+            self.disk_hits += 1
+        else:
+            result = INDICATORS[name](*inputs, **params)
+            self.misses += 1
+            self._write(name, key, result)
+
+        arrays = result if isinstance(result, tuple) else (result,)
+        for values in arrays:
+            values.setflags(write=False)
+        self._store(key, result, sum(values.nbytes for values in arrays))
+        return result
+
+    def _store(self, key, result, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (result, size)
+                self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, removed) = self._entries.popitem(last=False)
+                self.current_bytes -= removed
+
+    def _path(self, name, key):
+        return os.path.join(self.directory, f"{name}_{key}.npz")
+
+    def _read(self, name, key):
+        if not self.directory:
+            return None
+        path = self._path(name, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as stored:
+                arrays = tuple(stored[f'arr_{i}'] for i in range(len(stored.files) - 1))
+                is_tuple = bool(stored['is_tuple'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to read cached indicator {path}: {e}")
+            return None
+        return arrays if is_tuple else arrays[0]
+
+    def _write(self, name, key, result):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name, key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        arrays = result if isinstance(result, tuple) else (result,)
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, *arrays, is_tuple=np.array(isinstance(result, tuple)))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cached indicator {path}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def log_stats(self):
+        logger.info(f"Indicator cache: {self.hits} hits, {self.disk_hits} disk hits, {self.misses} misses, "
+                    f"{len(self._entries)} entries, {self.current_bytes / 1024 ** 2:.1f} MB")
+
+indicator_cache = IndicatorCache(INDICATOR_CACHE_MAX_MB * 1024 ** 2, INDICATOR_CACHE_DIRECTORY)
+
+def indicator(name, *inputs, **params):
+    """Значение индикатора из реестра через общий кэш процесса"""
+    return indicator_cache.compute(name, *inputs, **params)
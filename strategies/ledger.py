@@ -0,0 +1,69 @@
+# Направления позиции
+LONG = 1
+SHORT_POSITION = -1
+TRADE_TYPES = {LONG: 'Long', SHORT_POSITION: 'Short'}
+DIRECTIONS = {name: direction for direction, name in TRADE_TYPES.items()}
+
+
+class PositionLedger:
+    """Учет денежного баланса и позиции с инкрементальным расчетом прибыли.
+
+    Хранит количество акций, среднюю цену и стоимость входа, а также накопленную
+    реализованную прибыль, поэтому открытие и закрытие позиции выполняются за O(1).
+    """
+
+    def __init__(self, initial_balance):
+        self.initial_balance = initial_balance
+        self.balance = initial_balance
+        self.direction = 0  # 1 - Long, -1 - Short, 0 - нет позиции
+        self.shares = 0  # Количество акций в позиции (без знака)
+        self.avg_price = 0.0
+        self.cost_basis = 0.0
+        self.realized_pnl = 0.0
+        self.closed_positions = 0
+
+    @property
+    def position(self):
+        """Количество акций со знаком: положительное для Long, отрицательное для Short"""
+        return self.direction * self.shares
+
+    @property
+    def position_type(self):
+        return TRADE_TYPES.get(self.direction)
+
+    def open(self, direction, shares, price):
+        """Открывает позицию или увеличивает текущую в том же направлении"""
+        if self.direction not in (0, direction):
+            raise ValueError("Нельзя открыть позицию в противоположном направлении, сначала закройте текущую.")
+        self.balance -= direction * shares * price
+        if self.shares:
+            self.cost_basis += shares * price
+            self.shares += shares
+            self.avg_price = self.cost_basis / self.shares
+        else:
+            self.cost_basis = shares * price
+            self.shares = shares
+            self.avg_price = price
+        self.direction = direction
+
+    def close(self, price):
+        """Закрывает позицию целиком, возвращает (количество акций, прибыль)"""
+        shares = self.shares
+        profit = (price - self.avg_price) * shares * self.direction
+        self.balance += self.direction * shares * price
+        self.realized_pnl += profit
+        self.closed_positions += 1
+        self.direction = 0
+        self.shares = 0
+        self.avg_price = 0.0
+        self.cost_basis = 0.0
+        return shares, profit
+
+    def unrealized_pnl(self, price):
+        if self.direction == 0:
+            return 0.0
+        return (price - self.avg_price) * self.shares * self.direction
+
+    def market_value(self, price):
+        """Стоимость счета с учетом открытой позиции по текущей цене"""
+        return self.balance + self.direction * self.shares * price
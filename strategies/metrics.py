@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from .ledger import DIRECTIONS
+
+# Количество баров в году для годовых показателей: 252 торговых дня, сессия 6.5 часа (9:30-16:00),
+# часовые бары Yahoo Finance начинаются в 9:30, поэтому их 7 в день
+PERIODS_PER_YEAR = {
+    '1m': 252 * 390,
+    '5m': 252 * 78,
+    '15m': 252 * 26,
+    '30m': 252 * 13,
+    '1h': 252 * 7,
+    '1d': 252,
+    '1wk': 52,
+    '1mo': 12
+}
+
+def trade_rows(index, dates):
+    """Номера баров index для дат сделок (сделка на баре с той же датой или последнем перед ней)"""
+    timestamps = pd.DatetimeIndex(dates).as_unit('ns').asi8 if len(dates) else np.empty(0, dtype=np.int64)
+    return np.searchsorted(index.as_unit('ns').asi8, timestamps, side='right') - 1
+
+def bar_equity(close, rows, trade_type, action, shares, balance, initial_balance):
+    """Стоимость счета на каждом баре по журналу сделок.
+
+    rows - номера баров сделок по возрастанию, trade_type - направления (1/-1), action - коды (0 - Open, 1 - Close),
+    balance - денежный баланс после сделки. Баланс и позиция кусочно-постоянны между сделками, поэтому
+    на каждом баре берется состояние после последней сделки не позже этого бара (searchsorted).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    after = np.searchsorted(rows, np.arange(len(close)), side='right')
+    cash = np.concatenate(([float(initial_balance)], np.asarray(balance, dtype=np.float64)))[after]
+    position = np.where(np.asarray(action) == 0, np.asarray(trade_type) * np.asarray(shares, dtype=np.float64), 0.0)
+    position = np.concatenate(([0.0], position))[after]
+    return cash + position * close
+
+def trades_equity(index, close, trades, initial_balance):
+    """bar_equity() для журнала сделок в формате TradeLog.to_frame(), возвращает Series на индексе index"""
+    rows = trade_rows(index, trades['Date'])
+    trade_type = trades['Trade Type'].map(DIRECTIONS).to_numpy(dtype=np.float64) if len(trades) else np.empty(0)
+    action = np.where(trades['Action'].to_numpy() == 'Open', 0, 1)
+    equity = bar_equity(close, rows, trade_type, action, trades['Shares'].to_numpy(), trades['Balance'].to_numpy(), initial_balance)
+    return pd.Series(equity, index=index, name='Equity')
+
+def _ratio(numerator, denominator):
+    return float(numerator / denominator) if denominator > 0 else float('nan')
+
+def performance_metrics(equity, trades, interval, initial_balance):
+    """Показатели бэктеста по кривой стоимости на барах и журналу сделок, без циклов по барам.
+
+    equity - Series стоимости счета на каждом баре, trades - журнал в формате TradeLog.to_frame()
+    (для портфеля - с колонкой Ticker). Годовые показатели считаются по PERIODS_PER_YEAR[interval].
+    Возвращает плоский словарь чисел, чтобы результаты многих прогонов собирались в одну таблицу.
+    Показатели, которые нельзя вычислить (нет сделок, нулевая волатильность), равны NaN.
+    """
+    values = np.asarray(equity, dtype=np.float64)
+    n = len(values)
+    periods = PERIODS_PER_YEAR[interval]
+    final_value = float(values[-1]) if n else float(initial_balance)
+
+    # Доходности по барам, включая первый бар относительно начального баланса
+    returns = np.diff(values, prepend=float(initial_balance)) / np.concatenate(([float(initial_balance)], values[:-1]))
+    volatility = returns.std(ddof=1) if n > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2)) if n else 0.0
+
+    # Просадка от максимума и самый длинный период ниже максимума в барах
+    peak = np.maximum.accumulate(values) if n else values
+    drawdown = values / peak - 1 if n else values
+    bars = np.arange(n)
+    last_peak = np.maximum.accumulate(np.where(values >= peak, bars, 0)) if n else bars
+    underwater = bars - last_peak
+
+    # Открытые позиции после каждой сделки: +1 при открытии, -1 при закрытии
+    opened = trades['Action'].to_numpy() == 'Open'
+    open_count = np.cumsum(np.where(opened, 1, -1))
+    rows = trade_rows(equity.index, trades['Date'])
+    open_count = np.concatenate(([0], open_count))[np.searchsorted(rows, bars, side='right')]
+    notional = trades['Shares'].to_numpy(dtype=np.float64) * trades['Price'].to_numpy(dtype=np.float64)
+
+    # Доходность сделки по ценам открытия и закрытия позиции. Колонка Profit не подходит: в Supertrend
+    # она считается от цены входа, которую обновляет каждый сигнал
+    closed = ~opened
+    entry = pd.Series(np.where(opened, trades['Price'].to_numpy(dtype=np.float64), np.nan))
+    entry = (entry.groupby(trades['Ticker'].to_numpy()).ffill() if 'Ticker' in trades.columns else entry.ffill()).to_numpy()
+    direction = trades['Trade Type'].map(DIRECTIONS).to_numpy(dtype=np.float64) if len(trades) else np.empty(0)
+    trade_returns = (trades['Price'].to_numpy(dtype=np.float64) / entry - 1)[closed] * direction[closed]
+    profits = trade_returns * entry[closed] * trades['Shares'].to_numpy(dtype=np.float64)[closed]
+    gains = trade_returns[trade_returns > 0]
+
+    return {
+        "initial_balance": float(initial_balance),
+        "final_value": final_value,
+        "profit": final_value - initial_balance,
+        "return_pct": (final_value / initial_balance - 1) * 100,
+        "annual_return_pct": ((final_value / initial_balance) ** (periods / n) - 1) * 100 if n and final_value > 0 else float('nan'),
+        "annual_volatility_pct": float(volatility * np.sqrt(periods) * 100),
+        "sharpe": _ratio(returns.mean() * np.sqrt(periods), volatility) if n else float('nan'),
+        "sortino": _ratio(returns.mean() * np.sqrt(periods), downside) if n else float('nan'),
+        "max_drawdown_pct": float(drawdown.min() * 100) if n else 0.0,
+        "max_drawdown_bars": int(underwater.max()) if n else 0,
+        "exposure_pct": float((open_count > 0).mean() * 100) if n else 0.0,
+        "turnover": _ratio(notional.sum(), values.mean() if n else 0.0),
+        "num_trades": int(closed.sum()),
+        "win_rate_pct": float(len(gains) / len(trade_returns) * 100) if len(trade_returns) else float('nan'),
+        "avg_trade_return_pct": float(trade_returns.mean() * 100) if len(trade_returns) else float('nan'),
+        "median_trade_return_pct": float(np.median(trade_returns) * 100) if len(trade_returns) else float('nan'),
+        "std_trade_return_pct": float(trade_returns.std(ddof=1) * 100) if len(trade_returns) > 1 else float('nan'),
+        "best_trade_pct": float(trade_returns.max() * 100) if len(trade_returns) else float('nan'),
+        "worst_trade_pct": float(trade_returns.min() * 100) if len(trade_returns) else float('nan'),
+        "profit_factor": _ratio(profits[profits > 0].sum(), -profits[profits < 0].sum())
+    }
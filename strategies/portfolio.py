@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+from .ledger import LONG, SHORT_POSITION
+from .simulator import BASE_RULES
+from .trade_log import TradeLog
+
+
+class TickerBook:
+    """Данные одного тикера для портфельной симуляции: индекс баров, цены закрытия и сигналы"""
+
+    def __init__(self, ticker, index, close, signals):
+        self.ticker = ticker
+        self.index = index
+        self.timestamps = index.as_unit('ns').asi8
+        self.close = np.asarray(close, dtype=np.float64)
+        self.signals = signals
+
+    def events(self, number):
+        """Поток событий (timestamp, номер тикера, номер события) по времени, последним идет конец данных"""
+        positions = self.signals.positions
+        timestamps = np.append(self.timestamps[positions], self.timestamps[-1]).tolist()
+        return zip(timestamps, itertools.repeat(number), range(len(timestamps)))
+
+
+def simulate_portfolio(books, initial_balance, position_size=1.0, whole_shares_only=True, rules=BASE_RULES,
+                       take_profit=None, stop_loss=None, signal_sets_entry=False):
+    """Симуляция портфеля с общим балансом по сигналам многих тикеров.
+
+    Сигналы всех тикеров объединяются в один поток по времени слиянием куч (heapq.merge) без построения
+    общего DataFrame. Новая позиция получает долю position_size от текущей стоимости портфеля,
+    но не больше свободных денег: деньги от продажи в шорт остаются обеспечением шорта
+    и не идут на новые позиции (без плеча). Правила, уровни выхода и учет цены входа такие же, как в simulate(),
+    поэтому с одним тикером и position_size=1.0 результат совпадает с обычным бэктестом.
+
+    Возвращает словарь initial_balance, final_value, realized_pnl, trades (DataFrame с колонкой Ticker)
+    и equity - стоимость портфеля на каждом баре объединенной шкалы времени.
+    """
+    k = len(books)
+    cash = float(initial_balance)
+    direction = [0] * k
+    shares = [0.0] * k
+    entry_price = [0.0] * k
+    open_price = [0.0] * k
+    realized_pnl = 0.0
+    columns = {name: [] for name in ('timestamp', 'ticker', 'trade_type', 'action', 'shares', 'price', 'profit', 'balance')}
+
+    def record(timestamp, j, trade_direction, action, trade_shares, price, profit):
+        for name, value in zip(columns, (timestamp, j, trade_direction, action, trade_shares, price, profit, cash)):
+            columns[name].append(value)
+
+    def last_price(timestamp, j):
+        book = books[j]
+        return book.close[np.searchsorted(book.timestamps, timestamp, side='right') - 1]
+
+    def equity(timestamp):
+        """Стоимость портфеля по последним известным ценам открытых позиций"""
+        value = cash
+        for j in range(k):
+            if direction[j] != 0:
+                value += direction[j] * shares[j] * last_price(timestamp, j)
+        return value
+
+    def free_cash(timestamp):
+        """Деньги за вычетом обязательств по открытым шортам (стоимости их обратного выкупа)"""
+        value = cash
+        for j in range(k):
+            if direction[j] == SHORT_POSITION:
+                value -= shares[j] * last_price(timestamp, j)
+        return value
+
+    def close_position(timestamp, j, price):
+        nonlocal cash, realized_pnl
+        profit = (price - entry_price[j]) * shares[j] * direction[j]
+        realized_pnl += (price - open_price[j]) * shares[j] * direction[j]
+        cash += direction[j] * shares[j] * price
+        record(timestamp, j, direction[j], 1, shares[j], price, profit)
+        direction[j] = 0
+        shares[j] = 0.0
+
+    def open_position(timestamp, j, open_direction, price):
+        nonlocal cash
+        notional = min(equity(timestamp) * position_size, free_cash(timestamp))
+        order_shares = notional // price if whole_shares_only else notional / price
+        if order_shares <= 0:
+            return
+        cash -= open_direction * order_shares * price
+        direction[j] = open_direction
+        shares[j] = order_shares
+        entry_price[j] = price
+        open_price[j] = price
+        record(timestamp, j, open_direction, 0, order_shares, price, 0.0)
+
+    for timestamp, j, number in heapq.merge(*(book.events(j) for j, book in enumerate(books))):
+        book = books[j]
+        if number == len(book.signals):
+            # Закрытие открытой позиции в конце данных тикера
+            if direction[j] != 0:
+                close_position(timestamp, j, book.close[-1])
+            continue
+
+        price = book.close[book.signals.positions[number]]
+        closes, opens, reverse = rules[int(book.signals.codes[number])]
+        if signal_sets_entry and direction[j] != 0:
+            entry_price[j] = price
+
+        closed = False
+        if closes is not None and direction[j] == closes:
+            close_position(timestamp, j, price)
+            closed = True
+        if opens is not None and direction[j] == 0 and (reverse or not closed):
+            open_position(timestamp, j, opens, price)
+
+        if direction[j] == LONG:
+            if (take_profit is not None and price >= entry_price[j] * (1 + take_profit)) or \
+                    (stop_loss is not None and price <= entry_price[j] * (1 - stop_loss)):
+                close_position(timestamp, j, price)
+        elif direction[j] == SHORT_POSITION:
+            if (take_profit is not None and price <= entry_price[j] * (1 - take_profit)) or \
+                    (stop_loss is not None and price >= entry_price[j] * (1 + stop_loss)):
+                close_position(timestamp, j, price)
+
+    trades = {name: np.array(values) for name, values in columns.items()}
+    return {
+        "initial_balance": initial_balance,
+        "final_value": cash,
+        "realized_pnl": realized_pnl,
+        "trades": portfolio_trades(books, trades),
+        "equity": equity_curve(books, trades, initial_balance)
+    }
+
+
+def portfolio_trades(books, trades):
+    """Журнал сделок портфеля в формате TradeLog.to_frame() с дополнительной колонкой Ticker"""
+    tz = books[0].index.tz if books else None
+    count = len(trades['timestamp'])
+    log = TradeLog.from_columns(trades['timestamp'].astype(np.int64), tz if count else None,
+                                trades['trade_type'].astype(np.int8), trades['action'].astype(np.int8),
+                                trades['shares'].astype(np.float64), trades['price'].astype(np.float64),
+                                trades['profit'].astype(np.float64), trades['balance'].astype(np.float64))
+    tickers = np.array([book.ticker for book in books], dtype=object)
+    return log.to_frame().assign(Ticker=tickers[trades['ticker'].astype(np.int64)] if count else [])
+
+
+def equity_curve(books, trades, initial_balance):
+    """Стоимость портфеля на объединенной шкале баров всех тикеров.
+
+    Денежный баланс и позиции кусочно-постоянны между сделками, поэтому на каждом баре берется
+    состояние после последней сделки не позже этого бара (searchsorted) - без цикла по барам.
+    """
+    timeline = np.unique(np.concatenate([book.timestamps for book in books])) if books else np.empty(0, dtype=np.int64)
+    trade_times = trades['timestamp'].astype(np.int64)
+    cash_after = np.concatenate(([float(initial_balance)], trades['balance'].astype(np.float64)))
+    values = cash_after[np.searchsorted(trade_times, timeline, side='right')]
+
+    trade_tickers = trades['ticker'].astype(np.int64) if len(trade_times) else trade_times
+    for j, book in enumerate(books):
+        mine = trade_tickers == j
+        if not mine.any():
+            continue
+        # Позиция со знаком после каждой сделки тикера (после закрытия - ноль)
+        opened = trades['action'][mine] == 0
+        position = np.where(opened, trades['trade_type'][mine] * trades['shares'][mine], 0.0)
+        position = np.concatenate(([0.0], position))[np.searchsorted(trade_times[mine], timeline, side='right')]
+        bar = np.searchsorted(book.timestamps, timeline, side='right') - 1
+        price = np.where(bar >= 0, book.close[np.maximum(bar, 0)], 0.0)
+        values = values + position * price
+
+    tz = books[0].index.tz if books else None
+    index = pd.to_datetime(timeline, utc=True)
+    index = index.tz_convert(tz) if tz is not None else index.tz_localize(None)
+    return pd.Series(values, index=index, name='Equity')
@@ -0,0 +1,65 @@
+import numpy as np
+
+# Коды сигналов
+BUY = 1
+SELL = -1
+SHORT = -2
+COVER = 2
+
+SIGNAL_NAMES = {BUY: 'buy', SELL: 'sell', SHORT: 'short', COVER: 'cover'}
+SIGNAL_CODES = {name: code for code, name in SIGNAL_NAMES.items()}
+
+
+class Signals:
+    """Компактное представление сигналов: позиции баров и коды сигналов в массивах NumPy"""
+
+    def __init__(self, index, positions, codes):
+        self.index = index
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.codes = np.asarray(codes, dtype=np.int8)
+
+    @classmethod
+    def from_masks(cls, index, buy, sell):
+        """Строит сигналы из булевых масок покупки и продажи (покупка имеет приоритет)"""
+        buy = np.asarray(buy, dtype=bool)
+        sell = np.asarray(sell, dtype=bool) & ~buy
+        codes = np.zeros(len(buy), dtype=np.int8)
+        codes[buy] = BUY
+        codes[sell] = SELL
+        positions = np.flatnonzero(codes)
+        return cls(index, positions, codes[positions])
+
+    @classmethod
+    def from_list(cls, index, signals):
+        """Преобразует список кортежей (timestamp, signal) в компактное представление.
+
+        Метки времени, которых нет в index, - ошибка KeyError.
+        """
+        if isinstance(signals, cls):
+            return signals
+        timestamps = [timestamp for timestamp, _ in signals]
+        positions = index.get_indexer(timestamps) if timestamps else np.array([], dtype=np.intp)
+        if (positions < 0).any():
+            missing = [str(timestamp) for timestamp, position in zip(timestamps, positions) if position < 0]
+            raise KeyError(f"Сигналы с метками времени, которых нет в данных: {', '.join(missing)}")
+        codes = [SIGNAL_CODES[signal] for _, signal in signals]
+        return cls(index, positions, codes)
+
+    def timestamps(self):
+        return self.index[self.positions]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        """Итерирует сигналы в старом формате (timestamp, signal)"""
+        for timestamp, code in zip(self.timestamps(), self.codes.tolist()):
+            yield timestamp, SIGNAL_NAMES[code]
+
+    def __eq__(self, other):
+        if isinstance(other, Signals):
+            return np.array_equal(self.positions, other.positions) and np.array_equal(self.codes, other.codes)
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"Signals({len(self)} signals)"
@@ -0,0 +1,278 @@
+import numpy as np
+from .ledger import LONG, SHORT_POSITION, TRADE_TYPES
+from .signals import BUY, SELL, SHORT, COVER
+
+try:
+    from numba import njit
+except ImportError:  # Numba необязательна, без нее пакетная симуляция выполняется на чистом Python
+    njit = None
+
+# Правила обработки сигналов: код сигнала -> (какую позицию закрыть, какую открыть, разворот на том же баре)
+BASE_RULES = {
+    BUY: (None, LONG, False),
+    SELL: (LONG, None, False),
+    SHORT: (None, SHORT_POSITION, False),
+    COVER: (SHORT_POSITION, None, False),
+}
+
+
+INTRABAR_FILLS = ('level', 'close')
+
+
+def _first_touch(mask):
+    """Номер первого True в булевом массиве или len(mask), если его нет (argmax останавливается на первом True)"""
+    first = int(np.argmax(mask)) if len(mask) else 0
+    return first if len(mask) and mask[first] else len(mask)
+
+
+def simulate(close, signals, ledger, record_trade, rules=BASE_RULES, whole_shares_only=True,
+             take_profit=None, stop_loss=None, signal_sets_entry=False, high=None, low=None, intrabar_fill='level',
+             open_=None):
+    """Событийная симуляция торговли по позициям баров и массиву цен закрытия.
+
+    close - массив цен закрытия, signals - объект Signals, ledger - PositionLedger с балансом счета.
+    record_trade(pos, trade_type, action, shares, price, profit, balance) вызывается для каждой сделки,
+    где pos - позиция бара. take_profit и stop_loss задаются долями от цены входа и проверяются
+    на барах с сигналами. signal_sets_entry=True обновляет цену входа на каждом сигнале
+    (поведение исходной стратегии Supertrend). Возвращает ledger.
+
+    Если переданы high и low, уровни проверяются внутри каждого бара: для открытой позиции ищется
+    первый бар после сигнала, на котором high/low достигает уровня (поиск по срезу массива, без цикла
+    по барам), и позиция закрывается на нем до обработки сигналов этого бара. intrabar_fill задает
+    цену исполнения: 'level' - по уровню (если на одном баре достигнуты оба уровня, первым считается
+    стоп-лосс), 'close' - по цене закрытия бара. Если передан open_ и бар открылся за уровнем стоп-лосса
+    (гэп), исполнение 'level' идет по цене открытия: цена уровня на таком баре не торговалась.
+    Тейк-профит исполняется по уровню и при гэпе - из двух цен берется худшая.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    prices = close[signals.positions].tolist()
+    entry_price = 0.0
+    intrabar = high is not None and low is not None
+    if intrabar:
+        if intrabar_fill not in INTRABAR_FILLS:
+            raise ValueError(f"Неизвестный способ исполнения внутри бара: {intrabar_fill}")
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        if open_ is not None:
+            open_ = np.asarray(open_, dtype=np.float64)
+
+    def open_position(pos, direction, price):
+        nonlocal entry_price
+        shares = ledger.balance // price if whole_shares_only else ledger.balance / price
+        if shares <= 0:
+            return
+        ledger.open(direction, shares, price)
+        entry_price = price
+        record_trade(pos, TRADE_TYPES[direction], 'Open', shares, price, 0.0, ledger.balance)
+
+    def close_position(pos, price):
+        trade_type = ledger.position_type
+        profit = (price - entry_price) * ledger.shares * ledger.direction
+        shares, _ = ledger.close(price)
+        record_trade(pos, trade_type, 'Close', shares, price, profit, ledger.balance)
+
+    def intrabar_exit(start, stop):
+        """Закрывает позицию на первом баре из [start, stop), где достигнут уровень тейк-профита или стоп-лосса"""
+        if ledger.direction == 0 or start >= stop:
+            return
+        # Для лонга тейк-профит выше цены входа и достигается по high, стоп-лосс - ниже по low; для шорта наоборот
+        direction = ledger.direction
+        favorable, adverse = (high, low) if direction == LONG else (low, high)
+        target = stopped = stop - start
+        if take_profit is not None:
+            target_level = entry_price * (1 + direction * take_profit)
+            target = _first_touch(direction * favorable[start:stop] >= direction * target_level)
+        if stop_loss is not None:
+            stop_level = entry_price * (1 - direction * stop_loss)
+            stopped = _first_touch(direction * adverse[start:stop] <= direction * stop_level)
+        first = min(target, stopped)
+        if first == stop - start:
+            return
+        pos = start + first
+        if intrabar_fill == 'close':
+            price = close[pos]
+        elif stopped <= target:
+            price = stop_level
+            if open_ is not None and direction * open_[pos] < direction * stop_level:
+                price = open_[pos]
+        else:
+            price = target_level
+        close_position(pos, price)
+
+    last_pos = -1
+    for pos, code, price in zip(signals.positions.tolist(), signals.codes.tolist(), prices):
+        if intrabar:
+            # Уровни, достигнутые после предыдущего сигнала и на этом баре до его закрытия
+            intrabar_exit(last_pos + 1, pos + 1)
+            last_pos = pos
+        closes, opens, reverse = rules[code]
+        position = ledger.direction
+        if signal_sets_entry and position != 0:
+            entry_price = price
+
+        closed = False
+        if closes is not None and position == closes:
+            close_position(pos, price)
+            closed = True
+        if opens is not None and ledger.direction == 0 and (reverse or not closed):
+            open_position(pos, opens, price)
+
+        if intrabar:
+            continue
+        position = ledger.direction
+        if position == LONG:
+            if (take_profit is not None and price >= entry_price * (1 + take_profit)) or \
+                    (stop_loss is not None and price <= entry_price * (1 - stop_loss)):
+                close_position(pos, price)
+        elif position == SHORT_POSITION:
+            if (take_profit is not None and price <= entry_price * (1 - take_profit)) or \
+                    (stop_loss is not None and price >= entry_price * (1 + stop_loss)):
+                close_position(pos, price)
+
+    if intrabar:
+        intrabar_exit(last_pos + 1, len(close))
+
+    # Закрытие всех открытых позиций в конце периода
+    if ledger.direction != 0:
+        close_position(len(close) - 1, close[-1])
+
+    return ledger
+
+
+def _rule_tables(rules):
+    """Таблицы правил, индексируемые кодом сигнала + 2: закрываемая позиция, открываемая позиция, разворот"""
+    closes = np.zeros(5, dtype=np.int64)
+    opens = np.zeros(5, dtype=np.int64)
+    reverse = np.zeros(5, dtype=np.bool_)
+    for code, (close_position, open_position, reverse_position) in rules.items():
+        closes[code + 2] = close_position or 0
+        opens[code + 2] = open_position or 0
+        reverse[code + 2] = reverse_position
+    return closes, opens, reverse
+
+
+def _record(trades, count, row, column, direction, action, shares, price, profit, balance):
+    trades[count, 0] = row
+    trades[count, 1] = column
+    trades[count, 2] = direction
+    trades[count, 3] = action
+    trades[count, 4] = shares
+    trades[count, 5] = price
+    trades[count, 6] = profit
+    trades[count, 7] = balance
+    return count + 1
+
+if njit is not None:
+    # Ядро вызывает _record, поэтому она компилируется до ядра
+    _record = njit(cache=True)(_record)
+
+
+def _simulate_columns(close, lengths, signal_rows, signal_starts, signal_codes, closes_table, opens_table,
+                      reverse_table, initial_balance, whole_shares_only, use_take_profit, take_profit,
+                      use_stop_loss, stop_loss, signal_sets_entry, balances, realized, trades):
+    """Ядро simulate_batch: тот же алгоритм, что в simulate(), последовательно для каждой колонки"""
+    count = 0
+    for j in range(close.shape[1]):
+        balance = initial_balance
+        direction = 0
+        shares = 0.0
+        entry_price = 0.0
+        open_price = 0.0
+        realized_pnl = 0.0
+        for s in range(signal_starts[j], signal_starts[j + 1]):
+            row = signal_rows[s]
+            code = signal_codes[s] + 2
+            price = close[row, j]
+            if signal_sets_entry and direction != 0:
+                entry_price = price
+
+            closed = False
+            if closes_table[code] != 0 and direction == closes_table[code]:
+                profit = (price - entry_price) * shares * direction
+                realized_pnl += (price - open_price) * shares * direction
+                balance += direction * shares * price
+                count = _record(trades, count, row, j, direction, 1, shares, price, profit, balance)
+                direction = 0
+                shares = 0.0
+                closed = True
+            opens = opens_table[code]
+            if opens != 0 and direction == 0 and (reverse_table[code] or not closed):
+                order_shares = balance // price if whole_shares_only else balance / price
+                if order_shares > 0:
+                    balance -= opens * order_shares * price
+                    direction = opens
+                    shares = order_shares
+                    entry_price = price
+                    open_price = price
+                    count = _record(trades, count, row, j, direction, 0, shares, price, 0.0, balance)
+
+            exit_position = False
+            if direction == LONG:
+                exit_position = (use_take_profit and price >= entry_price * (1 + take_profit)) or \
+                    (use_stop_loss and price <= entry_price * (1 - stop_loss))
+            elif direction == SHORT_POSITION:
+                exit_position = (use_take_profit and price <= entry_price * (1 - take_profit)) or \
+                    (use_stop_loss and price >= entry_price * (1 + stop_loss))
+            if exit_position:
+                profit = (price - entry_price) * shares * direction
+                realized_pnl += (price - open_price) * shares * direction
+                balance += direction * shares * price
+                count = _record(trades, count, row, j, direction, 1, shares, price, profit, balance)
+                direction = 0
+                shares = 0.0
+
+        # Закрытие открытой позиции на последнем баре тикера
+        if direction != 0:
+            row = lengths[j] - 1
+            price = close[row, j]
+            profit = (price - entry_price) * shares * direction
+            realized_pnl += (price - open_price) * shares * direction
+            balance += direction * shares * price
+            count = _record(trades, count, row, j, direction, 1, shares, price, profit, balance)
+        balances[j] = balance
+        realized[j] = realized_pnl
+    return count
+
+if njit is not None:
+    _simulate_columns_compiled = njit(cache=True)(_simulate_columns)
+
+
+def simulate_batch(close, codes, lengths, initial_balance, rules=BASE_RULES, whole_shares_only=True,
+                   take_profit=None, stop_loss=None, signal_sets_entry=False):
+    """Симуляция торговли сразу по всем тикерам матрицы (бары x тикеры).
+
+    close - матрица цен закрытия, выровненная по левому краю (бары тикера j занимают строки 0..lengths[j]-1),
+    codes - матрица кодов сигналов (0 - нет сигнала). У каждого тикера свой счет с initial_balance.
+    Правила и порядок операций совпадают с simulate(), поэтому результаты по каждому тикеру идентичны
+    симуляции одного тикера. С Numba весь цикл по сигналам компилируется, без нее выполняется
+    на чистом Python, но без вызовов журнала сделок на каждую сделку.
+
+    Возвращает словарь: balance, realized_pnl (по тикерам) и trades - колонки сделок
+    (row, column, trade_type, action, shares, price, profit, balance), упорядоченные по тикеру и времени.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int8)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    k = close.shape[1]
+
+    # Сигналы по колонкам: строки и коды сигналов тикера j лежат в signal_starts[j]:signal_starts[j + 1]
+    columns, rows = np.nonzero(codes.T)
+    signal_codes = codes[rows, columns].astype(np.int64)
+    signal_starts = np.searchsorted(columns, np.arange(k + 1))
+    closes_table, opens_table, reverse_table = _rule_tables(rules)
+
+    # Каждый сигнал дает не больше трех сделок (закрытие, открытие, выход по уровню), плюс закрытие в конце
+    trades = np.empty((3 * len(rows) + k, 8), dtype=np.float64)
+    balances = np.empty(k, dtype=np.float64)
+    realized = np.empty(k, dtype=np.float64)
+    args = (close, lengths, rows.astype(np.int64), signal_starts.astype(np.int64), signal_codes, closes_table,
+            opens_table, reverse_table, float(initial_balance), bool(whole_shares_only), take_profit is not None,
+            float(take_profit or 0.0), stop_loss is not None, float(stop_loss or 0.0), bool(signal_sets_entry),
+            balances, realized, trades)
+    count = _simulate_columns_compiled(*args) if njit is not None else _simulate_columns(*args)
+
+    trades = trades[:count]
+    names = ['row', 'column', 'trade_type', 'action', 'shares', 'price', 'profit', 'balance']
+    dtypes = [np.int64, np.int64, np.int8, np.int8, np.float64, np.float64, np.float64, np.float64]
+    return {"balance": balances, "realized_pnl": realized,
+            "trades": {name: trades[:, i].astype(dtype) for i, (name, dtype) in enumerate(zip(names, dtypes))}}
@@ -0,0 +1,224 @@
+import math
+from collections import deque
+
+# Состояния индикаторов для пошагового режима: каждый update() выполняется за O(1) на бар.
+# Алгоритмы повторяют TA-Lib и пакетные функции стратегий. Значения совпадают с пакетным расчетом
+# с точностью до округления (порядка 1e-12 относительной погрешности), сигналы - полностью.
+# NaN обрабатывается так же, как в пакетном расчете: в RollingSMA, RollingBollinger и RollingATR,
+# как и в TA-Lib, NaN сохраняется до конца ряда, RollingStd и RollingLinregSlope возвращают NaN,
+# только пока NaN находится в окне.
+
+
+class RollingSMA:
+    """Скользящее среднее как в talib.SMA: накопленная сумма окна с вычитанием самого старого значения"""
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, value):
+        self.window.append(value)
+        self.total += value
+        if len(self.window) < self.period:
+            return math.nan
+        result = self.total / self.period
+        self.total -= self.window.popleft()
+        return result
+
+
+class RollingBollinger:
+    """Bollinger Bands как в talib.BBANDS (matype=0): возвращает (upper, middle, lower) в порядке talib"""
+
+    def __init__(self, period, num_std_dev):
+        self.period = period
+        self.num_std_dev = num_std_dev
+        self.sma = RollingSMA(period)
+        self.squares = deque()
+        self.total_squares = 0.0
+
+    def update(self, value):
+        middle = self.sma.update(value)
+        square = value * value
+        self.squares.append(square)
+        self.total_squares += square
+        if len(self.squares) < self.period:
+            return math.nan, math.nan, math.nan
+        variance = self.total_squares / self.period
+        self.total_squares -= self.squares.popleft()
+        variance -= middle * middle
+        # TA-Lib считает дисперсию меньше 1e-8 нулевой
+        deviation = math.sqrt(variance) if variance >= 0.00000001 else 0.0
+        if self.num_std_dev != 1.0:
+            deviation = deviation * self.num_std_dev
+        return middle + deviation, middle, middle - deviation
+
+
+class RollingATR:
+    """Average True Range как в talib.ATR: первое значение - среднее TR за period баров, далее сглаживание Уайлдера"""
+
+    def __init__(self, period):
+        self.period = period
+        self.previous_close = None
+        self.count = 0
+        self.total = 0.0
+        self.atr = math.nan
+
+    def update(self, high, low, close):
+        previous_close, self.previous_close = self.previous_close, close
+        if previous_close is None:
+            return math.nan
+        true_range = high - low
+        true_range = max(true_range, abs(previous_close - high), abs(low - previous_close))
+        self.count += 1
+        if self.period <= 1:
+            self.atr = true_range
+        elif self.count < self.period:
+            self.total += true_range
+        elif self.count == self.period:
+            self.atr = (self.total + true_range) / self.period
+        else:
+            self.atr = (self.atr * (self.period - 1) + true_range) / self.period
+        return self.atr
+
+
+class RollingStd:
+    """Выборочное стандартное отклонение (ddof=1) по окну, как pandas rolling().std(): алгоритм Уэлфорда.
+
+    NaN не входят в среднее и сумму квадратов, пока NaN в окне - результат NaN.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.count = 0  # Количество значений без NaN в окне
+        self.nan_count = 0
+        self.mean = 0.0
+        self.ssqdm = 0.0  # Сумма квадратов отклонений от среднего
+
+    def update(self, value):
+        self.window.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.ssqdm += delta * (value - self.mean)
+        if len(self.window) > self.period:
+            removed = self.window.popleft()
+            if math.isnan(removed):
+                self.nan_count -= 1
+            elif self.count == 1:
+                self.count, self.mean, self.ssqdm = 0, 0.0, 0.0
+            else:
+                self.count -= 1
+                delta = removed - self.mean
+                self.mean -= delta / self.count
+                self.ssqdm -= delta * (removed - self.mean)
+        if len(self.window) < self.period or self.period < 2 or self.nan_count:
+            return math.nan
+        return math.sqrt(max(self.ssqdm, 0.0) / (self.count - 1))
+
+
+class RollingLinregSlope:
+    """Наклон линейной регрессии по окну из period баров, как _linreg_slope() с end_offset=0.
+
+    Суммы sum(x) и sum(k * x) по окну обновляются при сдвиге окна за O(1). NaN входит в суммы нулем,
+    пока NaN в окне - результат NaN, как у окна с NaN в пакетном расчете.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque()
+        self.nan_count = 0
+        self.total = 0.0
+        self.weighted = 0.0
+        self.index_mean = (period - 1) / 2
+        self.index_variance = (period * period - 1) / 12
+
+    def update(self, value):
+        if len(self.window) == self.period:
+            # Номера всех баров окна уменьшаются на единицу, самый старый бар уходит
+            removed = self.window.popleft()
+            if math.isnan(removed):
+                self.nan_count -= 1
+            else:
+                self.total -= removed
+            self.weighted -= self.total
+        self.window.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+            value = 0.0
+        self.weighted += (len(self.window) - 1) * value
+        self.total += value
+        if len(self.window) < self.period or self.nan_count:
+            return math.nan
+        covariance = self.weighted / self.period - self.total / self.period * self.index_mean
+        return covariance / self.index_variance / 2
+
+
+class SupertrendState:
+    """Трейлинг полос Supertrend по одному бару, как в supertrend_arrays()"""
+
+    def __init__(self, period, atr_multiplier):
+        self.atr = RollingATR(period)
+        self.atr_multiplier = atr_multiplier
+        self.trend = True
+        self.upper = None
+        self.lower = None
+
+    def update(self, high, low, close):
+        atr = self.atr.update(high, low, close)
+        hl2 = (high + low) / 2
+        upper = hl2 + (self.atr_multiplier * atr)
+        lower = hl2 - (self.atr_multiplier * atr)
+        if self.upper is not None:
+            if close > self.upper:
+                self.trend = True
+            elif close < self.lower:
+                self.trend = False
+            else:
+                if self.trend and lower < self.lower:
+                    lower = self.lower
+                if not self.trend and upper > self.upper:
+                    upper = self.upper
+        self.upper, self.lower = upper, lower
+        return self.trend, upper, lower
+
+
+class RollingPivot:
+    """Пик (sign=1.0) или впадина (sign=-1.0) как в pivot_high()/pivot_low().
+
+    Возвращает 1.0/0.0, либо NaN, пока окно из length баров неполное или содержит NaN.
+    Максимум предыдущих length-1 значений поддерживается монотонной очередью.
+    """
+
+    def __init__(self, length, sign=1.0):
+        self.length = length
+        self.sign = sign
+        self.count = 0
+        self.candidates = deque()  # (номер бара, значение) по убыванию значения
+        self.nan_bars = deque()  # Номера баров с NaN в текущем окне
+
+    def update(self, value):
+        value = self.sign * value
+        i = self.count
+        self.count += 1
+        while self.candidates and self.candidates[0][0] <= i - self.length:
+            self.candidates.popleft()
+        while self.nan_bars and self.nan_bars[0] <= i - self.length:
+            self.nan_bars.popleft()
+        previous = self.candidates[0][1] if self.candidates else -math.inf
+
+        is_nan = math.isnan(value)
+        if is_nan:
+            self.nan_bars.append(i)
+        comparable = -math.inf if is_nan else value
+        while self.candidates and self.candidates[-1][1] <= comparable:
+            self.candidates.pop()
+        self.candidates.append((i, comparable))
+
+        if i < self.length - 1 or self.nan_bars:
+            return math.nan
+        return 1.0 if self.length == 1 or value > previous else 0.0
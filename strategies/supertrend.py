@@ -1,162 +1,183 @@
 from .base_strategy import BaseStrategy
-from config.config import BOLLINGER_PERIOD, BOLLINGER_NUM_STD_DEV, SUPER_TREND_PERIOD, ATR_MULTIPLIER, SUPER_TREND_TAKE_PROFIT_PERCENT, SUPER_TREND_STOP_LOSS_PERCENT
-import talib
+from .features import FeatureStore
+from .indicators import indicator
+from .signals import Signals, BUY, SELL
+from .streaming import SupertrendState, RollingBollinger
+from .ledger import LONG, SHORT_POSITION
+from config.config import BOLLINGER_PERIOD, BOLLINGER_NUM_STD_DEV, SUPER_TREND_PERIOD, ATR_MULTIPLIER, SUPER_TREND_TAKE_PROFIT_PERCENT, SUPER_TREND_STOP_LOSS_PERCENT, FEATURES_FLOAT32
+import math
+import numpy as np
 import pandas as pd
 
+try:
+    from numba import njit
+except ImportError:  # Numba необязательна, без нее используется чистый Python/NumPy
+    njit = None
+
+def bollinger_arrays(close, period=BOLLINGER_PERIOD, num_std_dev=BOLLINGER_NUM_STD_DEV):
+    """Bollinger Bands по массиву цен, возвращает (middle_band, upper_band, lower_band)"""
+    middle_band = indicator('SMA', close, period=period)
+    upper_band, lower_band, _ = indicator('BBANDS', close, period=period, num_std_dev=num_std_dev)
+    return middle_band, upper_band, lower_band
+
 def bollinger_bands(df, period=BOLLINGER_PERIOD, num_std_dev=BOLLINGER_NUM_STD_DEV):
-    df['middle_band'] = talib.SMA(df['close'], timeperiod=period)
-    df['upper_band'], df['lower_band'], _ = talib.BBANDS(df['close'], timeperiod=period, nbdevup=num_std_dev, nbdevdn=num_std_dev, matype=0)
+    df['middle_band'], df['upper_band'], df['lower_band'] = bollinger_arrays(df['close'].to_numpy(), period, num_std_dev)
     return df
 
-def supertrend(df, period=SUPER_TREND_PERIOD, atr_multiplier=ATR_MULTIPLIER):
-    atr = talib.ATR(df['high'], df['low'], df['close'], timeperiod=period)
-    hl2 = (df['high'] + df['low']) / 2
-    final_upperband = hl2 + (atr_multiplier * atr)
-    final_lowerband = hl2 - (atr_multiplier * atr)
-    
-    supertrend = [True] * len(df)
-    for i in range(1, len(df)):
-        if df['close'].iloc[i] > final_upperband.iloc[i-1]:
+def _trail_bands(close, final_upperband, final_lowerband, supertrend):
+    """Рекурсия трейлинга полос Supertrend. Изменяет полосы и тренд на месте."""
+    for i in range(1, len(close)):
+        if close[i] > final_upperband[i-1]:
             supertrend[i] = True
-        elif df['close'].iloc[i] < final_lowerband.iloc[i-1]:
+        elif close[i] < final_lowerband[i-1]:
             supertrend[i] = False
         else:
             supertrend[i] = supertrend[i-1]
-            if supertrend[i] and final_lowerband.iloc[i] < final_lowerband.iloc[i-1]:
-                final_lowerband.iloc[i] = final_lowerband.iloc[i-1]
-            if not supertrend[i] and final_upperband.iloc[i] > final_upperband.iloc[i-1]:
-                final_upperband.iloc[i] = final_upperband.iloc[i-1]
-    
-    df['supertrend'] = supertrend
-    df['final_upperband'] = final_upperband
-    df['final_lowerband'] = final_lowerband
+            if supertrend[i] and final_lowerband[i] < final_lowerband[i-1]:
+                final_lowerband[i] = final_lowerband[i-1]
+            if not supertrend[i] and final_upperband[i] > final_upperband[i-1]:
+                final_upperband[i] = final_upperband[i-1]
+
+if njit is not None:
+    _trail_bands_compiled = njit(cache=True)(_trail_bands)
+
+def supertrend_bands(close, final_upperband, final_lowerband):
+    """Вычисляет тренд и трейлинг полос по массивам NumPy.
+
+    Возвращает кортеж (supertrend, final_upperband, final_lowerband) из новых массивов.
+    Использует Numba, если она установлена, иначе цикл по спискам Python.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if njit is not None:
+        upper = np.array(final_upperband, dtype=np.float64)
+        lower = np.array(final_lowerband, dtype=np.float64)
+        trend = np.ones(len(close), dtype=np.bool_)
+        _trail_bands_compiled(close, upper, lower, trend)
+        return trend, upper, lower
+
+    # Доступ к элементам списков Python значительно быстрее, чем к скалярам NumPy
+    upper = np.asarray(final_upperband, dtype=np.float64).tolist()
+    lower = np.asarray(final_lowerband, dtype=np.float64).tolist()
+    trend = [True] * len(close)
+    _trail_bands(close.tolist(), upper, lower, trend)
+    return np.array(trend, dtype=bool), np.array(upper, dtype=np.float64), np.array(lower, dtype=np.float64)
+
+def supertrend_arrays(high, low, close, period=SUPER_TREND_PERIOD, atr_multiplier=ATR_MULTIPLIER):
+    """Supertrend по массивам цен, возвращает (supertrend, final_upperband, final_lowerband)"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    atr = indicator('ATR', high, low, close, period=period)
+    hl2 = (high + low) / 2
+    return supertrend_bands(close, hl2 + (atr_multiplier * atr), hl2 - (atr_multiplier * atr))
+
+def supertrend(df, period=SUPER_TREND_PERIOD, atr_multiplier=ATR_MULTIPLIER):
+    df['supertrend'], df['final_upperband'], df['final_lowerband'] = supertrend_arrays(df['high'], df['low'], df['close'], period, atr_multiplier)
     return df
 
+def prepare_data(data):
+    """Данные для стратегии: колонки в нижнем регистре, числовые цены закрытия, без строк с пропущенным close.
+
+    Входной DataFrame не изменяется: rename и assign создают новый.
+    """
+    data = data.rename(columns=str.lower)
+    required_columns = ['close', 'high', 'low']
+    for col in required_columns:
+        if (col not in data.columns):
+            raise KeyError(f"DataFrame должен содержать столбец '{col}'.")
+
+    data = data.assign(close=pd.to_numeric(data['close'], errors='coerce'))
+    return data.dropna(subset=['close'])
+
+# Противоположный сигнал только закрывает позицию, новая открывается следующим сигналом
+SUPERTREND_RULES = {
+    BUY: (SHORT_POSITION, LONG, False),
+    SELL: (LONG, SHORT_POSITION, False),
+}
+
 class SupertrendStrategy(BaseStrategy):
-    def __init__(self, data, initial_balance, whole_shares_only=True):
-        super().__init__(data, initial_balance, whole_shares_only)
-        self.take_profit_percent = SUPER_TREND_TAKE_PROFIT_PERCENT
-        self.stop_loss_percent = SUPER_TREND_STOP_LOSS_PERCENT
+    def __init__(self, data, initial_balance, whole_shares_only=True, params=None):
+        super().__init__(data, initial_balance, whole_shares_only, params)
+        self.take_profit_percent = self.params['take_profit_percent']
+        self.stop_loss_percent = self.params['stop_loss_percent']
+
+    @classmethod
+    def default_params(cls):
+        return {
+            "supertrend_period": SUPER_TREND_PERIOD,
+            "atr_multiplier": ATR_MULTIPLIER,
+            "bollinger_period": BOLLINGER_PERIOD,
+            "bollinger_num_std_dev": BOLLINGER_NUM_STD_DEV,
+            "take_profit_percent": SUPER_TREND_TAKE_PROFIT_PERCENT,
+            "stop_loss_percent": SUPER_TREND_STOP_LOSS_PERCENT
+        }
 
     def generate_signals(self):
         self.logger.info("Generating Supertrend and Bollinger Bands signals...")
 
-        self.data.columns = map(str.lower, self.data.columns)
-        required_columns = ['close', 'high', 'low']
-        for col in required_columns:
-            if (col not in self.data.columns):
-                raise KeyError(f"DataFrame должен содержать столбец '{col}'.")
+        self.data = prepare_data(self.data)
+        self.features = FeatureStore(self.data.index, float32=FEATURES_FLOAT32)
 
-        self.data['close'] = pd.to_numeric(self.data['close'], errors='coerce')
-        self.data = self.data.dropna(subset=['close'])
+        supertrend_period = self.params['supertrend_period']
+        atr_multiplier = self.params['atr_multiplier']
+        bollinger_period = self.params['bollinger_period']
+        bollinger_num_std_dev = self.params['bollinger_num_std_dev']
 
-        if len(self.data) < max(BOLLINGER_PERIOD, SUPER_TREND_PERIOD):
+        if len(self.data) < max(bollinger_period, supertrend_period):
             raise ValueError("Недостаточно данных для вычисления Supertrend и Bollinger Bands.")
 
-        self.data = supertrend(self.data, period=SUPER_TREND_PERIOD, atr_multiplier=ATR_MULTIPLIER)
-        self.data = bollinger_bands(self.data, period=BOLLINGER_PERIOD, num_std_dev=BOLLINGER_NUM_STD_DEV)
+        close = self.data['close'].to_numpy(dtype=np.float64)
+        supertrend_params = dict(period=supertrend_period, atr_multiplier=atr_multiplier)
+        bollinger_params = dict(period=bollinger_period, num_std_dev=bollinger_num_std_dev)
+        with self.stage('indicators'):
+            trend, final_upperband, final_lowerband = supertrend_arrays(self.data['high'], self.data['low'], close, supertrend_period, atr_multiplier)
+            middle_band, upper_band, lower_band = bollinger_arrays(close, bollinger_period, bollinger_num_std_dev)
 
-        self.data['in_flat'] = (self.data['close'] > self.data['lower_band']) & (self.data['close'] < self.data['upper_band'])
+            trend = self.features.put('supertrend', trend, **supertrend_params)
+            self.features.put('final_upperband', final_upperband, **supertrend_params)
+            self.features.put('final_lowerband', final_lowerband, **supertrend_params)
+            self.features.put('middle_band', middle_band, **bollinger_params)
+            upper_band = self.features.put('upper_band', upper_band, **bollinger_params)
+            lower_band = self.features.put('lower_band', lower_band, **bollinger_params)
 
-        signals = []
-        for index, row in self.data.iterrows():
-            if row['supertrend'] and (row['close'] < row['lower_band']) and not row['in_flat']:
-                signals.append((index, 'buy'))
-            elif not row['supertrend'] and (row['close'] > row['upper_band']) and not row['in_flat']:
-                signals.append((index, 'sell'))
+        in_flat = self.features.put('in_flat', (close > lower_band) & (close < upper_band), **bollinger_params)
 
-        self.logger.info(f"Generated {len(signals)} signals.")
+        buy = trend & (close < lower_band) & ~in_flat
+        sell = ~trend & (close > upper_band) & ~in_flat
+        signals = Signals.from_masks(self.data.index, buy, sell)
+
+        self.logger.info("Generated %d signals.", len(signals))
         return signals
 
-    def apply_stop_loss_and_take_profit(self, price, timestamp):
-        """Применяет стоп-лосс и тейк-профит уровни для стратегии Supertrend"""
-        if self.position > 0:
-            entry_price = self.trades[-1]['Price']
-            if self.position_type == 'Long':
-                if price >= entry_price * (1 + self.take_profit_percent):
-                    self.logger.info(f"Take profit triggered at {price} on {timestamp}")
-                    self.close_position(price, timestamp, 'Long')
-                elif price <= entry_price * (1 - self.stop_loss_percent):
-                    self.logger.info(f"Stop loss triggered at {price} on {timestamp}")
-                    self.close_position(price, timestamp, 'Long')
-            elif self.position_type == 'Short':
-                if price <= entry_price * (1 - self.take_profit_percent):
-                    self.logger.info(f"Take profit triggered at {price} on {timestamp}")
-                    self.close_position(price, timestamp, 'Short')
-                elif price >= entry_price * (1 + self.stop_loss_percent):
-                    self.logger.info(f"Stop loss triggered at {price} on {timestamp}")
-                    self.close_position(price, timestamp, 'Short')
+    def update(self, bar):
+        close = float(bar['close'])
+        if math.isnan(close):
+            # Бары без цены закрытия пропускаются, как в prepare_data()
+            return None
+        if self.stream is None:
+            self.stream = {
+                "supertrend": SupertrendState(self.params['supertrend_period'], self.params['atr_multiplier']),
+                "bollinger": RollingBollinger(self.params['bollinger_period'], self.params['bollinger_num_std_dev'])
+            }
+
+        trend, _, _ = self.stream["supertrend"].update(float(bar['high']), float(bar['low']), close)
+        # Распаковка как в bollinger_arrays(): вторым значением BBANDS идет средняя полоса
+        upper_band, lower_band, _ = self.stream["bollinger"].update(close)
+        in_flat = lower_band < close < upper_band
+
+        if trend and close < lower_band and not in_flat:
+            return 'buy'
+        if not trend and close > upper_band and not in_flat:
+            return 'sell'
+        return None
+
+    def simulation_params(self):
+        return {"rules": SUPERTREND_RULES, "take_profit": self.take_profit_percent,
+                "stop_loss": self.stop_loss_percent, "signal_sets_entry": True}
 
     def simulate_trading(self, signals):
         """Запускает симуляцию торговли на основе сгенерированных сигналов для Supertrend стратегии"""
         self.logger.info("Starting trade simulation for Supertrend Strategy...")
-        position = 0
-        balance = self.initial_balance
-        shares = 0
-        last_potential_trade = None
-        entry_price = None
-
-        for timestamp, signal in signals:
-            price = self.data.loc[timestamp, 'close']
-            
-            if signal == 'buy':
-                last_potential_trade = ('buy', price)
-            elif signal == 'sell':
-                last_potential_trade = ('sell', price)
-
-            if last_potential_trade:
-                trade_type, entry_price = last_potential_trade
-                last_potential_trade = None
-                if trade_type == 'buy' and position == 0:
-                    position = 1
-                    shares = balance // entry_price if self.whole_shares_only else balance / entry_price
-                    balance -= shares * entry_price
-                    self.record_trade(timestamp, 'Long', 'Open', shares, entry_price, 0, balance)
-                elif trade_type == 'sell' and position == 0:
-                    position = -1
-                    shares = balance // entry_price if self.whole_shares_only else balance / entry_price
-                    balance += shares * entry_price
-                    self.record_trade(timestamp, 'Short', 'Open', shares, entry_price, 0, balance)
-
-            if signal == 'sell' and position == 1:
-                profit = (price - entry_price) * shares
-                balance += shares * price
-                self.record_trade(timestamp, 'Long', 'Close', shares, price, profit, balance)
-                position = 0
-            elif signal == 'buy' and position == -1:
-                profit = (entry_price - price) * shares
-                balance -= shares * price
-                self.record_trade(timestamp, 'Short', 'Close', shares, price, profit, balance)
-                position = 0
-            elif position == 1:
-                if price >= entry_price * (1 + self.take_profit_percent) or price <= entry_price * (1 - self.stop_loss_percent):
-                    profit = (price - entry_price) * shares
-                    balance += shares * price
-                    self.record_trade(timestamp, 'Long', 'Close', shares, price, profit, balance)
-                    position = 0
-            elif position == -1:
-                if price <= entry_price * (1 - self.take_profit_percent) or price >= entry_price * (1 + self.stop_loss_percent):
-                    profit = (entry_price - price) * shares
-                    balance -= shares * price
-                    self.record_trade(timestamp, 'Short', 'Close', shares, price, profit, balance)
-                    position = 0
-
-        if position != 0:
-            self.logger.info("Closing open position at the end of the period...")
-            if position == 1:
-                profit = (self.data.iloc[-1]['close'] - entry_price) * shares
-                balance += shares * self.data.iloc[-1]['close']
-                self.record_trade(self.data.index[-1], 'Long', 'Close', shares, self.data.iloc[-1]['close'], profit, balance)
-            elif position == -1:
-                profit = (entry_price - self.data.iloc[-1]['close']) * shares
-                balance -= shares * self.data.iloc[-1]['close']
-                self.record_trade(self.data.index[-1], 'Short', 'Close', shares, self.data.iloc[-1]['close'], profit, balance)
-
-        results = {
-            "initial_balance": self.initial_balance,
-            "final_value": balance,
-            "trades": self.trades
-        }
-
+        results = self.run_simulation(signals, **self.simulation_params())
         self.logger.info("Trade simulation for Supertrend Strategy completed.")
         return results
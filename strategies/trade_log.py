@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from .ledger import LONG, SHORT_POSITION, TRADE_TYPES, DIRECTIONS
+
+ACTIONS = {0: 'Open', 1: 'Close'}
+ACTION_CODES = {name: code for code, name in ACTIONS.items()}
+COLUMNS = ['Date', 'Trade Type', 'Action', 'Shares', 'Price', 'Profit', 'Balance']
+DATE_FORMAT = '%d.%m.%Y %H:%M:%S%z'  # Формат даты при экспорте журнала сделок
+
+
+class TradeLog:
+    """Колоночный журнал сделок на предвыделенных массивах NumPy.
+
+    Даты хранятся как int64 наносекунды UTC, тип сделки и действие - как коды.
+    В DataFrame журнал преобразуется один раз, форматирование дат выполняется только при экспорте.
+    """
+
+    def __init__(self, capacity=64):
+        self._size = 0
+        self._tz = None
+        self._frame = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, '_columns', None)
+        columns = {
+            'timestamp': np.empty(capacity, dtype=np.int64),
+            'trade_type': np.empty(capacity, dtype=np.int8),
+            'action': np.empty(capacity, dtype=np.int8),
+            'shares': np.empty(capacity, dtype=np.float64),
+            'price': np.empty(capacity, dtype=np.float64),
+            'profit': np.empty(capacity, dtype=np.float64),
+            'balance': np.empty(capacity, dtype=np.float64),
+        }
+        if old is not None:
+            for name, values in old.items():
+                columns[name][:self._size] = values[:self._size]
+        self._columns = columns
+
+    @classmethod
+    def from_columns(cls, timestamps, tz, trade_type, action, shares, price, profit, balance):
+        """Журнал из готовых колонок: timestamps - int64 наносекунды UTC, trade_type - направления, action - коды"""
+        log = cls(capacity=max(1, len(timestamps)))
+        columns = {'timestamp': timestamps, 'trade_type': trade_type, 'action': action, 'shares': shares,
+                   'price': price, 'profit': profit, 'balance': balance}
+        for name, values in columns.items():
+            log._columns[name][:len(timestamps)] = values
+        log._size = len(timestamps)
+        log._tz = tz
+        return log
+
+    def append(self, timestamp, trade_type, action, shares, price, profit, balance):
+        if self._size == len(self._columns['timestamp']):
+            self._allocate(max(1, 2 * self._size))
+        timestamp = pd.Timestamp(timestamp)
+        if self._size == 0:
+            self._tz = timestamp.tz
+        i = self._size
+        columns = self._columns
+        columns['timestamp'][i] = timestamp.value
+        columns['trade_type'][i] = DIRECTIONS[trade_type]
+        columns['action'][i] = ACTION_CODES[action]
+        columns['shares'][i] = shares
+        columns['price'][i] = price
+        columns['profit'][i] = profit
+        columns['balance'][i] = balance
+        self._size += 1
+        self._frame = None
+
+    def __len__(self):
+        return self._size
+
+    def column(self, name):
+        """Массив значений колонки без копирования (timestamp, trade_type, action, shares, price, profit, balance)"""
+        return self._columns[name][:self._size]
+
+    def to_frame(self):
+        """Преобразует журнал в DataFrame с колонками COLUMNS, результат кэшируется до следующей сделки"""
+        if self._frame is None:
+            dates = pd.to_datetime(self.column('timestamp'), utc=True)
+            dates = dates.tz_convert(self._tz) if self._tz is not None else dates.tz_localize(None)
+            # Коды направления -1/1 сдвигаются на единицу для индексации массива названий
+            trade_types = np.array([TRADE_TYPES[SHORT_POSITION], '', TRADE_TYPES[LONG]], dtype=object)
+            actions = np.array([ACTIONS[0], ACTIONS[1]], dtype=object)
+            self._frame = pd.DataFrame({
+                'Date': dates,
+                'Trade Type': trade_types[self.column('trade_type') + 1],
+                'Action': actions[self.column('action')],
+                'Shares': self.column('shares').copy(),
+                'Price': self.column('price').copy(),
+                'Profit': self.column('profit').copy(),
+                'Balance': self.column('balance').copy(),
+            }, columns=COLUMNS)
+        return self._frame
+
+
+def format_trades(trades_df):
+    """Готовит журнал сделок к экспорту: даты переводятся в строки формата DATE_FORMAT"""
+    trades_df = trades_df.copy()
+    if pd.api.types.is_datetime64_any_dtype(trades_df['Date']):
+        trades_df['Date'] = trades_df['Date'].dt.strftime(DATE_FORMAT)
+    return trades_df
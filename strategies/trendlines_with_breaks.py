@@ -1,138 +1,208 @@
 from .base_strategy import BaseStrategy
+from .indicators import indicator
+from .signals import Signals, BUY, SELL
+from .ledger import LONG, SHORT_POSITION
+from .streaming import RollingATR, RollingStd, RollingLinregSlope, RollingPivot
+import math
 import numpy as np
 import pandas as pd
-import talib
-from config.config import TRENDLINES_LENGTH, TRENDLINES_MULTIPLIER, TRENDLINES_CALC_METHOD, TRENDLINES_BACKPAINT, TRENDLINES_TRAIL_PERCENT_TP, TRENDLINES_TRAIL_PERCENT_SL
+from config.config import TRENDLINES_LENGTH, TRENDLINES_MULTIPLIER, TRENDLINES_CALC_METHOD, TRENDLINES_SLOPE_MODE, TRENDLINES_BACKPAINT, TRENDLINES_TRAIL_PERCENT_TP, TRENDLINES_TRAIL_PERCENT_SL
+
+def _linreg_slope(close, length, end_offset):
+    """Наклон линейной регрессии по окну из length баров, заканчивающемуся на баре i - end_offset"""
+    out = np.full(len(close), np.nan)
+    first = length - 1 + end_offset
+    if len(close) <= first:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(close, length)
+    n = np.arange(length, dtype=np.float64)
+    covariance = windows @ n / length - windows.mean(axis=1) * n.mean()
+    out[first:] = (covariance / np.var(n) / 2)[:len(close) - first]
+    return out
+
+def slope_series(data, method, length, mult, mode='compat'):
+    """Ряд наклонов трендовых линий для каждого бара.
+
+    mode='point_in_time' использует только данные, известные на баре пика.
+    mode='compat' воспроизводит прежний расчет: для 'Atr' и 'Stdev' берется значение
+    последнего бара всей истории, для 'Linreg' - окно из length баров перед пиком.
+    'Atr' и 'Stdev' делятся на length, наклон 'Linreg' уже приходится на один бар.
+    """
+    close = data['close'].to_numpy(dtype=np.float64)
+    if method == 'Atr':
+        series = indicator('ATR', data['high'].to_numpy(dtype=np.float64), data['low'].to_numpy(dtype=np.float64), close, period=length) / length
+    elif method == 'Stdev':
+        series = indicator('STDEV', close, period=length) / length
+    elif method == 'Linreg':
+        series = _linreg_slope(close, length, end_offset=1 if mode == 'compat' else 0)
+    else:
+        raise ValueError(f"Неизвестный метод расчета наклона: {method}")
+
+    if mode == 'compat' and method != 'Linreg':
+        series = np.full(len(close), series[-1] if len(series) else np.nan)
+    elif mode not in ('compat', 'point_in_time'):
+        raise ValueError(f"Неизвестный режим расчета наклона: {mode}")
+    return series * mult
+
+def _last_pivot(flags, values, default=0.0):
+    """Значение на последнем баре с флагом для каждого бара (default до первого флага)"""
+    last = np.maximum.accumulate(np.where(flags, np.arange(len(flags)), -1))
+    return np.where(last >= 0, values[np.maximum(last, 0)], default)
+
+def trendlines(close, ph, pl, slopes, length):
+    """Строит трендовые линии от последних пиков и впадин.
+
+    Возвращает словарь массивов float64: upper, lower, slope_ph, slope_pl.
+    Пики учитываются начиная с бара length; NaN в ph/pl считается пиком, как и раньше.
+    """
+    n = len(close)
+    is_ph = ph != 0
+    is_pl = (pl != 0) & ~is_ph
+    is_ph[:length] = False
+    is_pl[:length] = False
+
+    offset = np.arange(n, dtype=np.float64) - length
+    upper = _last_pivot(is_ph, close) - _last_pivot(is_ph, slopes) * offset
+    lower = _last_pivot(is_pl, close) + _last_pivot(is_pl, slopes) * offset
+    upper[:length + 1] = np.nan
+    lower[:length + 1] = np.nan
+
+    return {
+        'upper': upper,
+        'lower': lower,
+        'slope_ph': np.where(is_ph, slopes, np.nan),
+        'slope_pl': np.where(is_pl, slopes, np.nan),
+    }
+
+# Покупка закрывает шорт, продажа закрывает лонг и сразу открывает шорт
+TRENDLINES_RULES = {
+    BUY: (SHORT_POSITION, LONG, False),
+    SELL: (LONG, SHORT_POSITION, True),
+}
 
 class TrendlinesWithBreaksStrategy(BaseStrategy):
+    @classmethod
+    def default_params(cls):
+        return {
+            "length": TRENDLINES_LENGTH,
+            "mult": TRENDLINES_MULTIPLIER,
+            "calc_method": TRENDLINES_CALC_METHOD,
+            "slope_mode": TRENDLINES_SLOPE_MODE,
+            "backpaint": TRENDLINES_BACKPAINT,
+            "trail_percent_tp": TRENDLINES_TRAIL_PERCENT_TP,
+            "trail_percent_sl": TRENDLINES_TRAIL_PERCENT_SL
+        }
+
     def generate_signals(self):
         self.logger.info("Generating Trendlines with Breaks signals...")
         
-        length = TRENDLINES_LENGTH
-        mult = TRENDLINES_MULTIPLIER
-        calcMethod = TRENDLINES_CALC_METHOD
-        backpaint = TRENDLINES_BACKPAINT
-
-        # Вычисление пиков и впадин
-        self.data['ph'] = self.data['close'].rolling(window=length).apply(lambda x: x.argmax() == (len(x) - 1), raw=True)
-        self.data['pl'] = self.data['close'].rolling(window=length).apply(lambda x: x.argmin() == (len(x) - 1), raw=True)
-
-        # Функция для расчета наклона
-        def calculate_slope(method, src, length, mult):
-            if method == 'Atr':
-                return talib.ATR(self.data['high'], self.data['low'], self.data['close'], timeperiod=length).iloc[-1] / length * mult
-            elif method == 'Stdev':
-                return self.data['close'].rolling(window=length).std().iloc[-1] / length * mult
-            elif method == 'Linreg':
-                n = np.arange(len(src))
-                slope = (talib.SMA(src * n, timeperiod=length).iloc[-1] - talib.SMA(src, timeperiod=length).iloc[-1] * talib.SMA(n, timeperiod=length).iloc[-1]) / np.var(n) / 2 * mult
-                return slope
-
-        # Инициализация переменных
-        self.data['upper'] = np.nan
-        self.data['lower'] = np.nan
-        self.data['slope_ph'] = np.nan
-        self.data['slope_pl'] = np.nan
-
-        signals = []
-        upper = lower = slope_ph = slope_pl = 0.0
-
-        for i in range(length, len(self.data)):
-            if self.data['ph'].iloc[i]:
-                slope_ph = calculate_slope(calcMethod, self.data['close'].iloc[i-length:i], length, mult)
-                upper = self.data['close'].iloc[i]
-            elif self.data['pl'].iloc[i]:
-                slope_pl = calculate_slope(calcMethod, self.data['close'].iloc[i-length:i], length, mult)
-                lower = self.data['close'].iloc[i]
-
-            if self.data['ph'].iloc[i]:
-                self.data.at[self.data.index[i], 'slope_ph'] = slope_ph
-            elif self.data['pl'].iloc[i]:
-                self.data.at[self.data.index[i], 'slope_pl'] = slope_pl
-
-            if i > length:
-                self.data.at[self.data.index[i], 'upper'] = upper - slope_ph * (i - length)
-                self.data.at[self.data.index[i], 'lower'] = lower + slope_pl * (i - length)
+        length = self.params['length']
+        mult = self.params['mult']
+        calcMethod = self.params['calc_method']
+        slope_mode = self.params['slope_mode']
+        backpaint = self.params['backpaint']
+
+        params = dict(length=length, mult=mult, calc_method=calcMethod, slope_mode=slope_mode)
+
+        close = self.data['close'].to_numpy(dtype=np.float64)
+        with self.stage('indicators'):
+            # Вычисление пиков и впадин
+            ph = self.features.put('ph', indicator('PIVOT_HIGH', close, length=length), length=length)
+            pl = self.features.put('pl', indicator('PIVOT_LOW', close, length=length), length=length)
+
+            # Наклон считается один раз для всех баров и берется на баре пика
+            slopes = slope_series(self.data, calcMethod, length, mult, slope_mode)
+
+            # Трендовые линии
+            lines = trendlines(close, ph, pl, slopes, length)
+            for name, values in lines.items():
+                lines[name] = self.features.put(name, values, **params)
 
         # Условия для открытия и закрытия позиций
-        self.data['upos'] = np.where(self.data['close'] > self.data['upper'], 1, 0)
-        self.data['dnos'] = np.where(self.data['close'] < self.data['lower'], 1, 0)
+        upos = self.features.put('upos', (close > lines['upper']).astype(np.int8), **params)
+        dnos = self.features.put('dnos', (close < lines['lower']).astype(np.int8), **params)
 
-        # Генерация сигналов
-        for i in range(1, len(self.data)):
-            if self.data['upos'].iloc[i] > self.data['upos'].iloc[i - 1]:
-                signals.append((self.data.index[i], 'buy'))
-            elif self.data['dnos'].iloc[i] > self.data['dnos'].iloc[i - 1]:
-                signals.append((self.data.index[i], 'sell'))
+        # Генерация сигналов по пересечениям
+        buy = np.zeros(len(close), dtype=bool)
+        sell = np.zeros(len(close), dtype=bool)
+        buy[1:] = upos[1:] > upos[:-1]
+        sell[1:] = dnos[1:] > dnos[:-1]
+        signals = Signals.from_masks(self.data.index, buy, sell)
 
-        self.logger.info(f"Generated {len(signals)} signals.")
+        self.logger.info("Generated %d signals.", len(signals))
         return signals
 
-    def simulate_trading(self, signals):
-        self.logger.info("Starting trade simulation for Trendlines with Breaks Strategy...")
-        position = 0
-        balance = self.initial_balance
-        shares = 0
-        entry_price = 0
-
-        for timestamp, signal in signals:
-            price = self.data.loc[timestamp, 'close']
-
-            if signal == 'buy' and position == 0:
-                shares = balance // price
-                balance -= shares * price
-                position = 1
-                entry_price = price
-                self.record_trade(timestamp, 'Long', 'Open', shares, price, 0, balance)
-            elif signal == 'sell' and position == 1:
-                balance += shares * price
-                profit = (price - entry_price) * shares
-                self.record_trade(timestamp, 'Long', 'Close', shares, price, profit, balance)
-                position = 0
-
-            if signal == 'sell' and position == 0:
-                shares = balance // price
-                balance += shares * price
-                position = -1
-                entry_price = price
-                self.record_trade(timestamp, 'Short', 'Open', shares, price, 0, balance)
-            elif signal == 'buy' and position == -1:
-                balance -= shares * price
-                profit = (entry_price - price) * shares
-                self.record_trade(timestamp, 'Short', 'Close', shares, price, profit, balance)
-                position = 0
-
-            # Применение плавающего тейк-профита и стоп-лосса
-            if position == 1:
-                if price >= entry_price * (1 + TRENDLINES_TRAIL_PERCENT_TP / 100) or price <= entry_price * (1 - TRENDLINES_TRAIL_PERCENT_SL / 100):
-                    balance += shares * price
-                    profit = (price - entry_price) * shares
-                    self.record_trade(timestamp, 'Long', 'Close', shares, price, profit, balance)
-                    position = 0
-            elif position == -1:
-                if price <= entry_price * (1 - TRENDLINES_TRAIL_PERCENT_TP / 100) or price >= entry_price * (1 + TRENDLINES_TRAIL_PERCENT_SL / 100):
-                    balance -= shares * price
-                    profit = (entry_price - price) * shares
-                    self.record_trade(timestamp, 'Short', 'Close', shares, price, profit, balance)
-                    position = 0
-
-        # Закрытие всех позиций в конце периода
-        if position != 0:
-            price = self.data['close'].iloc[-1]
-            if position == 1:
-                balance += shares * price
-                profit = (price - entry_price) * shares
-                self.record_trade(self.data.index[-1], 'Long', 'Close', shares, price, profit, balance)
-            elif position == -1:
-                balance -= shares * price
-                profit = (entry_price - price) * shares
-                self.record_trade(self.data.index[-1], 'Short', 'Close', shares, price, profit, balance)
-
-        results = {
-            "initial_balance": self.initial_balance,
-            "final_value": balance,
-            "trades": self.trades
+    def _stream_state(self):
+        """Состояние пошагового режима. Поддерживается только slope_mode='point_in_time':
+        в режиме 'compat' наклон зависит от последнего бара всей истории."""
+        length = self.params['length']
+        if self.params['slope_mode'] != 'point_in_time':
+            raise ValueError("Пошаговый режим поддерживает только slope_mode='point_in_time'")
+        slopes = {'Atr': RollingATR, 'Stdev': RollingStd, 'Linreg': RollingLinregSlope}
+        if self.params['calc_method'] not in slopes:
+            raise ValueError(f"Неизвестный метод расчета наклона: {self.params['calc_method']}")
+        return {
+            "bar": 0,
+            "pivot_high": RollingPivot(length, 1.0),
+            "pivot_low": RollingPivot(length, -1.0),
+            "slope": slopes[self.params['calc_method']](length),
+            "ph": (0.0, 0.0),  # (close, наклон) на последнем пике
+            "pl": (0.0, 0.0),  # (close, наклон) на последней впадине
+            "upos": False,
+            "dnos": False,
         }
 
+    def update(self, bar):
+        if self.stream is None:
+            self.stream = self._stream_state()
+        state = self.stream
+        length = self.params['length']
+        i = state["bar"]
+        state["bar"] += 1
+
+        close = float(bar['close'])
+        ph = state["pivot_high"].update(close)
+        pl = state["pivot_low"].update(close)
+        if self.params['calc_method'] == 'Atr':
+            slope = state["slope"].update(float(bar['high']), float(bar['low']), close) / length
+        elif self.params['calc_method'] == 'Stdev':
+            slope = state["slope"].update(close) / length
+        else:
+            slope = state["slope"].update(close)
+        slope = slope * self.params['mult']
+
+        # NaN в ph/pl считается пиком, как в trendlines()
+        is_ph = i >= length and ph != 0
+        is_pl = i >= length and pl != 0 and not is_ph
+        if is_ph:
+            state["ph"] = (close, slope)
+        if is_pl:
+            state["pl"] = (close, slope)
+
+        if i <= length:
+            upper = lower = math.nan
+        else:
+            upper = state["ph"][0] - state["ph"][1] * (i - length)
+            lower = state["pl"][0] + state["pl"][1] * (i - length)
+
+        upos = close > upper
+        dnos = close < lower
+        buy = upos and not state["upos"]
+        sell = dnos and not state["dnos"]
+        state["upos"], state["dnos"] = upos, dnos
+        if buy:
+            return 'buy'
+        if sell:
+            return 'sell'
+        return None
+
+    def simulation_params(self):
+        # Применение плавающего тейк-профита и стоп-лосса
+        return {"rules": TRENDLINES_RULES, "take_profit": self.params['trail_percent_tp'] / 100,
+                "stop_loss": self.params['trail_percent_sl'] / 100, "signal_sets_entry": False}
+
+    def simulate_trading(self, signals):
+        self.logger.info("Starting trade simulation for Trendlines with Breaks Strategy...")
+        results = self.run_simulation(signals, **self.simulation_params())
         self.logger.info("Trade simulation for Trendlines with Breaks Strategy completed.")
         return results
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_ohlc(n=500, seed=0, start='2024-01-02 09:30', freq='5min', tz='America/New_York'):
+    """Синтетические OHLCV данные: случайное блуждание цены закрытия."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close + rng.normal(0, 0.3, n)
+    high = np.maximum(open_, close) + rng.uniform(0, 1, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 1, n)
+    volume = rng.integers(1_000, 100_000, n).astype(float)
+    index = pd.date_range(start, periods=n, freq=freq, tz=tz)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+
+def trades_as_tuples(trades):
+    """Приводит журнал сделок стратегии к кортежам (timestamp, type, action, shares, price, profit, balance)."""
+    return list(trades[['Date', 'Trade Type', 'Action', 'Shares', 'Price', 'Profit', 'Balance']].itertuples(index=False, name=None))
+
+
+@pytest.fixture
+def ohlc():
+    return make_ohlc()
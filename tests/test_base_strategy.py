@@ -0,0 +1,153 @@
+import pandas as pd
+import pytest
+
+from strategies.base_strategy import BaseStrategy
+from strategies.signals import Signals
+from strategies.trade_log import format_trades
+from tests.conftest import make_ohlc, trades_as_tuples
+
+
+def reference_simulate_trading(data, signals, initial_balance, whole_shares_only):
+    """Исходный симулятор BaseStrategy (без учета ошибочного расчета прибыли).
+
+    Открытие игнорируется только при позиции того же направления: противоположная позиция
+    открывается поверх текущей, количество акций суммируется со знаком.
+    """
+    trades = []
+    balance = initial_balance
+    position = 0
+    position_type = None
+
+    for timestamp, signal in signals:
+        price = data.loc[timestamp, 'close']
+        trade_type = 'Long' if signal in ('buy', 'sell') else 'Short'
+        if signal in ('buy', 'short') and position_type != trade_type:
+            shares = balance // price if whole_shares_only else balance / price
+            if shares > 0:
+                position += shares if trade_type == 'Long' else -shares
+                balance += -shares * price if trade_type == 'Long' else shares * price
+                trades.append((timestamp, trade_type, 'Open', shares, price, balance))
+                position_type = trade_type
+        elif signal in ('sell', 'cover') and position != 0 and position_type == trade_type:
+            proceeds = abs(position) * price
+            balance += proceeds if trade_type == 'Long' else -proceeds
+            trades.append((timestamp, trade_type, 'Close', abs(position), price, balance))
+            position = 0
+            position_type = None
+
+    if position != 0:
+        price = data.iloc[-1]['close']
+        proceeds = abs(position) * price
+        balance += proceeds if position_type == 'Long' else -proceeds
+        trades.append((data.index[-1], position_type, 'Close', abs(position), price, balance))
+    return balance, trades
+
+
+SIGNAL_SEQUENCE = ['buy', 'buy', 'sell', 'sell', 'short', 'cover', 'buy', 'cover', 'sell', 'short']
+
+
+@pytest.mark.parametrize('whole_shares_only', [True, False])
+@pytest.mark.parametrize('as_list', [True, False])
+def test_simulate_trading_matches_original(whole_shares_only, as_list):
+    data = make_ohlc(200, seed=2)
+    signals = [(data.index[10 + 15 * i], signal) for i, signal in enumerate(SIGNAL_SEQUENCE)]
+    expected_balance, expected_trades = reference_simulate_trading(data, signals, 1000, whole_shares_only)
+
+    strategy = BaseStrategy(data, 1000, whole_shares_only)
+    results = strategy.simulate_trading(signals if as_list else Signals.from_list(data.index, signals))
+    trades = [trade[:5] + trade[6:] for trade in trades_as_tuples(results['trades'])]
+
+    assert results['final_value'] == expected_balance
+    assert trades == expected_trades
+    assert strategy.position == 0 and strategy.position_type is None
+
+
+def test_signals_with_unknown_timestamp_raise_key_error():
+    data = make_ohlc(50, seed=2)
+    missing = data.index[-1] + pd.Timedelta(days=1)
+    signals = [(data.index[5], 'buy'), (missing, 'sell')]
+
+    with pytest.raises(KeyError, match=str(missing)):
+        Signals.from_list(data.index, signals)
+    assert len(Signals.from_list(data.index, [])) == 0
+
+
+def test_opposite_open_is_ignored_while_in_position():
+    # Изменение поведения: прежний симулятор открывал лонг поверх шорта на деньги от продажи в шорт,
+    # теперь сигнал на открытие при любой открытой позиции игнорируется
+    data = make_ohlc(200, seed=2)
+    signals = [(data.index[i], signal) for i, signal in [(10, 'short'), (30, 'buy'), (50, 'sell'), (70, 'cover')]]
+
+    results = BaseStrategy(data, 1000).simulate_trading(signals)
+    trades = trades_as_tuples(results['trades'])
+
+    close = data['close']
+    shares = 1000 // close.iloc[10]
+    expected_balance = 1000 - shares * (close.iloc[70] - close.iloc[10])
+    assert [trade[:3] for trade in trades] == [(data.index[10], 'Short', 'Open'), (data.index[70], 'Short', 'Close')]
+    assert results['final_value'] == pytest.approx(expected_balance)
+
+    original_balance, original_trades = reference_simulate_trading(data, signals, 1000, True)
+    assert [trade[1:3] for trade in original_trades] == [('Short', 'Open'), ('Long', 'Open'), ('Long', 'Close')]
+    assert original_balance != pytest.approx(expected_balance)
+
+
+def test_first_round_trip_profit():
+    data = make_ohlc(50, seed=1)
+    strategy = BaseStrategy(data, 1000)
+    results = strategy.simulate_trading([(data.index[5], 'buy'), (data.index[20], 'sell')])
+
+    open_trade, close_trade = results['trades'].to_dict('records')
+    assert close_trade['Profit'] == pytest.approx((close_trade['Price'] - open_trade['Price']) * open_trade['Shares'])
+    assert results['final_value'] == pytest.approx(1000 + close_trade['Profit'])
+
+
+def test_close_position_profit_after_several_round_trips():
+    data = make_ohlc(50, seed=4)
+    strategy = BaseStrategy(data, 1000)
+    prices = [100.0, 110.0, 120.0, 90.0, 95.0, 80.0]
+    strategy.open_position(prices[0], data.index[0], 'Long')
+    strategy.close_position(prices[1], data.index[1], 'Long')
+    strategy.open_position(prices[2], data.index[2], 'Short')
+    strategy.close_position(prices[3], data.index[3], 'Short')
+    strategy.open_position(prices[4], data.index[4], 'Long')
+    strategy.close_position(prices[5], data.index[5], 'Long')
+
+    trades = strategy.trades.to_frame()
+    profits = trades.loc[trades['Action'] == 'Close', 'Profit'].tolist()
+    assert profits == [10 * 10.0, 9 * 30.0, 14 * -15.0]
+    assert strategy.ledger.realized_pnl == sum(profits)
+    assert strategy.balance == 1000 + sum(profits)
+
+
+def test_results_expose_running_pnl():
+    data = make_ohlc(50, seed=4)
+    strategy = BaseStrategy(data, 1000)
+    strategy.open_position(100.0, data.index[0], 'Long')
+    strategy.open_position(50.0, data.index[1], 'Short')  # игнорируется, позиция уже открыта
+
+    results = strategy.results
+    last_price = data['close'].iloc[-1]
+    assert strategy.position == 10 and strategy.position_type == 'Long'
+    assert results['realized_pnl'] == 0.0
+    assert results['unrealized_pnl'] == pytest.approx((last_price - 100.0) * 10)
+    assert results['final_value'] == pytest.approx(1000 + results['unrealized_pnl'])
+
+
+def test_trade_log_converts_to_frame_once_and_formats_on_export():
+    data = make_ohlc(50, seed=4)
+    strategy = BaseStrategy(data, 1000)
+    for i in range(100):  # больше начальной емкости журнала
+        strategy.record_trade(data.index[i % 50], 'Long' if i % 2 else 'Short', 'Open' if i % 3 else 'Close', i, 1.5, 0.0, 1000.0)
+
+    frame = strategy.trades.to_frame()
+    assert len(strategy.trades) == 100
+    assert frame is strategy.trades.to_frame()
+    assert frame['Date'].dt.tz == data.index.tz
+    assert list(frame['Date'][:3]) == list(data.index[:3])
+    assert list(frame['Trade Type'][:2]) == ['Short', 'Long']
+    assert list(frame['Action'][:4]) == ['Close', 'Open', 'Open', 'Close']
+
+    exported = format_trades(frame)
+    assert exported['Date'][0] == data.index[0].strftime('%d.%m.%Y %H:%M:%S%z')
+    assert pd.api.types.is_datetime64_any_dtype(frame['Date'])
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+import strategies.batch as batch_module
+import strategies.simulator as simulator_module
+import utils.runner as runner
+from strategies.batch import align_left, backtest_supertrend_batch
+from strategies.ledger import PositionLedger
+from strategies.signals import Signals, BUY, SELL, SHORT, COVER
+from strategies.simulator import BASE_RULES, simulate, simulate_batch
+from strategies.supertrend import SupertrendStrategy
+from tests.conftest import make_ohlc
+
+
+@pytest.fixture(params=[True, False], ids=['numba', 'python'])
+def use_numba(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(batch_module, 'njit', None)
+        monkeypatch.setattr(simulator_module, 'njit', None)
+    elif simulator_module.njit is None:
+        pytest.skip("Numba не установлена")
+    return request.param
+
+
+def make_datasets():
+    datasets = {f"T{i}": make_ohlc(400 + 250 * i, seed=i) for i in range(5)}
+    gaps = datasets['T2']
+    gaps.iloc[[50, 51, 300], gaps.columns.get_loc('close')] = np.nan
+    datasets['SHORT'] = make_ohlc(10, seed=9)
+    return datasets
+
+
+def test_align_left():
+    matrix, lengths = align_left([np.array([1.0, 2.0, 3.0]), np.array([4.0])])
+    np.testing.assert_array_equal(lengths, [3, 1])
+    np.testing.assert_array_equal(matrix, [[1.0, 4.0], [2.0, np.nan], [3.0, np.nan]])
+
+
+@pytest.mark.parametrize('whole_shares_only', [True, False])
+@pytest.mark.parametrize('params', [None, {'supertrend_period': 7, 'atr_multiplier': 1.5, 'stop_loss_percent': 0.02}])
+def test_batch_matches_single_ticker(use_numba, whole_shares_only, params):
+    datasets = make_datasets()
+    results = backtest_supertrend_batch(datasets, 1000, whole_shares_only, params)
+
+    assert 'SHORT' not in results
+    for ticker, data in datasets.items():
+        if ticker == 'SHORT':
+            continue
+        expected = SupertrendStrategy(data, 1000, whole_shares_only, params).backtest()
+        assert results[ticker]['final_value'] == expected['final_value']
+        assert results[ticker]['realized_pnl'] == expected['realized_pnl']
+        assert results[ticker]['trades'].equals(expected['trades'])
+
+
+def test_simulate_batch_matches_simulate_with_base_rules(use_numba):
+    rng = np.random.default_rng(5)
+    closes = [make_ohlc(n, seed=n)['close'].to_numpy() for n in (120, 300, 200)]
+    codes = [np.where(rng.random(len(c)) < 0.1, rng.choice([BUY, SELL, SHORT, COVER], len(c)), 0).astype(np.int8) for c in closes]
+    close, lengths = align_left(closes)
+    code_matrix = align_left(codes, fill=0)[0].astype(np.int8)
+
+    result = simulate_batch(close, code_matrix, lengths, 1000, BASE_RULES, take_profit=0.01, stop_loss=0.01)
+
+    trades = result['trades']
+    for j, (column_close, column_codes) in enumerate(zip(closes, codes)):
+        recorded = []
+        positions = np.flatnonzero(column_codes)
+        ledger = simulate(column_close, Signals(None, positions, column_codes[positions]), PositionLedger(1000),
+                          lambda *trade: recorded.append(trade), take_profit=0.01, stop_loss=0.01)
+        mine = trades['column'] == j
+        assert result['balance'][j] == ledger.balance
+        assert result['realized_pnl'][j] == ledger.realized_pnl
+        assert list(trades['row'][mine]) == [trade[0] for trade in recorded]
+        assert list(trades['profit'][mine]) == [trade[5] for trade in recorded]
+        assert list(trades['balance'][mine]) == [trade[6] for trade in recorded]
+
+
+def test_runner_batch_mode_matches_per_ticker(monkeypatch):
+    datasets = {ticker: data for ticker, data in make_datasets().items() if ticker != 'SHORT'}
+    monkeypatch.setattr(runner, 'load_data', lambda ticker, interval: datasets.get(ticker))
+    jobs = runner.make_jobs(['supertrend', 'trendlines_with_breaks'], ['5m'], list(datasets) + ['MISSING'])
+
+    single = runner.run_backtests(jobs, max_workers=1, batch=False)
+    batched = runner.run_backtests(jobs, max_workers=1, batch=True)
+
+    assert [job for job, _, _ in batched] == jobs
+    for (job, expected, _), (_, actual, _) in zip(single, batched):
+        if expected is None:
+            assert actual is None
+            continue
+        assert actual['final_value'] == expected['final_value']
+        assert actual['trades'].equals(expected['trades'])
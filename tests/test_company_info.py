@@ -0,0 +1,52 @@
+import json
+
+from utils.company_info import CompanyInfoCache
+from utils.providers import DataProvider
+
+
+class FakeProvider(DataProvider):
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+
+    def fetch_info(self, ticker):
+        self.calls.append(ticker)
+        if ticker in self.failing:
+            raise ConnectionError("network down")
+        return {"name": f"{ticker} Inc.", "country": "United States", "exchange": "NMS"}
+
+
+def test_prefetch_fills_cache_once(tmp_path):
+    path = str(tmp_path / 'company_info.json')
+    provider = FakeProvider()
+    cache = CompanyInfoCache(path, ttl=3600)
+
+    assert sorted(cache.prefetch(['AAPL', 'MSFT', 'AAPL'], provider)) == ['AAPL', 'MSFT']
+    assert cache.prefetch(['AAPL', 'MSFT'], provider) == []
+    assert sorted(provider.calls) == ['AAPL', 'MSFT']
+
+    # Новый экземпляр читает файл и не обращается к сети
+    reloaded = CompanyInfoCache(path, ttl=3600)
+    assert reloaded.get('AAPL') == {"name": "AAPL Inc.", "ticker": "AAPL", "country": "United States", "exchange": "NMS"}
+    assert reloaded.prefetch(['AAPL'], provider) == []
+
+
+def test_get_never_fetches(tmp_path):
+    cache = CompanyInfoCache(str(tmp_path / 'company_info.json'))
+    assert cache.get('TSLA') == {"name": "N/A", "ticker": "TSLA", "country": "N/A", "exchange": "N/A"}
+    assert not (tmp_path / 'company_info.json').exists()
+
+
+def test_expired_entries_are_refreshed_and_kept_on_failure(tmp_path):
+    path = tmp_path / 'company_info.json'
+    path.write_text(json.dumps({
+        "AAPL": {"name": "Old name", "country": "US", "exchange": "NMS", "fetched_at": 0},
+        "MSFT": {"name": "Old name", "country": "US", "exchange": "NMS", "fetched_at": 0},
+    }))
+    provider = FakeProvider(failing=['MSFT'])
+    cache = CompanyInfoCache(str(path), ttl=3600)
+
+    assert cache.prefetch(['AAPL', 'MSFT'], provider) == ['AAPL']
+    assert cache.get('AAPL')['name'] == 'AAPL Inc.'
+    assert cache.get('MSFT')['name'] == 'Old name'
+    assert json.loads(path.read_text())['AAPL']['fetched_at'] > 0
@@ -0,0 +1,258 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.data_loader as data_loader
+from utils.data_cache import DataCache
+from utils.providers import DataProvider
+from utils.storage import STORAGE_BACKENDS, get_storage, migrate_csv, normalize_data
+from tests.conftest import make_ohlc
+
+
+def write_yfinance_csv(path, data):
+    """Пишет CSV в формате новых версий yfinance: двухуровневый заголовок (Price, Ticker)."""
+    data = data.rename(columns=str.title)
+    data.columns = pd.MultiIndex.from_product([data.columns, ['AAPL']], names=['Price', 'Ticker'])
+    data.index.name = 'Date'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data.to_csv(path)
+
+
+@pytest.mark.parametrize('storage_format', sorted(STORAGE_BACKENDS))
+def test_storage_round_trip(tmp_path, storage_format):
+    pytest.importorskip('pyarrow') if storage_format in ('parquet', 'feather') else None
+    storage = get_storage(storage_format, str(tmp_path))
+    data = normalize_data(make_ohlc(100))
+
+    storage.write('AAPL', '1h', data)
+    loaded = storage.read('AAPL', '1h')
+
+    assert storage.exists('AAPL', '1h')
+    assert list(loaded.columns) == ['open', 'high', 'low', 'close', 'volume']
+    assert str(loaded.index.tz) == 'UTC'
+    pd.testing.assert_frame_equal(loaded, data, check_freq=False)
+
+
+def test_migrate_yfinance_csv(tmp_path):
+    data = make_ohlc(50)
+    write_yfinance_csv(tmp_path / '1d' / 'AAPL_1d.csv', data)
+    storage = get_storage('npy', str(tmp_path))
+
+    migrated = migrate_csv('AAPL', '1d', storage)
+
+    assert storage.exists('AAPL', '1d')
+    assert list(migrated.columns) == ['open', 'high', 'low', 'close', 'volume']
+    np.testing.assert_allclose(migrated['close'].to_numpy(), data['close'].to_numpy())
+    assert (migrated.index == data.index.tz_convert('UTC')).all()
+    pd.testing.assert_frame_equal(storage.read('AAPL', '1d'), migrated, check_freq=False)
+
+
+def test_load_data_migrates_csv_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'DATA_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(data_loader, 'DATA_STORAGE_FORMAT', 'npy')
+    monkeypatch.setattr(data_loader, 'download_data', lambda ticker, interval: pytest.fail("unexpected download"))
+    write_yfinance_csv(tmp_path / '5m' / 'MSFT_5m.csv', make_ohlc(30))
+
+    first = data_loader.load_cached_data('MSFT', '5m', str(tmp_path))
+    (tmp_path / '5m' / 'MSFT_5m.csv').unlink()
+    second = data_loader.load_cached_data('MSFT', '5m', str(tmp_path))
+
+    pd.testing.assert_frame_equal(first, second, check_freq=False)
+    assert data_loader.load_cached_data('MSFT', '1d', str(tmp_path)) is None
+
+
+def test_offline_load_data_skips_download(monkeypatch):
+    monkeypatch.setattr(data_loader, 'OFFLINE_MODE', True)
+    monkeypatch.setattr(data_loader, 'load_cached_data', lambda ticker, interval: None)
+    monkeypatch.setattr(data_loader, 'download_data', lambda ticker, interval: pytest.fail("unexpected download"))
+
+    assert data_loader.load_data('MSFT', '1d') is None
+
+
+class FakeProvider(DataProvider):
+    """Локальный провайдер: отдает срезы заранее заданных данных и запоминает запросы."""
+
+    def __init__(self, datasets, failures=0):
+        self.datasets = datasets
+        self.failures = failures
+        self.calls = []
+
+    def fetch(self, tickers, interval, start=None, end=None):
+        self.calls.append((tuple(tickers), interval, start))
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("temporary failure")
+        result = {}
+        for ticker in tickers:
+            data = self.datasets[(ticker, interval)]
+            if start is not None:
+                data = data[data.index >= start]
+            result[ticker] = data[data.index < end].rename(columns=str.title)
+        return result
+
+
+def recent_ohlc(n, seed, freq='1h'):
+    start = pd.Timestamp.now(tz='UTC').floor('h') - pd.Timedelta(hours=n)
+    return make_ohlc(n, seed=seed, start=start, freq=freq, tz='UTC')
+
+
+def test_sync_downloads_missing_then_only_tail(tmp_path):
+    full = {(ticker, '1h'): recent_ohlc(100, seed) for seed, ticker in enumerate(['AAPL', 'MSFT', 'TSLA'])}
+    initial = {key: data.iloc[:80] for key, data in full.items()}
+    provider = FakeProvider(initial)
+
+    updated = data_loader.sync_data(['AAPL', 'MSFT', 'TSLA'], ['1h'], provider=provider, mode='incremental',
+                                    batch_size=2, backoff=0, data_directory=str(tmp_path))
+
+    assert sorted(updated) == [('AAPL', '1h'), ('MSFT', '1h'), ('TSLA', '1h')]
+    assert sorted(len(call[0]) for call in provider.calls) == [1, 2]
+
+    provider = FakeProvider(full)
+    data_loader.sync_data(['AAPL', 'MSFT', 'TSLA'], ['1h'], provider=provider, mode='incremental',
+                          batch_size=3, backoff=0, data_directory=str(tmp_path))
+
+    assert provider.calls == [(('AAPL', 'MSFT', 'TSLA'), '1h', initial[('AAPL', '1h')].index[-1])]
+    for (ticker, interval), data in full.items():
+        synced = data_loader.load_cached_data(ticker, interval, str(tmp_path))
+        pd.testing.assert_frame_equal(synced, normalize_data(data), check_freq=False)
+
+
+def test_sync_missing_mode_skips_existing_files(tmp_path):
+    datasets = {('AAPL', '1h'): recent_ohlc(50, 1)}
+    data_loader.sync_data(['AAPL'], ['1h'], provider=FakeProvider(datasets), mode='missing', data_directory=str(tmp_path))
+
+    provider = FakeProvider(datasets)
+    assert data_loader.sync_data(['AAPL'], ['1h'], provider=provider, mode='missing', data_directory=str(tmp_path)) == []
+    assert provider.calls == []
+
+
+def test_sync_retries_failed_requests(tmp_path):
+    provider = FakeProvider({('AAPL', '1h'): recent_ohlc(50, 2)}, failures=2)
+
+    updated = data_loader.sync_data(['AAPL'], ['1h'], provider=provider, retries=2, backoff=0, data_directory=str(tmp_path))
+
+    assert updated == [('AAPL', '1h')]
+    assert len(provider.calls) == 3
+
+
+def test_sync_gives_up_after_retries(tmp_path):
+    provider = FakeProvider({('AAPL', '1h'): recent_ohlc(50, 2)}, failures=5)
+
+    assert data_loader.sync_data(['AAPL'], ['1h'], provider=provider, retries=1, backoff=0, data_directory=str(tmp_path)) == []
+    assert len(provider.calls) == 2
+
+
+def test_load_cached_data_uses_shared_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'DATA_STORAGE_FORMAT', 'npy')
+    monkeypatch.setattr(data_loader, 'data_cache', DataCache(10 * 1024 ** 2))
+    cache = data_loader.data_cache
+    data_loader.save_data('AAPL', '1d', make_ohlc(100), str(tmp_path))
+
+    first = data_loader.load_cached_data('AAPL', '1d', str(tmp_path))
+    if int(pd.__version__.split('.')[0]) >= 3:
+        first.iloc[0, first.columns.get_loc('close')] = -1.0  # Copy-on-Write копирует колонку
+    else:
+        with pytest.raises(ValueError):
+            first.iloc[0, first.columns.get_loc('close')] = -1.0
+    first['supertrend'] = True
+    first['open'] = 0.0
+    second = data_loader.load_cached_data('AAPL', '1d', str(tmp_path))
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not second['close'].to_numpy().flags.writeable
+    assert (second['open'] > 0).all()
+    assert second['close'].iloc[0] > 0
+    assert 'supertrend' not in second.columns
+
+
+def test_data_cache_evicts_least_recently_used():
+    frame = make_ohlc(100)
+    size = int(frame.memory_usage(index=True).sum())
+    cache = DataCache(2 * size)
+
+    for key in ['a', 'b', 'a', 'c']:
+        cache.get((key, None), lambda: frame)
+
+    assert cache.evictions == 1
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.get(('a', None), lambda: pytest.fail("'a' should still be cached"))
+
+
+def test_data_cache_reloads_changed_file():
+    cache = DataCache(10 * 1024 ** 2)
+    cache.get(('AAPL', '1d', 1.0), lambda: make_ohlc(10))
+    reloaded = cache.get(('AAPL', '1d', 2.0), lambda: make_ohlc(20))
+
+    assert len(reloaded) == 20
+    assert cache.misses == 2
+    assert cache.current_bytes == int(make_ohlc(20).memory_usage(index=True).sum())
+
+
+def session_ohlc(days, seed=0, freq='5min'):
+    """Бары только в торговую сессию 9:30-16:00 по Нью-Йорку, включая переход на летнее время"""
+    sessions = pd.bdate_range('2024-03-06', periods=days)
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(day + pd.Timedelta(hours=9, minutes=30), day + pd.Timedelta(hours=15, minutes=55), freq=freq,
+                      tz='America/New_York').tz_convert('UTC').as_unit('ns').asi8 for day in sessions]), tz='UTC')
+    data = make_ohlc(len(index), seed=seed)
+    data.index = index
+    return normalize_data(data)
+
+
+@pytest.mark.parametrize('interval, bars_per_day, first_bar', [('15m', 26, '09:30'), ('30m', 13, '09:30')])
+def test_resample_intraday_follows_session(interval, bars_per_day, first_bar):
+    data = session_ohlc(5)
+    resampled = data_loader.resample_ohlcv(data, interval)
+
+    local = resampled.index.tz_convert('America/New_York')
+    assert len(resampled) == 5 * bars_per_day
+    assert set(local.strftime('%H:%M')[::bars_per_day]) == {first_bar}
+    assert resampled['volume'].sum() == data['volume'].sum()
+
+    # Первый бар каждого интервала совпадает с агрегированием исходных баров вручную
+    first = data[(data.index >= resampled.index[1]) & (data.index < resampled.index[2])]
+    row = resampled.iloc[1]
+    assert (row['open'], row['high'], row['low'], row['close'], row['volume']) == (
+        first['open'].iloc[0], first['high'].max(), first['low'].min(), first['close'].iloc[-1], first['volume'].sum())
+
+
+def test_resample_weekly_and_monthly_from_daily():
+    # Дневные бары в том виде, в каком они сохраняются: даты без времени, после normalize_data - полночь по UTC
+    daily = make_ohlc(60, start='2024-01-01', freq='B', tz=None)
+    daily.index = daily.index.strftime('%Y-%m-%d')
+    daily = normalize_data(daily)
+
+    weekly = data_loader.resample_ohlcv(daily, '1wk')
+    monthly = data_loader.resample_ohlcv(daily, '1mo')
+
+    dates = daily.index.tz_localize(None)
+    assert list(weekly.index.strftime('%Y-%m-%d')[:3]) == ['2024-01-01', '2024-01-08', '2024-01-15']
+    assert list(monthly.index.strftime('%Y-%m-%d')) == ['2024-01-01', '2024-02-01', '2024-03-01']
+    # Понедельник 2024-01-01 открывает первую неделю, пятница 2024-01-05 ее закрывает
+    first_week = daily[(dates >= '2024-01-01') & (dates < '2024-01-08')]
+    assert len(first_week) == 5
+    assert (weekly['open'].iloc[0], weekly['close'].iloc[0]) == (first_week['open'].iloc[0], first_week['close'].iloc[-1])
+    february = daily[(dates >= '2024-02-01') & (dates < '2024-03-01')]
+    assert (monthly['open'].iloc[1], monthly['close'].iloc[1]) == (february['open'].iloc[0], february['close'].iloc[-1])
+    assert weekly['volume'].sum() == monthly['volume'].sum() == daily['volume'].sum()
+    assert weekly['high'].max() == daily['high'].max()
+
+
+def test_sync_derives_coarser_intervals_instead_of_downloading(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, 'RESAMPLE_INTERVALS', True)
+    start = pd.Timestamp.now(tz='UTC').floor('h') - pd.Timedelta(hours=50)
+    datasets = {('AAPL', '5m'): make_ohlc(600, seed=1, start=start, tz='UTC')}
+    provider = FakeProvider(datasets)
+
+    updated = data_loader.sync_data(['AAPL'], ['5m', '15m', '30m'], provider=provider, mode='missing',
+                                    data_directory=str(tmp_path))
+
+    assert [interval for _, interval, _ in provider.calls] == ['5m']
+    assert sorted(updated) == [('AAPL', '15m'), ('AAPL', '30m'), ('AAPL', '5m')]
+    derived = data_loader.load_cached_data('AAPL', '15m', str(tmp_path))
+    source = data_loader.load_cached_data('AAPL', '5m', str(tmp_path))
+    pd.testing.assert_frame_equal(derived, data_loader.resample_ohlcv(source, '15m'), check_freq=False)
+
+    # Без обновления источника производные данные не пересчитываются
+    assert data_loader.sync_data(['AAPL'], ['5m', '15m'], provider=provider, mode='missing',
+                                 data_directory=str(tmp_path)) == []
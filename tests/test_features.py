@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from strategies.features import FeatureStore
+from strategies.supertrend import SupertrendStrategy
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from tests.conftest import make_ohlc
+
+
+def test_feature_store_keys_by_name_and_params():
+    data = make_ohlc(10)
+    store = FeatureStore(data.index)
+    store.put('sma', np.arange(10.0), period=3)
+    store.put('sma', np.arange(10.0) * 2, period=5)
+    store.put('mask', np.ones(10, dtype=bool))
+
+    np.testing.assert_array_equal(store.get('sma', period=5), np.arange(10.0) * 2)
+    assert FeatureStore.key('sma', period=3) in store
+    assert list(store.to_frame().columns) == ['sma[period=3]', 'sma[period=5]', 'mask']
+    with pytest.raises(ValueError):
+        store.put('short', np.arange(3.0))
+
+
+def test_feature_store_float32_halves_memory():
+    data = make_ohlc(100)
+    store64 = FeatureStore(data.index)
+    store32 = FeatureStore(data.index, float32=True)
+    for store in (store64, store32):
+        store.put('close', data['close'].to_numpy())
+        store.put('flag', np.zeros(100, dtype=np.int8))
+
+    assert store32.get('close').dtype == np.float32
+    assert store32.get('flag').dtype == np.int8
+    assert store32.nbytes == 100 * 4 + 100
+    assert store64.nbytes == 100 * 8 + 100
+
+
+@pytest.mark.parametrize('strategy_class', [SupertrendStrategy, TrendlinesWithBreaksStrategy])
+def test_backtest_leaves_input_untouched(strategy_class):
+    data = make_ohlc(600, seed=2)
+    original = data.copy()
+
+    results = strategy_class(data, 1000).backtest()
+
+    assert data.equals(original)
+    assert list(data.columns) == list(original.columns)
+    assert results['memory']['feature_bytes'] > 0
+    assert results['memory']['data_bytes'] > 0
+
+
+def test_supertrend_does_not_rename_input_columns():
+    data = make_ohlc(600, seed=2).rename(columns=str.capitalize)
+    original = data.copy()
+
+    SupertrendStrategy(data, 1000).generate_signals()
+
+    assert data.equals(original)
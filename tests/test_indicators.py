@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import talib
+
+from strategies.indicators import IndicatorCache
+from tests.conftest import make_ohlc
+
+
+def test_cache_hits_on_same_content_and_params():
+    data = make_ohlc(300)
+    cache = IndicatorCache(1024 ** 2)
+    close = data['close'].to_numpy()
+
+    first = cache.compute('SMA', close, period=20)
+    second = cache.compute('SMA', close.copy(), period=20)
+    cache.compute('SMA', close, period=10)
+
+    assert second is first
+    assert (cache.hits, cache.misses) == (1, 2)
+    np.testing.assert_array_equal(first, talib.SMA(close, timeperiod=20))
+    assert not first.flags.writeable
+
+
+def test_cache_recomputes_when_input_changes():
+    data = make_ohlc(300)
+    cache = IndicatorCache(1024 ** 2)
+    high, low, close = (data[column].to_numpy() for column in ('high', 'low', 'close'))
+
+    before = cache.compute('ATR', high, low, close, period=10)
+    changed = close.copy()
+    changed[150] += 5.0
+    after = cache.compute('ATR', high, low, changed, period=10)
+
+    assert cache.misses == 2
+    np.testing.assert_array_equal(after, talib.ATR(high, low, changed, timeperiod=10))
+    assert not np.array_equal(before, after)
+
+
+def test_cache_evicts_least_recently_used():
+    close = make_ohlc(100)['close'].to_numpy()
+    cache = IndicatorCache(2 * close.nbytes)
+    for period in (5, 10, 20):
+        cache.compute('SMA', close, period=period)
+
+    assert cache.current_bytes == 2 * close.nbytes
+    cache.compute('SMA', close, period=5)
+    assert cache.misses == 4
+
+
+def test_disk_cache_is_shared_between_instances(tmp_path):
+    close = make_ohlc(300)['close'].to_numpy()
+    IndicatorCache(1024 ** 2, str(tmp_path)).compute('BBANDS', close, period=20, num_std_dev=2)
+
+    cache = IndicatorCache(1024 ** 2, str(tmp_path))
+    upper, middle, lower = cache.compute('BBANDS', close, period=20, num_std_dev=2)
+    single = cache.compute('STDEV', close, period=18)
+    reloaded = IndicatorCache(1024 ** 2, str(tmp_path)).compute('STDEV', close, period=18)
+
+    expected = talib.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2, matype=0)
+    assert (cache.disk_hits, cache.misses) == (1, 1)
+    for actual, wanted in zip((upper, middle, lower), expected):
+        np.testing.assert_array_equal(actual, wanted)
+    np.testing.assert_array_equal(reloaded, single)
+
+
+def test_unknown_indicator():
+    with pytest.raises(KeyError):
+        IndicatorCache(1024).compute('RSI', np.arange(10.0), period=3)
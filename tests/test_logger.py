@@ -0,0 +1,55 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import strategies.base_strategy as base_strategy
+from strategies.supertrend import SupertrendStrategy
+from tests.conftest import make_ohlc
+from utils.logger import setup_logging, stop_logging, worker_logging, init_worker_logging
+
+
+def test_records_reach_file_through_queue(tmp_path):
+    log_file = tmp_path / 'logs' / 'bot.log'
+    setup_logging(str(log_file), level='INFO')
+    try:
+        logging.getLogger('test').debug("hidden %s", 1)
+        logging.getLogger('test').info("visible %s", 2)
+    finally:
+        stop_logging()
+
+    text = log_file.read_text()
+    assert 'visible 2' in text
+    assert 'hidden' not in text
+
+
+def log_from_worker(value):
+    logging.getLogger('worker').info("worker %s pid %s", value, os.getpid())
+    return os.getpid()
+
+
+def test_pool_workers_log_through_queue(tmp_path):
+    log_file = tmp_path / 'bot.log'
+    setup_logging(str(log_file), level='INFO')
+    try:
+        with worker_logging() as log_args, \
+                ProcessPoolExecutor(max_workers=2, initializer=init_worker_logging, initargs=log_args) as executor:
+            pids = set(executor.map(log_from_worker, range(4)))
+    finally:
+        stop_logging()
+
+    text = log_file.read_text()
+    assert all(f"worker {value} pid" in text for value in range(4))
+    assert os.getpid() not in pids
+
+
+def test_trades_logged_only_in_verbose_mode(monkeypatch, caplog):
+    data = make_ohlc(1500, seed=3)
+    caplog.set_level(logging.INFO)
+    SupertrendStrategy(data, 1000).backtest()
+    assert not any('shares at' in record.getMessage() for record in caplog.records)
+
+    caplog.clear()
+    monkeypatch.setattr(base_strategy, 'LOG_TRADES', True)
+    results = SupertrendStrategy(data, 1000).backtest()
+    logged = [record for record in caplog.records if 'shares at' in record.getMessage()]
+    assert len(logged) == len(results['trades'])
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.runner as runner
+from strategies.batch import backtest_supertrend_batch
+from strategies.metrics import PERIODS_PER_YEAR, performance_metrics
+from strategies.supertrend import SupertrendStrategy
+from strategies.trade_log import TradeLog
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from tests.conftest import make_ohlc
+
+
+def make_trades(index, rows):
+    """Журнал: лонг 10 акций на баре rows[0] по 10$, закрытие на rows[1] по 12$; шорт 5 акций по 12$, закрытие по 13$"""
+    log = TradeLog()
+    for row, trade_type, action, shares, price, balance in [
+            (rows[0], 'Long', 'Open', 10, 10.0, 0.0), (rows[1], 'Long', 'Close', 10, 12.0, 120.0),
+            (rows[2], 'Short', 'Open', 5, 12.0, 180.0), (rows[3], 'Short', 'Close', 5, 13.0, 115.0)]:
+        log.append(index[row], trade_type, action, shares, price, 0.0, balance)
+    return log.to_frame()
+
+
+def test_metrics_on_known_equity_curve():
+    index = pd.date_range('2024-01-02', periods=6, freq='D', tz='UTC')
+    equity = pd.Series([100.0, 120.0, 90.0, 110.0, 130.0, 115.0], index=index)
+    metrics = performance_metrics(equity, make_trades(index, [0, 1, 3, 5]), '1d', 100)
+
+    returns = np.array([0.0, 0.2, -0.25, 20 / 90, 20 / 110, -15 / 130])
+    assert metrics['final_value'] == 115.0
+    assert metrics['return_pct'] == pytest.approx(15.0)
+    assert metrics['sharpe'] == pytest.approx(returns.mean() / returns.std(ddof=1) * np.sqrt(252))
+    assert metrics['sortino'] == pytest.approx(returns.mean() / np.sqrt(np.mean(np.minimum(returns, 0) ** 2)) * np.sqrt(252))
+    assert metrics['annual_return_pct'] == pytest.approx((1.15 ** (252 / 6) - 1) * 100)
+    assert metrics['max_drawdown_pct'] == pytest.approx(-25.0)
+    assert metrics['max_drawdown_bars'] == 2
+    # Позиция открыта на барах 0 и 3-4 (закрытие на баре 1 и 5)
+    assert metrics['exposure_pct'] == pytest.approx(50.0)
+    assert metrics['turnover'] == pytest.approx((100 + 120 + 60 + 65) / equity.mean())
+    assert metrics['num_trades'] == 2
+    assert metrics['win_rate_pct'] == 50.0
+    assert metrics['best_trade_pct'] == pytest.approx(20.0)
+    assert metrics['worst_trade_pct'] == pytest.approx(-100 / 12)
+    assert metrics['profit_factor'] == pytest.approx(20.0 / 5.0)
+
+
+def test_metrics_without_trades():
+    index = pd.date_range('2024-01-02', periods=3, freq='D', tz='UTC')
+    metrics = performance_metrics(pd.Series(100.0, index=index), TradeLog().to_frame(), '1d', 100)
+
+    assert metrics['num_trades'] == 0
+    assert metrics['exposure_pct'] == 0.0
+    assert metrics['max_drawdown_pct'] == 0.0
+    assert np.isnan(metrics['sharpe']) and np.isnan(metrics['win_rate_pct'])
+
+
+@pytest.mark.parametrize('strategy_class', [SupertrendStrategy, TrendlinesWithBreaksStrategy])
+def test_backtest_equity_ends_at_final_value(strategy_class):
+    data = make_ohlc(1500, seed=4)
+    strategy = strategy_class(data, 1000)
+    results = strategy.backtest()
+
+    equity = results['equity']
+    assert equity.index.equals(strategy.data.index)
+    assert equity.iloc[-1] == pytest.approx(results['final_value'])
+    metrics = performance_metrics(equity, results['trades'], '5m', 1000)
+    assert metrics['num_trades'] == int((results['trades']['Action'] == 'Close').sum())
+
+
+def test_batch_equity_matches_single_ticker():
+    datasets = {'AAA': make_ohlc(800, seed=1), 'BBB': make_ohlc(1200, seed=2)}
+    results = backtest_supertrend_batch(datasets, 1000)
+    for ticker, data in datasets.items():
+        expected = SupertrendStrategy(data, 1000).backtest()
+        pd.testing.assert_series_equal(results[ticker]['equity'], expected['equity'])
+
+
+def test_runner_attaches_metrics(monkeypatch):
+    datasets = {'AAA': make_ohlc(800, seed=1)}
+    monkeypatch.setattr(runner, 'load_data', lambda ticker, interval: datasets.get(ticker))
+
+    (_, results, _), = runner.run_backtests([('supertrend', '1h', 'AAA')], max_workers=1)
+
+    assert results['metrics']['final_value'] == pytest.approx(results['final_value'])
+    assert set(PERIODS_PER_YEAR) >= {'1m', '5m', '15m', '30m', '1h', '1d', '1wk', '1mo'}
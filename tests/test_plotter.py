@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.plotter import minmax_indices, price_trace, plot_ticker_trades
+from tests.conftest import make_ohlc
+
+
+def test_minmax_keeps_extremes_and_trade_bars():
+    close = make_ohlc(10000)['close'].to_numpy()
+    keep = [5, 1234, 9998]
+    points = minmax_indices(close, 200, keep)
+
+    assert len(points) <= 200 + 2 + len(keep)
+    assert np.all(np.diff(points) > 0)
+    assert {0, 9999, *keep} <= set(points.tolist())
+    assert close.argmax() in points and close.argmin() in points
+    # Каждая корзина представлена своим минимумом и максимумом
+    size = -(-len(close) // 100)
+    for bucket in (0, 37, 99):
+        part = close[bucket * size:(bucket + 1) * size]
+        assert bucket * size + part.argmax() in points and bucket * size + part.argmin() in points
+
+
+def test_minmax_returns_all_bars_for_short_series():
+    close = np.array([1.0, np.nan, 3.0])
+    np.testing.assert_array_equal(minmax_indices(close, 200), [0, 1, 2])
+    np.testing.assert_array_equal(minmax_indices(make_ohlc(500)['close'].to_numpy(), 0), np.arange(500))
+
+
+def test_price_trace_switches_to_webgl():
+    data = make_ohlc(5000)
+    assert isinstance(price_trace(data.index, data['close'].to_numpy(), 'AAA', max_points=4000), go.Scattergl)
+    assert isinstance(price_trace(data.index, data['close'].to_numpy(), 'AAA', max_points=500), go.Scatter)
+
+
+def test_plot_uses_shared_plotlyjs(tmp_path):
+    data = make_ohlc(20000)
+    rows = [100, 5000, 15000]
+    trades = pd.DataFrame({'Date': data.index[rows], 'Trade Type': ['Long', 'Long', 'Short'],
+                           'Action': ['Open', 'Close', 'Open'], 'Price': data['close'].to_numpy()[rows], 'Ticker': 'AAA'})
+
+    for ticker in ('AAA', 'BBB'):
+        plot_ticker_trades((ticker, data, trades, '5m', str(tmp_path / f'{ticker}.html')))
+
+    html = (tmp_path / 'AAA.html').read_text()
+    assert 'src="plotly.min.js"' in html
+    assert (tmp_path / 'plotly.min.js').exists()
+    assert (tmp_path / 'AAA.html').stat().st_size < (tmp_path / 'plotly.min.js').stat().st_size / 10
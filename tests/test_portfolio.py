@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.runner as runner
+from strategies.portfolio import TickerBook, simulate_portfolio
+from strategies.signals import Signals, BUY, SHORT
+from strategies.supertrend import SupertrendStrategy
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from tests.conftest import make_ohlc
+
+
+def make_book(strategy_class, ticker, data):
+    strategy = strategy_class(data, 1000)
+    signals = strategy.generate_signals()
+    return strategy, TickerBook(ticker, strategy.data.index, strategy.data['close'].to_numpy(), signals)
+
+
+@pytest.mark.parametrize('strategy_class', [SupertrendStrategy, TrendlinesWithBreaksStrategy])
+def test_single_ticker_full_size_matches_backtest(strategy_class):
+    data = make_ohlc(1500, seed=3)
+    strategy, book = make_book(strategy_class, 'AAA', data)
+    portfolio = simulate_portfolio([book], 1000, 1.0, **strategy.simulation_params())
+    expected = strategy_class(data, 1000).backtest()
+
+    assert portfolio['final_value'] == expected['final_value']
+    assert portfolio['realized_pnl'] == expected['realized_pnl']
+    assert portfolio['trades'].drop(columns='Ticker').equals(expected['trades'])
+    assert portfolio['equity'].iloc[-1] == pytest.approx(expected['final_value'])
+
+
+def test_shared_capital_across_tickers():
+    datasets = {
+        'AAA': make_ohlc(1200, seed=1),
+        'BBB': make_ohlc(900, seed=2, start='2024-01-03 09:30'),
+        'CCC': make_ohlc(1500, seed=3),
+    }
+    books = []
+    for ticker, data in datasets.items():
+        strategy, book = make_book(SupertrendStrategy, ticker, data)
+        books.append(book)
+    portfolio = simulate_portfolio(books, 10000, 0.25, **strategy.simulation_params())
+
+    trades = portfolio['trades']
+    equity = portfolio['equity']
+    assert set(trades['Ticker']) == set(datasets)
+    assert trades['Date'].is_monotonic_increasing
+    assert (trades['Balance'] >= 0).all()
+    # Каждая позиция получает не больше четверти стоимости портфеля
+    opens = trades[trades['Action'] == 'Open']
+    assert (opens['Shares'] * opens['Price'] <= 0.25 * equity.max() + 1e-9).all()
+    # Кривая стоимости построена на объединенной шкале и заканчивается итоговым балансом
+    union = datasets['AAA'].index.union(datasets['BBB'].index).union(datasets['CCC'].index)
+    assert len(equity) == len(union)
+    assert str(equity.index.tz) == str(union.tz)
+    assert equity.iloc[0] == 10000
+    assert equity.iloc[-1] == pytest.approx(portfolio['final_value'])
+    assert portfolio['final_value'] == pytest.approx(10000 + portfolio['realized_pnl'])
+
+
+def test_equity_marks_open_positions_to_market():
+    index = pd.date_range('2024-01-02', periods=5, freq='D', tz='UTC')
+    close = np.array([10.0, 11.0, 12.0, 9.0, 10.0])
+    book = TickerBook('AAA', index, close, Signals(index, [1], [BUY]))
+    portfolio = simulate_portfolio([book], 100, 0.5)
+
+    # 50$ на покупку по 11: 4 акции, 56$ остается на счете
+    np.testing.assert_array_equal(portfolio['equity'].to_numpy(), [100.0, 100.0, 104.0, 92.0, 96.0])
+    assert portfolio['final_value'] == 96.0
+
+
+def test_short_proceeds_do_not_fund_longs():
+    index = pd.date_range('2024-01-02', periods=5, freq='D', tz='UTC')
+    close = np.full(5, 10.0)
+    books = [TickerBook('AAA', index, close, Signals(index, [1], [SHORT])),
+             TickerBook('BBB', index, close, Signals(index, [2], [BUY])),
+             TickerBook('CCC', index, close, Signals(index, [3], [BUY]))]
+    portfolio = simulate_portfolio(books, 100, 1.0)
+
+    # Шорт AAA на 100$ увеличивает деньги до 200$, но 100$ из них - обязательство по шорту:
+    # BBB покупается на собственные 100$, на CCC свободных денег не остается
+    opens = portfolio['trades'][portfolio['trades']['Action'] == 'Open']
+    assert list(opens['Ticker']) == ['AAA', 'BBB']
+    assert list(opens['Shares']) == [10, 10]
+    assert portfolio['final_value'] == 100.0
+
+
+def test_run_portfolio_backtest(monkeypatch):
+    datasets = {'AAA': make_ohlc(800, seed=1), 'BBB': make_ohlc(800, seed=2)}
+    monkeypatch.setattr(runner, 'load_data', lambda ticker, interval: datasets.get(ticker))
+
+    portfolio = runner.run_portfolio_backtest('trendlines_with_breaks', '5m', ['AAA', 'BBB', 'MISSING'], 1000, 0.5)
+
+    assert set(portfolio['trades']['Ticker']) <= {'AAA', 'BBB'}
+    assert runner.run_portfolio_backtest('supertrend', '5m', ['MISSING']) is None
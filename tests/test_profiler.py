@@ -0,0 +1,95 @@
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import utils.runner as runner
+from strategies.supertrend import SupertrendStrategy
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from tests.conftest import make_ohlc
+from utils.profiler import StageProfiler, profiler
+
+
+@pytest.fixture(autouse=True)
+def clear_profiler():
+    profiler.clear()
+    yield
+    profiler.clear()
+
+
+def test_stage_records_keys_and_nested_peak_memory():
+    stages = StageProfiler(memory=True)
+    with stages.context(strategy='supertrend', interval='1h'):
+        with stages.stage('outer', ticker='AAA'):
+            with stages.stage('inner'):
+                values = np.ones(2_000_000)
+            del values
+
+    inner, outer = stages.records
+    assert (outer['stage'], outer['strategy'], outer['ticker'], outer['interval']) == ('outer', 'supertrend', 'AAA', '1h')
+    assert inner['ticker'] is None
+    # Массив 16 МБ выделен во вложенном этапе и освобожден во внешнем, пик учитывается в обоих
+    assert inner['peak_mb'] >= 15
+    assert outer['peak_mb'] >= inner['peak_mb']
+    assert outer['wall_s'] >= inner['wall_s'] >= 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_exclusive_stage_excludes_nested_time():
+    stages = StageProfiler(memory=False)
+    with stages.stage('outer', exclusive=True):
+        with stages.stage('inner'):
+            time.sleep(0.05)
+    inner, outer = stages.records
+    assert inner['wall_s'] >= 0.05
+    assert 0 <= outer['wall_s'] < 0.05
+
+
+@pytest.mark.parametrize('strategy_class', [SupertrendStrategy, TrendlinesWithBreaksStrategy])
+def test_backtest_stages_split_indicator_time(strategy_class):
+    stages = StageProfiler()
+    plain = strategy_class(make_ohlc(1500, seed=8), 1000).backtest()
+    strategy = strategy_class(make_ohlc(1500, seed=8), 1000)
+    profiled = strategy.backtest(stages)
+
+    assert profiled['final_value'] == plain['final_value']
+    assert [record['stage'] for record in stages.records] == ['indicators', 'signals', 'simulation']
+    assert strategy.profiler is None
+    assert all(record['wall_s'] >= 0 and record['cpu_s'] >= 0 for record in stages.records)
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_runner_collects_stages_from_workers(monkeypatch, tmp_path, max_workers):
+    datasets = {'AAA': make_ohlc(800, seed=1), 'BBB': make_ohlc(800, seed=2)}
+    monkeypatch.setattr(runner, 'load_data', lambda ticker, interval: datasets.get(ticker))
+    with profiler.stage('download'):
+        pass
+
+    jobs = runner.make_jobs(['supertrend'], ['1h'], ['AAA', 'BBB', 'CCC'])
+    runner.run_backtests(jobs, max_workers=max_workers)
+
+    frame = profiler.frame()
+    assert (frame['stage'] == 'download').sum() == 1
+    assert sorted(frame.loc[frame['stage'] == 'load', 'ticker']) == ['AAA', 'BBB', 'CCC']
+    for stage in ('indicators', 'signals', 'simulation', 'metrics'):
+        assert sorted(frame.loc[frame['stage'] == stage, 'ticker']) == ['AAA', 'BBB']
+
+    report = profiler.save_report(str(tmp_path / 'run_report.json'), total_wall_s=1.0)
+    saved = json.loads((tmp_path / 'run_report.json').read_text())
+    assert saved == json.loads(json.dumps(report))
+    assert [stage['stage'] for stage in saved['stages']][:2] == ['download', 'load']
+    assert len(saved['records']) == len(frame)
+    assert 'signals' in profiler.table()
+
+
+def test_cprofile_for_selected_job(monkeypatch, tmp_path):
+    monkeypatch.setattr(runner, 'load_data', lambda ticker, interval: make_ohlc(800, seed=1))
+    monkeypatch.setattr(runner, 'profile_path', lambda job: str(tmp_path / 'job.prof'))
+
+    runner.run_backtest_job(('supertrend', '1h', 'AAA'), profile_job=('supertrend', '1h', 'BBB'))
+    assert not (tmp_path / 'job.prof').exists()
+    runner.run_backtest_job(('supertrend', '1h', 'AAA'), profile_job=('supertrend', '1h', 'AAA'))
+    assert (tmp_path / 'job.prof').exists()
+    assert 'generate_signals' in (tmp_path / 'job.prof.txt').read_text()
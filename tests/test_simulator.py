@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+import strategies.base_strategy as base_strategy
+import utils.runner as runner
+from strategies.ledger import PositionLedger, LONG
+from strategies.signals import Signals, BUY, SELL, SHORT, COVER
+from strategies.simulator import BASE_RULES, simulate
+from strategies.supertrend import SupertrendStrategy
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from tests.conftest import make_ohlc
+
+
+def run(close, high, low, positions, codes, open_=None, **kwargs):
+    trades = []
+    if open_ is not None:
+        kwargs['open_'] = np.asarray(open_, dtype=np.float64)
+    ledger = simulate(np.asarray(close, dtype=np.float64), Signals(None, positions, codes), PositionLedger(1000),
+                      lambda *trade: trades.append(trade), high=np.asarray(high, dtype=np.float64),
+                      low=np.asarray(low, dtype=np.float64), **kwargs)
+    return ledger, trades
+
+
+def reference_intrabar(close, high, low, open_, positions, codes, take_profit, stop_loss, fill):
+    """Пошаговая проверка уровней на каждом баре (BASE_RULES, без signal_sets_entry)"""
+    codes_at = dict(zip(positions, codes))
+    trades, balance, direction, shares, entry = [], 1000.0, 0, 0.0, 0.0
+    for i in range(len(close)):
+        if direction != 0:
+            target_level = entry * (1 + direction * take_profit)
+            stop_level = entry * (1 - direction * stop_loss)
+            favorable, adverse = (high[i], low[i]) if direction == LONG else (low[i], high[i])
+            stopped = direction * adverse <= direction * stop_level
+            target = direction * favorable >= direction * target_level
+            if stopped or target:
+                if fill == 'close':
+                    price = close[i]
+                elif stopped:
+                    # Гэп за стоп-лосс: исполнение по цене открытия
+                    price = min(stop_level, open_[i]) if direction == LONG else max(stop_level, open_[i])
+                else:
+                    price = target_level
+                balance += direction * shares * price
+                trades.append((i, 'Close', price))
+                direction = 0
+        if i in codes_at:
+            closes, opens, _ = BASE_RULES[codes_at[i]]
+            if closes is not None and direction == closes:
+                balance += direction * shares * close[i]
+                trades.append((i, 'Close', close[i]))
+                direction = 0
+            elif opens is not None and direction == 0:
+                shares = balance // close[i]
+                direction, entry = opens, close[i]
+                balance -= direction * shares * close[i]
+                trades.append((i, 'Open', close[i]))
+    if direction != 0:
+        balance += direction * shares * close[-1]
+        trades.append((len(close) - 1, 'Close', close[-1]))
+    return balance, trades
+
+
+def test_long_take_profit_touched_by_high_between_signals():
+    close = [10.0, 10.0, 10.5, 10.8, 10.2, 10.0]
+    high = [10.2, 10.3, 10.9, 11.3, 10.4, 10.1]
+    low = [9.8, 9.9, 10.1, 10.4, 9.9, 9.8]
+
+    _, trades = run(close, high, low, [1, 5], [BUY, SELL], take_profit=0.1, stop_loss=0.1)
+    assert [(t[0], t[2], t[4]) for t in trades] == [(1, 'Open', 10.0), (3, 'Close', pytest.approx(11.0))]
+
+    _, trades = run(close, high, low, [1, 5], [BUY, SELL], take_profit=0.1, stop_loss=0.1, intrabar_fill='close')
+    assert (trades[1][0], trades[1][4]) == (3, 10.8)
+
+
+def test_stop_loss_wins_when_both_levels_touched_in_one_bar():
+    close = [10.0, 10.0, 10.0]
+    high = [10.0, 10.0, 12.0]
+    low = [10.0, 10.0, 8.0]
+    _, trades = run(close, high, low, [1], [SHORT], take_profit=0.1, stop_loss=0.05)
+    assert (trades[1][0], trades[1][1], trades[1][4]) == (2, 'Short', pytest.approx(10.5))
+
+
+def test_stop_loss_gap_fills_at_open():
+    close = [10.0, 10.0, 8.5, 8.6]
+    high = [10.0, 10.0, 8.8, 8.8]
+    low = [10.0, 10.0, 8.3, 8.4]
+    open_ = [10.0, 10.0, 8.7, 8.5]
+    # Бар 2 открылся на 8.7 - ниже стоп-лосса 9.5, цена 9.5 на нем не торговалась
+    _, trades = run(close, high, low, [1], [BUY], open_=open_, stop_loss=0.05)
+    assert (trades[1][0], trades[1][4]) == (2, 8.7)
+    # Без цен открытия - прежнее исполнение по уровню
+    _, trades = run(close, high, low, [1], [BUY], stop_loss=0.05)
+    assert trades[1][4] == pytest.approx(9.5)
+
+    # Шорт: гэп вверх за стоп-лосс, тейк-профит при гэпе вниз исполняется по уровню (худшая из цен)
+    _, trades = run([10.0, 10.0, 11.0], [10.0, 10.0, 11.2], [10.0, 10.0, 10.9], [1], [SHORT], open_=[10.0, 10.0, 11.1],
+                    stop_loss=0.05)
+    assert trades[1][4] == 11.1
+    _, trades = run([10.0, 10.0, 8.0], [10.0, 10.0, 8.2], [10.0, 10.0, 7.9], [1], [SHORT], open_=[10.0, 10.0, 8.1],
+                    take_profit=0.1)
+    assert trades[1][4] == pytest.approx(9.0)
+
+
+def test_exit_before_signal_on_the_same_bar():
+    close = [10.0, 10.0, 10.0, 12.0]
+    high = [10.0, 10.0, 10.0, 12.5]
+    low = [10.0, 10.0, 10.0, 11.5]
+    # Тейк-профит достигнут внутри бара 3, сигнал sell на закрытии этого бара уже не застает позицию
+    _, trades = run(close, high, low, [1, 3], [BUY, SELL], take_profit=0.1)
+    assert [(t[0], t[2], t[4]) for t in trades] == [(1, 'Open', 10.0), (3, 'Close', pytest.approx(11.0))]
+
+
+@pytest.mark.parametrize('fill', ['level', 'close'])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_per_bar_reference(fill, seed):
+    data = make_ohlc(2000, seed=seed)
+    close, high, low, open_ = (data[column].to_numpy() for column in ('close', 'high', 'low', 'open'))
+    rng = np.random.default_rng(seed)
+    positions = np.flatnonzero(rng.random(len(close)) < 0.02)
+    codes = rng.choice([BUY, SELL, SHORT, COVER], len(positions))
+
+    ledger, trades = run(close, high, low, positions, codes, open_=open_, take_profit=0.02, stop_loss=0.01, intrabar_fill=fill)
+    balance, expected = reference_intrabar(close, high, low, open_, positions.tolist(), codes.tolist(), 0.02, 0.01, fill)
+
+    assert [(t[0], t[2]) for t in trades] == [(t[0], t[1]) for t in expected]
+    np.testing.assert_allclose([t[4] for t in trades], [t[2] for t in expected])
+    assert ledger.balance == pytest.approx(balance)
+
+
+def test_unknown_fill_policy():
+    with pytest.raises(ValueError):
+        run([1.0], [1.0], [1.0], [], [], take_profit=0.1, intrabar_fill='open')
+
+
+@pytest.mark.parametrize('strategy_class', [SupertrendStrategy, TrendlinesWithBreaksStrategy])
+def test_strategy_intrabar_flag(strategy_class, monkeypatch):
+    data = make_ohlc(3000, seed=5)
+    baseline = strategy_class(data, 1000).backtest()
+    monkeypatch.setattr(base_strategy, 'INTRABAR_EXITS', True)
+    intrabar = strategy_class(data, 1000).backtest()
+
+    trades = intrabar['trades']
+    assert not trades.equals(baseline['trades'])
+    assert intrabar['equity'].iloc[-1] == pytest.approx(intrabar['final_value'])
+
+
+def test_batch_mode_disabled_with_intrabar_exits(monkeypatch):
+    jobs = runner.make_jobs(['supertrend'], ['5m'], ['AAA', 'BBB'])
+    assert [function for function, _ in runner.make_tasks(jobs, batch=True)] == [runner.run_batch_task]
+    monkeypatch.setattr(runner, 'INTRABAR_EXITS', True)
+    assert [function for function, _ in runner.make_tasks(jobs, batch=True)] == [runner.run_backtest_task] * 2
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+import talib
+
+from strategies.base_strategy import BaseStrategy
+from strategies.indicators import pivot_high, pivot_low
+from strategies.streaming import RollingSMA, RollingBollinger, RollingATR, RollingStd, RollingLinregSlope, RollingPivot
+from strategies.supertrend import SupertrendStrategy
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy, _linreg_slope
+from tests.conftest import make_ohlc
+from utils.replay import replay, verify_replay
+
+
+def stream(state, *columns):
+    return np.array([state.update(*values) for values in zip(*columns)], dtype=np.float64)
+
+
+def test_rolling_sma_matches_talib_exactly():
+    close = make_ohlc(1000)['close'].to_numpy()
+    for period in (1, 2, 20):
+        np.testing.assert_array_equal(stream(RollingSMA(period), close), talib.SMA(close, timeperiod=period))
+
+
+@pytest.mark.parametrize('period', [1, 2, 14])
+def test_rolling_atr_matches_talib(period):
+    data = make_ohlc(1000)
+    high, low, close = (data[column].to_numpy() for column in ('high', 'low', 'close'))
+    np.testing.assert_allclose(stream(RollingATR(period), high, low, close),
+                               talib.ATR(high, low, close, timeperiod=period), rtol=1e-12)
+
+
+def test_rolling_bollinger_matches_talib():
+    close = make_ohlc(1000)['close'].to_numpy()
+    actual = stream(RollingBollinger(20, 2.0), close)  # update() возвращает кортеж, stream дает матрицу
+    expected = np.column_stack(talib.BBANDS(close, timeperiod=20, nbdevup=2.0, nbdevdn=2.0, matype=0))
+    np.testing.assert_allclose(actual, expected, rtol=1e-12)
+
+
+def test_rolling_std_and_linreg_match_batch():
+    close = make_ohlc(1000)['close'].to_numpy()
+    np.testing.assert_allclose(stream(RollingStd(14), close), pd.Series(close).rolling(14).std().to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(stream(RollingLinregSlope(14), close), _linreg_slope(close, 14, 0), rtol=1e-9, atol=1e-12)
+
+
+def test_rolling_std_and_linreg_recover_after_nan():
+    close = make_ohlc(1000)['close'].to_numpy().copy()
+    close[[100, 101, 500]] = np.nan
+    np.testing.assert_allclose(stream(RollingStd(14), close), pd.Series(close).rolling(14).std().to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(stream(RollingLinregSlope(14), close), _linreg_slope(close, 14, 0), rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('length', [1, 3, 14])
+def test_rolling_pivot_matches_batch_exactly(length):
+    close = make_ohlc(500)['close'].to_numpy().copy()
+    close[[100, 101, 300]] = np.nan
+    np.testing.assert_array_equal(stream(RollingPivot(length, 1.0), close), pivot_high(close, length))
+    np.testing.assert_array_equal(stream(RollingPivot(length, -1.0), close), pivot_low(close, length))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_supertrend_streaming_matches_batch(seed):
+    data = make_ohlc(3000, seed=seed)
+    data.iloc[[50, 51, 300], data.columns.get_loc('close')] = np.nan
+    result = verify_replay(SupertrendStrategy, data)
+
+    assert len(result['streaming']) > 0
+    assert len(result['latency_us']) == len(data)
+
+
+@pytest.mark.parametrize('calc_method', ['Atr', 'Stdev', 'Linreg'])
+@pytest.mark.parametrize('length', [3, 14])
+def test_trendlines_streaming_matches_batch(calc_method, length):
+    params = {'slope_mode': 'point_in_time', 'calc_method': calc_method, 'length': length}
+    result = verify_replay(TrendlinesWithBreaksStrategy, make_ohlc(3000, seed=length), params)
+    assert len(result['streaming']) > 0
+
+
+@pytest.mark.parametrize('calc_method', ['Atr', 'Stdev', 'Linreg'])
+@pytest.mark.parametrize('length', [3, 14])
+def test_trendlines_streaming_matches_batch_with_gaps(calc_method, length):
+    params = {'slope_mode': 'point_in_time', 'calc_method': calc_method, 'length': length}
+    data = make_ohlc(3000, seed=length)
+    data.iloc[[100, 1500, 1501], data.columns.get_loc('close')] = np.nan
+    result = verify_replay(TrendlinesWithBreaksStrategy, data, params)
+    assert len(result['streaming']) > 0
+
+
+def test_trendlines_streaming_rejects_compat_mode():
+    strategy = TrendlinesWithBreaksStrategy(make_ohlc(50), 1000, params={'slope_mode': 'compat'})
+    with pytest.raises(ValueError):
+        strategy.update({'high': 1.0, 'low': 1.0, 'close': 1.0})
+
+
+def test_replay_detects_mismatch(monkeypatch):
+    data = make_ohlc(1000)
+    monkeypatch.setattr(SupertrendStrategy, 'update', lambda self, bar: None)
+
+    assert replay(SupertrendStrategy, data)['streaming'] == []
+    with pytest.raises(AssertionError):
+        verify_replay(SupertrendStrategy, data)
+
+
+def test_base_strategy_update_not_implemented():
+    with pytest.raises(NotImplementedError):
+        BaseStrategy(make_ohlc(10), 1000).update({'close': 1.0})
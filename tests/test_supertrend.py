@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+import pytest
+import talib
+
+import strategies.supertrend as supertrend_module
+from strategies.signals import Signals
+from strategies.supertrend import SupertrendStrategy, supertrend, supertrend_bands
+from tests.conftest import make_ohlc, trades_as_tuples
+
+
+def reference_supertrend(df, period, atr_multiplier):
+    """Исходная реализация Supertrend на pandas, эталон для проверки."""
+    atr = talib.ATR(df['high'], df['low'], df['close'], timeperiod=period)
+    hl2 = (df['high'] + df['low']) / 2
+    final_upperband = hl2 + (atr_multiplier * atr)
+    final_lowerband = hl2 - (atr_multiplier * atr)
+
+    trend = [True] * len(df)
+    for i in range(1, len(df)):
+        if df['close'].iloc[i] > final_upperband.iloc[i-1]:
+            trend[i] = True
+        elif df['close'].iloc[i] < final_lowerband.iloc[i-1]:
+            trend[i] = False
+        else:
+            trend[i] = trend[i-1]
+            if trend[i] and final_lowerband.iloc[i] < final_lowerband.iloc[i-1]:
+                final_lowerband.iloc[i] = final_lowerband.iloc[i-1]
+            if not trend[i] and final_upperband.iloc[i] > final_upperband.iloc[i-1]:
+                final_upperband.iloc[i] = final_upperband.iloc[i-1]
+    return pd.Series(trend, index=df.index), final_upperband, final_lowerband
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('period,multiplier', [(10, 3), (7, 1.5), (14, 2)])
+@pytest.mark.parametrize('use_numba', [True, False])
+def test_supertrend_matches_reference(monkeypatch, seed, period, multiplier, use_numba):
+    if not use_numba:
+        monkeypatch.setattr(supertrend_module, 'njit', None)
+    elif supertrend_module.njit is None:
+        pytest.skip("Numba не установлена")
+
+    df = make_ohlc(400, seed=seed)
+    expected_trend, expected_upper, expected_lower = reference_supertrend(df.copy(), period, multiplier)
+    result = supertrend(df.copy(), period=period, atr_multiplier=multiplier)
+
+    np.testing.assert_array_equal(result['supertrend'].to_numpy(), expected_trend.to_numpy())
+    np.testing.assert_array_equal(result['final_upperband'].to_numpy(), expected_upper.to_numpy())
+    np.testing.assert_array_equal(result['final_lowerband'].to_numpy(), expected_lower.to_numpy())
+
+
+def test_supertrend_bands_does_not_modify_inputs():
+    close = np.array([10.0, 12.0, 11.0, 9.0])
+    upper = np.array([np.nan, 13.0, 14.0, 12.5])
+    lower = np.array([np.nan, 9.0, 8.0, 7.5])
+    trend, new_upper, new_lower = supertrend_bands(close, upper, lower)
+
+    assert trend.dtype == bool
+    assert np.isnan(upper[0]) and upper[2] == 14.0 and lower[2] == 8.0
+    np.testing.assert_array_equal(new_upper, [np.nan, 13.0, 14.0, 12.5])
+    np.testing.assert_array_equal(new_lower, [np.nan, 9.0, 9.0, 9.0])
+
+
+def reference_signals(data):
+    """Исходная генерация сигналов через iterrows."""
+    signals = []
+    for index, row in data.iterrows():
+        if row['supertrend'] and (row['close'] < row['lower_band']) and not row['in_flat']:
+            signals.append((index, 'buy'))
+        elif not row['supertrend'] and (row['close'] > row['upper_band']) and not row['in_flat']:
+            signals.append((index, 'sell'))
+    return signals
+
+
+@pytest.mark.parametrize('seed', [0, 3, 7])
+def test_generate_signals_matches_iterrows(seed):
+    strategy = SupertrendStrategy(make_ohlc(1500, seed=seed), 1000)
+    signals = strategy.generate_signals()
+
+    assert isinstance(signals, Signals)
+    assert len(signals) > 0
+    assert list(signals) == reference_signals(strategy.data.join(strategy.features.to_frame()))
+
+
+def test_simulate_trading_accepts_signal_list():
+    data = make_ohlc(1500, seed=3)
+    compact = SupertrendStrategy(data.copy(), 1000)
+    signals = compact.generate_signals()
+    compact_results = compact.simulate_trading(signals)
+
+    legacy = SupertrendStrategy(data.copy(), 1000)
+    legacy.generate_signals()
+    legacy_results = legacy.simulate_trading(list(signals))
+
+    assert compact_results['final_value'] == legacy_results['final_value']
+    assert compact_results['trades'].equals(legacy_results['trades'])
+
+
+def reference_simulate_trading(strategy, signals):
+    """Исходный симулятор Supertrend, возвращает итоговый баланс и список сделок."""
+    trades = []
+    data = strategy.data
+    position = 0
+    balance = strategy.initial_balance
+    shares = 0
+    last_potential_trade = None
+    entry_price = None
+
+    def record(timestamp, trade_type, action, shares, price, profit, balance):
+        trades.append((timestamp, trade_type, action, shares, price, profit, balance))
+
+    for timestamp, signal in signals:
+        price = data.loc[timestamp, 'close']
+        if signal == 'buy':
+            last_potential_trade = ('buy', price)
+        elif signal == 'sell':
+            last_potential_trade = ('sell', price)
+
+        if last_potential_trade:
+            trade_type, entry_price = last_potential_trade
+            last_potential_trade = None
+            if trade_type == 'buy' and position == 0:
+                position = 1
+                shares = balance // entry_price if strategy.whole_shares_only else balance / entry_price
+                balance -= shares * entry_price
+                record(timestamp, 'Long', 'Open', shares, entry_price, 0, balance)
+            elif trade_type == 'sell' and position == 0:
+                position = -1
+                shares = balance // entry_price if strategy.whole_shares_only else balance / entry_price
+                balance += shares * entry_price
+                record(timestamp, 'Short', 'Open', shares, entry_price, 0, balance)
+
+        if signal == 'sell' and position == 1:
+            profit = (price - entry_price) * shares
+            balance += shares * price
+            record(timestamp, 'Long', 'Close', shares, price, profit, balance)
+            position = 0
+        elif signal == 'buy' and position == -1:
+            profit = (entry_price - price) * shares
+            balance -= shares * price
+            record(timestamp, 'Short', 'Close', shares, price, profit, balance)
+            position = 0
+        elif position == 1:
+            if price >= entry_price * (1 + strategy.take_profit_percent) or price <= entry_price * (1 - strategy.stop_loss_percent):
+                profit = (price - entry_price) * shares
+                balance += shares * price
+                record(timestamp, 'Long', 'Close', shares, price, profit, balance)
+                position = 0
+        elif position == -1:
+            if price <= entry_price * (1 - strategy.take_profit_percent) or price >= entry_price * (1 + strategy.stop_loss_percent):
+                profit = (entry_price - price) * shares
+                balance -= shares * price
+                record(timestamp, 'Short', 'Close', shares, price, profit, balance)
+                position = 0
+
+    last_price = data.iloc[-1]['close']
+    if position == 1:
+        balance += shares * last_price
+        record(data.index[-1], 'Long', 'Close', shares, last_price, (last_price - entry_price) * shares, balance)
+    elif position == -1:
+        balance -= shares * last_price
+        record(data.index[-1], 'Short', 'Close', shares, last_price, (entry_price - last_price) * shares, balance)
+    return balance, trades
+
+
+@pytest.mark.parametrize('seed', [0, 3, 7, 11])
+@pytest.mark.parametrize('whole_shares_only', [True, False])
+def test_simulate_trading_matches_original(seed, whole_shares_only):
+    strategy = SupertrendStrategy(make_ohlc(3000, seed=seed), 1000, whole_shares_only)
+    signals = strategy.generate_signals()
+    expected_balance, expected_trades = reference_simulate_trading(strategy, list(signals))
+
+    results = strategy.simulate_trading(signals)
+
+    assert len(expected_trades) > 2
+    assert results['final_value'] == expected_balance
+    assert trades_as_tuples(results['trades']) == expected_trades
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+import utils.sweep as sweep
+from strategies.supertrend import SupertrendStrategy
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy
+from tests.conftest import make_ohlc
+
+
+def test_expand_grid_order():
+    grid = {'a': [1, 2], 'b': ['x', 'y']}
+    assert sweep.expand_grid(grid) == [{'a': 1, 'b': 'x'}, {'a': 1, 'b': 'y'}, {'a': 2, 'b': 'x'}, {'a': 2, 'b': 'y'}]
+
+
+@pytest.mark.parametrize('strategy_class', [SupertrendStrategy, TrendlinesWithBreaksStrategy])
+def test_explicit_default_params_match_config(strategy_class):
+    data = make_ohlc(800, seed=1)
+    default = strategy_class(data, 1000).backtest()
+    explicit = strategy_class(data, 1000, params=strategy_class.default_params()).backtest()
+
+    assert explicit['final_value'] == default['final_value']
+    assert explicit['trades'].equals(default['trades'])
+
+
+def test_injected_params_change_results():
+    data = make_ohlc(1500, seed=3)
+    default = SupertrendStrategy(data, 1000)
+    tuned = SupertrendStrategy(data, 1000, params={'supertrend_period': 5, 'atr_multiplier': 1})
+
+    assert tuned.params['bollinger_period'] == default.params['bollinger_period']
+    assert list(tuned.generate_signals()) != list(default.generate_signals())
+
+
+def test_unknown_param_raises():
+    with pytest.raises(ValueError):
+        SupertrendStrategy(make_ohlc(100), 1000, params={'period': 5})
+
+
+def test_run_sweep_ranks_and_saves(monkeypatch, tmp_path):
+    datasets = {'AAA': make_ohlc(800, seed=1), 'BBB': make_ohlc(800, seed=2)}
+    monkeypatch.setattr(sweep, 'load_data', lambda ticker, interval: datasets.get(ticker))
+    grids = {'supertrend': {'supertrend_period': [7, 10], 'atr_multiplier': [1, 2, 3]}}
+
+    table = sweep.run_sweep(grids, ['5m'], ['AAA', 'BBB', 'CCC'], max_workers=1, chunk_size=4)
+
+    assert len(table) == 12
+    for ticker, group in table.groupby('ticker'):
+        assert list(group['rank']) == list(range(1, 7))
+        assert group['return_pct'].is_monotonic_decreasing
+    row = table[(table['ticker'] == 'AAA') & (table['supertrend_period'] == 7) & (table['atr_multiplier'] == 2)].iloc[0]
+    single = SupertrendStrategy(datasets['AAA'], 1000, params={'supertrend_period': 7, 'atr_multiplier': 2}).backtest()
+    assert row['final_value'] == single['final_value']
+
+    paths = sweep.save_sweep_results(table, str(tmp_path))
+    saved = pd.read_csv(paths[0])
+    assert len(saved) == 12
+    assert list(saved.columns[:4]) == ['strategy', 'interval', 'ticker', 'rank']
+
+
+def test_sweep_rejects_unknown_grid_param():
+    with pytest.raises(ValueError):
+        sweep.make_sweep_tasks({'trendlines_with_breaks': {'lenght': [10]}}, ['5m'], ['AAA'], 8)
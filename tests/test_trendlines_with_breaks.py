@@ -0,0 +1,220 @@
+import numpy as np
+import pytest
+
+from config.config import TRENDLINES_LENGTH, TRENDLINES_MULTIPLIER, TRENDLINES_TRAIL_PERCENT_TP, TRENDLINES_TRAIL_PERCENT_SL
+import strategies.trendlines_with_breaks as trendlines_module
+from strategies.indicators import pivot_high, pivot_low, rolling_max
+from strategies.trendlines_with_breaks import TrendlinesWithBreaksStrategy, slope_series
+from tests.conftest import make_ohlc, trades_as_tuples
+
+
+def reference_pivots(close, length):
+    """Исходный расчет пиков и впадин через rolling().apply()."""
+    ph = close.rolling(window=length).apply(lambda x: x.argmax() == (len(x) - 1), raw=True)
+    pl = close.rolling(window=length).apply(lambda x: x.argmin() == (len(x) - 1), raw=True)
+    return ph.to_numpy(), pl.to_numpy()
+
+
+def make_close(seed, with_gaps=False):
+    close = make_ohlc(600, seed=seed)['close'].round(0)  # округление дает повторяющиеся значения
+    if with_gaps:
+        close.iloc[[5, 100, 101, 350]] = np.nan
+    return close
+
+
+@pytest.mark.parametrize('length', sorted(set(range(1, 41)) | {TRENDLINES_LENGTH}))
+@pytest.mark.parametrize('with_gaps', [False, True])
+def test_pivots_match_rolling_apply(length, with_gaps):
+    close = make_close(length, with_gaps)
+    expected_ph, expected_pl = reference_pivots(close, length)
+
+    np.testing.assert_array_equal(pivot_high(close.to_numpy(), length), expected_ph)
+    np.testing.assert_array_equal(pivot_low(close.to_numpy(), length), expected_pl)
+
+
+def test_pivots_on_short_series():
+    assert np.isnan(pivot_high(np.array([1.0, 2.0]), 3)).all()
+    assert np.isnan(pivot_low(np.array([]), 3)).size == 0
+
+
+@pytest.mark.parametrize('window', [1, 2, 5, 17])
+def test_rolling_max_matches_pandas(window):
+    values = make_ohlc(200, seed=window)['close']
+    expected = values.rolling(window).max().to_numpy()
+    np.testing.assert_array_equal(rolling_max(values.to_numpy(), window), expected)
+
+
+def reference_generate_signals(data, length, mult, calc_method):
+    """Исходная генерация сигналов Trendlines with Breaks (пересчет наклона на каждом пике)."""
+    import talib
+
+    data['ph'] = data['close'].rolling(window=length).apply(lambda x: x.argmax() == (len(x) - 1), raw=True)
+    data['pl'] = data['close'].rolling(window=length).apply(lambda x: x.argmin() == (len(x) - 1), raw=True)
+
+    def calculate_slope(method, i):
+        if method == 'Atr':
+            return talib.ATR(data['high'], data['low'], data['close'], timeperiod=length).iloc[-1] / length * mult
+        elif method == 'Stdev':
+            return data['close'].rolling(window=length).std().iloc[-1] / length * mult
+        elif method == 'Linreg':
+            src = data['close'].to_numpy()[i - length:i]
+            n = np.arange(length, dtype=np.float64)
+            return (talib.SMA(src * n, timeperiod=length)[-1] - talib.SMA(src, timeperiod=length)[-1] * talib.SMA(n, timeperiod=length)[-1]) / np.var(n) / 2 * mult
+
+    data['upper'] = np.nan
+    data['lower'] = np.nan
+    data['slope_ph'] = np.nan
+    data['slope_pl'] = np.nan
+
+    signals = []
+    upper = lower = slope_ph = slope_pl = 0.0
+    for i in range(length, len(data)):
+        if data['ph'].iloc[i]:
+            slope_ph = calculate_slope(calc_method, i)
+            upper = data['close'].iloc[i]
+        elif data['pl'].iloc[i]:
+            slope_pl = calculate_slope(calc_method, i)
+            lower = data['close'].iloc[i]
+
+        if data['ph'].iloc[i]:
+            data.at[data.index[i], 'slope_ph'] = slope_ph
+        elif data['pl'].iloc[i]:
+            data.at[data.index[i], 'slope_pl'] = slope_pl
+
+        if i > length:
+            data.at[data.index[i], 'upper'] = upper - slope_ph * (i - length)
+            data.at[data.index[i], 'lower'] = lower + slope_pl * (i - length)
+
+    data['upos'] = np.where(data['close'] > data['upper'], 1, 0)
+    data['dnos'] = np.where(data['close'] < data['lower'], 1, 0)
+
+    for i in range(1, len(data)):
+        if data['upos'].iloc[i] > data['upos'].iloc[i - 1]:
+            signals.append((data.index[i], 'buy'))
+        elif data['dnos'].iloc[i] > data['dnos'].iloc[i - 1]:
+            signals.append((data.index[i], 'sell'))
+    return signals
+
+
+@pytest.mark.parametrize('calc_method', ['Atr', 'Stdev', 'Linreg'])
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('with_gaps', [False, True])
+def test_compat_mode_matches_original(monkeypatch, calc_method, seed, with_gaps):
+    monkeypatch.setattr(trendlines_module, 'TRENDLINES_CALC_METHOD', calc_method)
+    monkeypatch.setattr(trendlines_module, 'TRENDLINES_SLOPE_MODE', 'compat')
+    data = make_ohlc(800, seed=seed)
+    if with_gaps:
+        data.iloc[[100, 400, 401], data.columns.get_loc('close')] = np.nan
+    expected_data = data.copy()
+    expected = reference_generate_signals(expected_data, TRENDLINES_LENGTH, TRENDLINES_MULTIPLIER, calc_method)
+
+    strategy = TrendlinesWithBreaksStrategy(data.copy(), 1000)
+    signals = strategy.generate_signals()
+
+    assert len(expected) > 0
+    assert list(signals) == expected
+    features = strategy.features.to_frame()
+    for column in ['ph', 'pl', 'upper', 'lower', 'slope_ph', 'slope_pl', 'upos', 'dnos']:
+        # Наклон 'Linreg' считается другой формулой, совпадение - с точностью до округления
+        np.testing.assert_allclose(features[column].to_numpy(dtype=float), expected_data[column].to_numpy(dtype=float),
+                                   rtol=1e-9 if calc_method == 'Linreg' else 0, atol=0)
+
+
+@pytest.mark.parametrize('calc_method', ['Atr', 'Stdev', 'Linreg'])
+def test_point_in_time_slope_has_no_lookahead(calc_method):
+    data = make_ohlc(300, seed=4)
+    full = slope_series(data, calc_method, TRENDLINES_LENGTH, 1.0, mode='point_in_time')
+    for end in [50, 120, 299]:
+        truncated = slope_series(data.iloc[:end + 1], calc_method, TRENDLINES_LENGTH, 1.0, mode='point_in_time')
+        np.testing.assert_allclose(truncated[end], full[end])
+
+
+@pytest.mark.parametrize('mode,end_offset', [('compat', 1), ('point_in_time', 0)])
+def test_linreg_slope_matches_polyfit(mode, end_offset):
+    length = 10
+    data = make_ohlc(100, seed=5)
+    slopes = slope_series(data, 'Linreg', length, 2.0, mode=mode)
+    close = data['close'].to_numpy()
+
+    assert np.isnan(slopes[:length - 1 + end_offset]).all()
+    for i in [length + 1, 50, 99]:
+        window = close[i - end_offset - length + 1:i - end_offset + 1]
+        expected = np.polyfit(np.arange(length), window, 1)[0] / 2 * 2.0
+        assert slopes[i] == pytest.approx(expected)
+
+
+def test_slope_series_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        slope_series(make_ohlc(50), 'Unknown', 10, 1.0)
+
+
+def reference_simulate_trading(data, signals, initial_balance, tp_percent, sl_percent):
+    """Исходный симулятор Trendlines with Breaks, возвращает итоговый баланс и список сделок."""
+    trades = []
+    position = 0
+    balance = initial_balance
+    shares = 0
+    entry_price = 0
+
+    def record(timestamp, trade_type, action, shares, price, profit, balance):
+        trades.append((timestamp, trade_type, action, shares, price, profit, balance))
+
+    for timestamp, signal in signals:
+        price = data.loc[timestamp, 'close']
+        if signal == 'buy' and position == 0:
+            shares = balance // price
+            balance -= shares * price
+            position = 1
+            entry_price = price
+            record(timestamp, 'Long', 'Open', shares, price, 0, balance)
+        elif signal == 'sell' and position == 1:
+            balance += shares * price
+            record(timestamp, 'Long', 'Close', shares, price, (price - entry_price) * shares, balance)
+            position = 0
+
+        if signal == 'sell' and position == 0:
+            shares = balance // price
+            balance += shares * price
+            position = -1
+            entry_price = price
+            record(timestamp, 'Short', 'Open', shares, price, 0, balance)
+        elif signal == 'buy' and position == -1:
+            balance -= shares * price
+            record(timestamp, 'Short', 'Close', shares, price, (entry_price - price) * shares, balance)
+            position = 0
+
+        if position == 1:
+            if price >= entry_price * (1 + tp_percent / 100) or price <= entry_price * (1 - sl_percent / 100):
+                balance += shares * price
+                record(timestamp, 'Long', 'Close', shares, price, (price - entry_price) * shares, balance)
+                position = 0
+        elif position == -1:
+            if price <= entry_price * (1 - tp_percent / 100) or price >= entry_price * (1 + sl_percent / 100):
+                balance -= shares * price
+                record(timestamp, 'Short', 'Close', shares, price, (entry_price - price) * shares, balance)
+                position = 0
+
+    price = data['close'].iloc[-1]
+    if position == 1:
+        balance += shares * price
+        record(data.index[-1], 'Long', 'Close', shares, price, (price - entry_price) * shares, balance)
+    elif position == -1:
+        balance -= shares * price
+        record(data.index[-1], 'Short', 'Close', shares, price, (entry_price - price) * shares, balance)
+    return balance, trades
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+@pytest.mark.parametrize('tp_percent,sl_percent', [(TRENDLINES_TRAIL_PERCENT_TP, TRENDLINES_TRAIL_PERCENT_SL), (1.0, 0.5)])
+def test_simulate_trading_matches_original(monkeypatch, seed, tp_percent, sl_percent):
+    monkeypatch.setattr(trendlines_module, 'TRENDLINES_TRAIL_PERCENT_TP', tp_percent)
+    monkeypatch.setattr(trendlines_module, 'TRENDLINES_TRAIL_PERCENT_SL', sl_percent)
+    strategy = TrendlinesWithBreaksStrategy(make_ohlc(3000, seed=seed), 1000)
+    signals = strategy.generate_signals()
+    expected_balance, expected_trades = reference_simulate_trading(strategy.data, list(signals), 1000, tp_percent, sl_percent)
+
+    results = strategy.simulate_trading(signals)
+
+    assert len(expected_trades) > 2
+    assert results['final_value'] == expected_balance
+    assert trades_as_tuples(results['trades']) == expected_trades
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.config import COMPANY_INFO_TTL_DAYS, DOWNLOAD_WORKERS
+from utils.providers import YFinanceProvider
+
+logger = logging.getLogger(__name__)
+
+COMPANY_INFO_PATH = os.path.join('data', 'company_info.json')
+UNKNOWN = "N/A"
+
+class CompanyInfoCache:
+    """Сведения о компаниях (название, страна, биржа) в JSON файле на диске со сроком хранения ttl секунд.
+
+    get() только читает кэш и никогда не обращается к сети. Устаревшие и отсутствующие записи
+    обновляются один раз за запуск через prefetch(), запросы выполняются параллельно.
+    """
+
+    def __init__(self, path=COMPANY_INFO_PATH, ttl=COMPANY_INFO_TTL_DAYS * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read company info cache {self.path}: {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, ticker, now=None):
+        entry = self._load().get(ticker)
+        return entry is not None and (now or time.time()) - entry['fetched_at'] < self.ttl
+
+    def get(self, ticker):
+        """Сведения о компании из кэша (устаревшие тоже), без записи - значения N/A"""
+        with self._lock:
+            entry = self._load().get(ticker, {})
+        return {
+            "name": entry.get("name", UNKNOWN),
+            "ticker": ticker,
+            "country": entry.get("country", UNKNOWN),
+            "exchange": entry.get("exchange", UNKNOWN)
+        }
+
+    def prefetch(self, tickers, provider=None, max_workers=DOWNLOAD_WORKERS):
+        """Загружает сведения о компаниях без свежей записи в кэше и сохраняет файл.
+
+        При ошибке запроса остается прежняя (устаревшая) запись. Возвращает список обновленных тикеров.
+        """
+        with self._lock:
+            now = time.time()
+            pending = [ticker for ticker in dict.fromkeys(tickers) if not self.is_fresh(ticker, now)]
+        if not pending:
+            return []
+        provider = provider or YFinanceProvider()
+
+        def fetch(ticker):
+            try:
+                return provider.fetch_info(ticker)
+            except Exception as e:
+                logger.warning(f"Failed to fetch company info for {ticker}: {e}")
+                return None
+
+        logger.info(f"Fetching company info for {len(pending)} tickers...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = list(executor.map(fetch, pending))
+
+        updated = []
+        with self._lock:
+            entries = self._load()
+            for ticker, info in zip(pending, fetched):
+                if info is not None:
+                    entries[ticker] = {**info, "fetched_at": now}
+                    updated.append(ticker)
+            if updated:
+                self._save()
+        return updated
+
+company_info_cache = CompanyInfoCache()
@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from config.config import DATA_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+def read_only(data):
+    """Копия data, в которой каждая колонка - отдельный массив NumPy только для чтения"""
+    columns = {}
+    for column in data.columns:
+        values = data[column].to_numpy(copy=True)
+        values.flags.writeable = False
+        columns[column] = values
+    return pd.DataFrame(columns, index=data.index, copy=False)
+
+class DataCache:
+    """LRU-кэш загруженных данных в пределах процесса с ограничением по памяти.
+
+    Ключ включает время изменения файла, поэтому обновленные данные перечитываются автоматически.
+    Данные в кэше хранятся в массивах только для чтения, get() возвращает поверхностную копию:
+    стратегии могут добавлять и заменять колонки, не затрагивая данные в кэше. Изменение значений
+    на месте в pandas 3 (Copy-on-Write) копирует колонку, в pandas 2 завершается ошибкой.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Возвращает данные по ключу, при промахе вызывает loader() и сохраняет результат"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                logger.debug(f"Data cache hit for {key}")
+                return self._entries[key][0].copy(deep=False)
+
+        data = loader()
+        with self._lock:
+            self.misses += 1
+            logger.debug(f"Data cache miss for {key}")
+            if data is None:
+                return None
+            data = read_only(data)
+            size = int(data.memory_usage(index=True).sum())
+            if size <= self.max_bytes:
+                # Старые версии того же набора данных (с другим mtime) больше не нужны
+                for stale in [k for k in self._entries if k[:-1] == key[:-1]]:
+                    self._remove(stale)
+                self._entries[key] = (data, size)
+                self.current_bytes += size
+                while self.current_bytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+            return data.copy(deep=False)
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def log_stats(self):
+        logger.info(f"Data cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+                    f"{len(self._entries)} entries, {self.current_bytes / 1024 ** 2:.1f} MB")
+
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+data_cache = DataCache(DATA_CACHE_MAX_MB * 1024 ** 2)
@@ -1,64 +1,244 @@
 import os
-import yfinance as yf
+import time
 import pandas as pd
-from datetime import datetime, timedelta
-from config.config import TICKERS, INTERVALS
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from config.config import (TICKERS, INTERVALS, DATA_STORAGE_FORMAT, DATA_SYNC_MODE, DOWNLOAD_WORKERS,
+                           DOWNLOAD_BATCH_SIZE, DOWNLOAD_RETRIES, DOWNLOAD_BACKOFF, RESAMPLE_INTERVALS, OFFLINE_MODE)
+from utils.data_cache import data_cache, file_mtime
+from utils.providers import YFinanceProvider
+from utils.storage import DATA_DIRECTORY, CsvStorage, get_storage, migrate_csv, normalize_data
 import logging
 
-# Настройка логирования для yfinance на уровне ошибок
-logging.getLogger('yfinance').setLevel(logging.ERROR)
-
 logger = logging.getLogger(__name__)
 
+# Интервалы, которые строятся из сохраненных баров более мелкого интервала с той же глубиной истории.
+# 1h не строится из 5m: Yahoo Finance отдает 5m только за 60 дней, а 1h - за 730
+RESAMPLE_SOURCES = {
+    '15m': '5m',
+    '30m': '5m',
+    '1wk': '1d',
+    '1mo': '1d'
+}
+# Правила pandas для resample: недели начинаются с понедельника, месяцы - с первого числа, как у Yahoo Finance
+RESAMPLE_RULES = {
+    '15m': '15min',
+    '30m': '30min',
+    '1wk': 'W-MON',
+    '1mo': 'MS'
+}
+EXCHANGE_TIMEZONE = 'America/New_York'
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+
 def get_start_date(interval):
     if INTERVALS[interval] is None:
         return None
-    return datetime.now() - timedelta(days=INTERVALS[interval])
+    return datetime.now(timezone.utc) - timedelta(days=INTERVALS[interval])
 
-def download_data(ticker, interval):
+def fetch_with_retry(provider, tickers, interval, start, end, retries=DOWNLOAD_RETRIES, backoff=DOWNLOAD_BACKOFF):
+    """Запрашивает данные у провайдера, повторяя запрос с экспоненциальной задержкой при ошибках"""
+    for attempt in range(retries + 1):
+        try:
+            return provider.fetch(tickers, interval, start=start, end=end)
+        except Exception as e:
+            if attempt == retries:
+                logger.error(f"Failed to download data for {', '.join(tickers)} with interval {interval}: {e}")
+                return {}
+            delay = backoff * 2 ** attempt
+            logger.warning(f"Download of {', '.join(tickers)} ({interval}) failed: {e}, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def download_data(ticker, interval, provider=None):
     start_date = get_start_date(interval)
-    end_date = datetime.now()
+    end_date = datetime.now(timezone.utc)
     logger.info(f"Downloading data for {ticker} from {start_date} to {end_date} with interval {interval}")
-    try:
-        data = yf.download(ticker, start=start_date, end=end_date, interval=interval, progress=False)
-        if data.empty:
-            raise ValueError(f"No data for {ticker} with interval {interval}")
-    except Exception as e:
-        logger.error(f"Failed to download data for {ticker} with interval {interval}: {e}")
+    data = fetch_with_retry(provider or YFinanceProvider(), [ticker], interval, start_date, end_date).get(ticker)
+    if data is None or data.empty:
+        logger.error(f"No data for {ticker} with interval {interval}")
         return None
     return data
 
-def save_data(ticker, interval, data):
-    directory = os.path.join('data', 'historical_data', interval)
-    os.makedirs(directory, exist_ok=True)
-    file_path = os.path.join(directory, f"{ticker}_{interval}.csv")
-    data.to_csv(file_path)
+def save_data(ticker, interval, data, data_directory=DATA_DIRECTORY):
+    storage = get_storage(DATA_STORAGE_FORMAT, data_directory)
+    file_path = storage.write(ticker, interval, normalize_data(data))
     logger.info(f"Data for {ticker} saved to {file_path}")
     return file_path
 
+def load_cached_data(ticker, interval, data_directory=DATA_DIRECTORY):
+    """Загружает сохраненные данные без скачивания, CSV при необходимости переносится в формат хранения.
+
+    Данные кэшируются в пределах процесса, повторные вызовы возвращают копию из кэша.
+    """
+    storage = get_storage(DATA_STORAGE_FORMAT, data_directory)
+    migrated = None
+    if not storage.exists(ticker, interval):
+        migrated = migrate_csv(ticker, interval, storage)
+        if migrated is None:
+            return None
+
+    path = storage.path(ticker, interval)
+    key = (ticker, interval, os.path.abspath(data_directory), file_mtime(path))
+
+    def read():
+        if migrated is not None:
+            return migrated
+        logger.info(f"Loading data from {path}")
+        return storage.read(ticker, interval)
+
+    return data_cache.get(key, read)
+
+def resample_ohlcv(data, interval):
+    """Строит бары interval из более мелких баров OHLCV.
+
+    Open - первое значение, high - максимум, low - минимум, close - последнее, volume - сумма.
+    Внутридневные бары группируются во времени биржи (EXCHANGE_TIMEZONE), поэтому переход на летнее время
+    не сдвигает границы, и отсчитываются от открытия сессии в 9:30. Дневные бары хранятся на полночь
+    по UTC, поэтому недели и месяцы группируются по дате в UTC: при переводе во время биржи бар
+    попал бы в предыдущий день. Интервалы без исходных баров (ночь, выходные) отбрасываются.
+    Возвращает данные с индексом в UTC.
+    """
+    rule = RESAMPLE_RULES[interval]
+    aggregation = {column: 'last' for column in data.columns}
+    aggregation.update({column: function for column, function in
+                        (('open', 'first'), ('high', 'max'), ('low', 'min'), ('close', 'last'), ('volume', 'sum'))
+                        if column in data.columns})
+
+    if interval in ('1wk', '1mo'):
+        grouper = data.tz_convert('UTC').resample(rule, label='left', closed='left')
+    else:
+        # Границы баров выравниваются по открытию сессии: для 30m это 9:30, 10:00, ...
+        grouper = data.tz_convert(EXCHANGE_TIMEZONE).resample(rule, offset=SESSION_OPEN % pd.Timedelta(rule))
+    counts = grouper['close'].count()
+    resampled = grouper.agg(aggregation)[counts > 0]
+    resampled.index = resampled.index.tz_convert('UTC').as_unit('ns')
+    resampled.index.name = data.index.name
+    return resampled
+
+def derive_data(ticker, interval, data_directory=DATA_DIRECTORY):
+    """Строит и сохраняет бары interval из сохраненных баров RESAMPLE_SOURCES[interval]. None, если исходных данных нет"""
+    source = load_cached_data(ticker, RESAMPLE_SOURCES[interval], data_directory)
+    if source is None or source.empty:
+        return None
+    data = resample_ohlcv(source, interval)
+    save_data(ticker, interval, data, data_directory)
+    return data
+
+def has_cached_data(ticker, interval, data_directory=DATA_DIRECTORY):
+    storage = get_storage(DATA_STORAGE_FORMAT, data_directory)
+    return storage.exists(ticker, interval) or CsvStorage(data_directory).exists(ticker, interval)
+
 def load_data(ticker, interval):
-    file_path = os.path.join('data', 'historical_data', interval, f"{ticker}_{interval}.csv")
-    if not os.path.exists(file_path):
-        logger.info(f"Data file {file_path} not found, downloading data...")
+    """Сохраненные данные тикера, при их отсутствии - скачанные. С OFFLINE_MODE не скачивает и возвращает None"""
+    data = load_cached_data(ticker, interval)
+    if data is None and RESAMPLE_INTERVALS and interval in RESAMPLE_SOURCES:
+        data = derive_data(ticker, interval)
+    if data is None and OFFLINE_MODE:
+        logger.warning("Offline mode: no saved data for %s (%s), skipping download", ticker, interval)
+        return None
+    if data is None:
+        logger.info(f"Data for {ticker} ({interval}) not found, downloading data...")
         data = download_data(ticker, interval)
         if data is not None:
+            data = normalize_data(data)
             save_data(ticker, interval, data)
-    else:
-        logger.info(f"Loading data from {file_path}")
-        data = pd.read_csv(file_path, index_col=0, parse_dates=True)
-        data.columns = data.columns.str.strip().str.lower()  # Преобразуем заголовки столбцов в нижний регистр
     return data
 
-def download_all_data():
+def migrate_all_data(data_directory=DATA_DIRECTORY):
+    """Переносит все существующие CSV файлы в текущий формат хранения"""
+    storage = get_storage(DATA_STORAGE_FORMAT, data_directory)
     for ticker in TICKERS:
         for interval in INTERVALS:
-            file_path = os.path.join('data', 'historical_data', interval, f"{ticker}_{interval}.csv")
-            if not os.path.exists(file_path):
-                data = download_data(ticker, interval)
-                if data is not None:
-                    save_data(ticker, interval, data)
+            if not storage.exists(ticker, interval):
+                migrate_csv(ticker, interval, storage)
+
+def _sync_batch(provider, tickers, interval, cached, end, retries, backoff, data_directory):
+    """Скачивает недостающие бары для группы тикеров одного интервала и сохраняет их"""
+    lookback_start = get_start_date(interval)
+    last_timestamps = [cached[ticker].index[-1] for ticker in tickers if ticker in cached]
+    if len(last_timestamps) == len(tickers):
+        # Все тикеры уже сохранены: запрашиваем только хвост начиная с самого раннего последнего бара
+        start = min(last_timestamps).to_pydatetime()
+        if lookback_start is not None:
+            start = max(start, lookback_start)
+    else:
+        start = lookback_start
+
+    logger.info(f"Downloading {len(tickers)} tickers ({interval}) from {start} to {end}")
+    fetched = fetch_with_retry(provider, tickers, interval, start, end, retries, backoff)
+
+    updated = []
+    for ticker in tickers:
+        data = fetched.get(ticker)
+        if data is None or data.empty:
+            if ticker not in cached:
+                logger.error(f"No data for {ticker} with interval {interval}")
+            continue
+        data = normalize_data(data)
+        if ticker in cached:
+            # Последний сохраненный бар мог быть неполным, поэтому новые данные имеют приоритет
+            data = pd.concat([cached[ticker], data])
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+        save_data(ticker, interval, data, data_directory)
+        updated.append(ticker)
+    return updated
+
+def sync_data(tickers=TICKERS, intervals=INTERVALS, provider=None, mode=DATA_SYNC_MODE, max_workers=DOWNLOAD_WORKERS,
+              batch_size=DOWNLOAD_BATCH_SIZE, retries=DOWNLOAD_RETRIES, backoff=DOWNLOAD_BACKOFF, data_directory=DATA_DIRECTORY):
+    """Синхронизирует сохраненные данные с провайдером.
+
+    mode='missing' скачивает только отсутствующие файлы, mode='incremental' дополнительно докачивает
+    бары после последнего сохраненного. Запросы объединяются в пакеты по batch_size тикеров одного
+    интервала и выполняются в пуле из max_workers потоков. Возвращает список обновленных (ticker, interval).
+
+    С RESAMPLE_INTERVALS интервалы из RESAMPLE_SOURCES не скачиваются, если их исходный интервал тоже
+    синхронизируется: они строятся из сохраненных баров после загрузки (заново при обновлении источника).
+    """
+    if mode not in ('missing', 'incremental'):
+        raise ValueError(f"Неизвестный режим синхронизации данных: {mode}")
+    provider = provider or YFinanceProvider()
+    end = datetime.now(timezone.utc)
+    derived = [interval for interval in intervals
+               if RESAMPLE_INTERVALS and RESAMPLE_SOURCES.get(interval) in intervals]
+
+    batches = []
+    for interval in intervals:
+        if interval in derived:
+            continue
+        cached = {}
+        pending = []
+        for ticker in tickers:
+            if not has_cached_data(ticker, interval, data_directory):
+                pending.append(ticker)
+            elif mode == 'incremental':
+                data = load_cached_data(ticker, interval, data_directory)
+                if data is not None and not data.empty:
+                    cached[ticker] = data
+                    pending.append(ticker)
             else:
-                logger.info(f"Data for {ticker} ({interval}) already exists in {file_path}")
+                logger.info(f"Data for {ticker} ({interval}) already exists")
+
+        # Новые тикеры и докачка хвостов идут отдельными пакетами, у них разные даты начала
+        for group in ([ticker for ticker in pending if ticker not in cached], [ticker for ticker in pending if ticker in cached]):
+            for i in range(0, len(group), batch_size):
+                batches.append((group[i:i + batch_size], interval, cached))
+
+    updated = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_sync_batch, provider, batch, interval, cached, end, retries, backoff, data_directory)
+                   for batch, interval, cached in batches]
+        for future, (_, interval, _) in zip(futures, batches):
+            updated.extend((ticker, interval) for ticker in future.result())
+
+    updated_sources = set(updated)
+    for interval in derived:
+        for ticker in tickers:
+            if (ticker, RESAMPLE_SOURCES[interval]) in updated_sources or not has_cached_data(ticker, interval, data_directory):
+                if derive_data(ticker, interval, data_directory) is not None:
+                    updated.append((ticker, interval))
+    return updated
+
+def download_all_data(provider=None):
+    return sync_data(provider=provider)
 
 if __name__ == "__main__":
     download_all_data()
@@ -1,17 +1,86 @@
+import atexit
 import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+from contextlib import contextmanager
+from config.config import LOG_LEVEL
 
-def setup_logging(log_file):
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_queue_handler = None
+
+def setup_logging(log_file, level=LOG_LEVEL):
+    """Настраивает асинхронное логирование: вызывающий код только кладет запись в очередь (QueueHandler),
+    а запись в файл и на консоль выполняет отдельный поток (QueueListener).
+
+    Процессы пула пишут в тот же лог через отдельную очередь, см. worker_logging().
+    Возвращает QueueListener, его нужно остановить через stop_logging() в конце программы.
+    """
+    global _listener, _queue_handler
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    logging.basicConfig(
-        filename=log_file,
-        filemode='w',  # 'w' for overwriting log file each run, 'a' for appending
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    stop_logging()
 
+    file_handler = logging.FileHandler(log_file, mode='w')  # 'w' for overwriting log file each run, 'a' for appending
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
     console = logging.StreamHandler()
     console.setLevel(logging.ERROR)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    console.setFormatter(formatter)
-    logging.getLogger('').addHandler(console)
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger('')
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Отключает очередь от корневого логгера, дописывает оставшиеся записи и закрывает файлы логов"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger('').removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+@contextmanager
+def worker_logging():
+    """Очередь логов для процессов пула на время работы пула.
+
+    Возвращает initargs для init_worker_logging (initializer пула): очередь multiprocessing.Manager
+    и уровень логирования. Записи из очереди пишут те же обработчики, что и в setup_logging().
+    Если логирование не настроено, очередь не создается и процессы пула логируют по умолчанию.
+    """
+    if _listener is None:
+        yield None, None
+        return
+    with multiprocessing.Manager() as manager:
+        log_queue = manager.Queue(-1)
+        listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+        listener.start()
+        try:
+            yield log_queue, logging.getLogger('').level
+        finally:
+            listener.stop()
+
+def init_worker_logging(log_queue, level):
+    """Initializer процесса пула: записи корневого логгера передаются в очередь из worker_logging()"""
+    if log_queue is None:
+        return
+    root = logging.getLogger('')
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+atexit.register(stop_logging)
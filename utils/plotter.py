@@ -1,16 +1,59 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.io as pio
 import logging
+from config.config import PLOT_MAX_POINTS, PLOT_PLOTLYJS, PLOT_WORKERS
+from utils.data_loader import load_cached_data
+from utils.logger import worker_logging, init_worker_logging
 
 logger = logging.getLogger(__name__)
 
+# С этого количества точек линия рисуется через WebGL (Scattergl), SVG заметно тормозит на больших рядах
+WEBGL_MIN_POINTS = 1000
+
+def minmax_indices(values, max_points=PLOT_MAX_POINTS, keep=()):
+    """Номера баров для прореживания линии с сохранением формы.
+
+    Ряд делится на max_points // 2 корзин, из каждой берутся бары с минимумом и максимумом,
+    поэтому пики и провалы остаются на графике. Первый, последний бар и бары keep (сделки)
+    сохраняются всегда. max_points=0 или короткий ряд - все бары.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if max_points <= 0 or n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 2)
+    size = -(-n // buckets)
+    lows = np.full(buckets * size, np.inf)
+    highs = np.full(buckets * size, -np.inf)
+    lows[:n] = np.where(np.isnan(values), np.inf, values)
+    highs[:n] = np.where(np.isnan(values), -np.inf, values)
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate((offsets + lows.reshape(buckets, size).argmin(axis=1),
+                              offsets + highs.reshape(buckets, size).argmax(axis=1),
+                              [0, n - 1], np.asarray(keep, dtype=np.int64)))
+    return np.unique(indices[(indices >= 0) & (indices < n)])
+
+def price_trace(index, close, name, keep=(), max_points=PLOT_MAX_POINTS):
+    """Линия цены, прореженная minmax_indices(), для больших рядов - Scattergl"""
+    close = np.asarray(close, dtype=np.float64)
+    points = minmax_indices(close, max_points, keep)
+    trace = go.Scattergl if len(points) > WEBGL_MIN_POINTS else go.Scatter
+    return trace(x=index[points], y=close[points], name=name, line=dict(color='blue'))
+
+def write_plot(fig, file_path):
+    """Сохраняет график в HTML. plotly.js подключается по PLOT_PLOTLYJS: 'directory' - один файл
+    plotly.min.js рядом с графиками, 'cdn' - из сети, True - встроенный в каждый файл"""
+    pio.write_html(fig, file=file_path, auto_open=False, include_plotlyjs=PLOT_PLOTLYJS)
+
 def save_plot_as_html(data, signals, title, file_path):
     fig = go.Figure()
 
-    trace_data = go.Scatter(x=data.index, y=data['Close'], name=title.split()[2], line=dict(color='blue'))
-    fig.add_trace(trace_data)
+    keep = data.index.get_indexer([signal[0] for signal in signals])
+    fig.add_trace(price_trace(data.index, data['Close'].to_numpy(), title.split()[2], keep))
 
     long_open = [signal for signal in signals if signal[1] == 'buy' and signal[2] == 'Long']
     long_close = [signal for signal in signals if signal[1] == 'sell' and signal[2] == 'Long']
@@ -34,19 +77,15 @@ def save_plot_as_html(data, signals, title, file_path):
         yaxis_title="Price"
     )
 
-    pio.write_html(fig, file=file_path, auto_open=False)
+    write_plot(fig, file_path)
 
 def load_stock_data(tickers, data_directory, interval):
     stock_data = {}
     for ticker in tickers:
-        file_path = os.path.join(data_directory, interval, f"{ticker}_{interval}.csv")
-        if os.path.exists(file_path):
-            data = pd.read_csv(file_path, index_col=0, parse_dates=True)
-            data.columns = data.columns.str.strip().str.lower()
-            if 'close' not in data.columns:
-                continue
-            data.index = pd.to_datetime(data.index, utc=True)
-            stock_data[ticker] = data
+        data = load_cached_data(ticker, interval, data_directory)
+        if data is None or 'close' not in data.columns:
+            continue
+        stock_data[ticker] = data
     return stock_data
 
 def create_price_plots(stock_data, trades_df, strategy_name, interval):
@@ -55,7 +94,10 @@ def create_price_plots(stock_data, trades_df, strategy_name, interval):
             logger.error("Trades DataFrame is empty. Cannot create plots.")
             return
 
-        if trades_df['Date'].str.contains('-').any():
+        if not pd.api.types.is_string_dtype(trades_df['Date']):
+            # Журнал сделок стратегии уже содержит даты, переводим их в UTC как и данные цен
+            trades_df['Date'] = pd.to_datetime(trades_df['Date'], utc=True)
+        elif trades_df['Date'].str.contains('-').any():
             trades_df['Date'] = pd.to_datetime(trades_df['Date'], format='%d.%m.%Y %H:%M:%S%z', utc=True, dayfirst=True)
         else:
             trades_df['Date'] = pd.to_datetime(trades_df['Date'], format='%d.%m.%Y %H:%M:%S', dayfirst=True)
@@ -63,36 +105,53 @@ def create_price_plots(stock_data, trades_df, strategy_name, interval):
         logger.error(f"Error parsing dates: {e}")
         return
 
-    for ticker, data in stock_data.items():
-        fig = go.Figure()
-
-        trace_data = go.Scatter(x=data.index, y=data['close'], name=ticker, line=dict(color='blue'))
-        fig.add_trace(trace_data)
+    plots_directory = os.path.join('data', 'results_of_strategies', strategy_name, interval, 'plots')
+    os.makedirs(plots_directory, exist_ok=True)
 
+    tasks = []
+    for ticker, data in stock_data.items():
         ticker_trades = trades_df[trades_df['Ticker'] == ticker]
         if ticker_trades.empty:
             logger.warning(f"No trades found for ticker {ticker}. Skipping plot.")
             continue
+        output_file = os.path.join(plots_directory, f"{ticker}_price_plot.html")
+        tasks.append((ticker, data, ticker_trades, interval, output_file))
+
+    if PLOT_WORKERS == 1 or len(tasks) <= 1:
+        for task in tasks:
+            plot_ticker_trades(task)
+    else:
+        # Графики тикеров независимы, поэтому строятся параллельно в пуле процессов
+        with worker_logging() as log_args, \
+                ProcessPoolExecutor(max_workers=PLOT_WORKERS, initializer=init_worker_logging, initargs=log_args) as executor:
+            list(executor.map(plot_ticker_trades, tasks))
+
+def plot_ticker_trades(task):
+    """Строит и сохраняет график цены одного тикера с отметками сделок, возвращает путь к файлу"""
+    ticker, data, ticker_trades, interval, output_file = task
+    fig = go.Figure()
 
-        long_open = ticker_trades[(ticker_trades['Trade Type'] == 'Long') & (ticker_trades['Action'] == 'Open')]
-        long_close = ticker_trades[(ticker_trades['Trade Type'] == 'Long') & (ticker_trades['Action'] == 'Close')]
-        short_open = ticker_trades[(ticker_trades['Trade Type'] == 'Short') & (ticker_trades['Action'] == 'Open')]
-        short_close = ticker_trades[(ticker_trades['Trade Type'] == 'Short') & (ticker_trades['Action'] == 'Close')]
+    # Бары сделок сохраняются при прореживании, чтобы отметки лежали на линии цены
+    keep = data.index.get_indexer(ticker_trades['Date'])
+    fig.add_trace(price_trace(data.index, data['close'].to_numpy(), ticker, keep))
 
-        marker_size = 13
+    long_open = ticker_trades[(ticker_trades['Trade Type'] == 'Long') & (ticker_trades['Action'] == 'Open')]
+    long_close = ticker_trades[(ticker_trades['Trade Type'] == 'Long') & (ticker_trades['Action'] == 'Close')]
+    short_open = ticker_trades[(ticker_trades['Trade Type'] == 'Short') & (ticker_trades['Action'] == 'Open')]
+    short_close = ticker_trades[(ticker_trades['Trade Type'] == 'Short') & (ticker_trades['Action'] == 'Close')]
 
-        fig.add_trace(go.Scatter(x=long_open['Date'], y=long_open['Price'], mode='markers', marker_symbol='triangle-up', marker_color='green', marker_size=marker_size, name=f'{ticker} Long Open'))
-        fig.add_trace(go.Scatter(x=long_close['Date'], y=long_close['Price'], mode='markers', marker_symbol='cross', marker_color='green', marker_size=marker_size, name=f'{ticker} Long Close'))
-        fig.add_trace(go.Scatter(x=short_open['Date'], y=short_open['Price'], mode='markers', marker_symbol='triangle-down', marker_color='red', marker_size=marker_size, name=f'{ticker} Short Open'))
-        fig.add_trace(go.Scatter(x=short_close['Date'], y=short_close['Price'], mode='markers', marker_symbol='cross', marker_color='red', marker_size=marker_size, name=f'{ticker} Short Close'))
+    marker_size = 13
 
-        fig.update_layout(
-            title=f"Price of {ticker} Over Time ({interval})",
-            xaxis_title="Date",
-            yaxis_title="Price"
-        )
+    fig.add_trace(go.Scatter(x=long_open['Date'], y=long_open['Price'], mode='markers', marker_symbol='triangle-up', marker_color='green', marker_size=marker_size, name=f'{ticker} Long Open'))
+    fig.add_trace(go.Scatter(x=long_close['Date'], y=long_close['Price'], mode='markers', marker_symbol='cross', marker_color='green', marker_size=marker_size, name=f'{ticker} Long Close'))
+    fig.add_trace(go.Scatter(x=short_open['Date'], y=short_open['Price'], mode='markers', marker_symbol='triangle-down', marker_color='red', marker_size=marker_size, name=f'{ticker} Short Open'))
+    fig.add_trace(go.Scatter(x=short_close['Date'], y=short_close['Price'], mode='markers', marker_symbol='cross', marker_color='red', marker_size=marker_size, name=f'{ticker} Short Close'))
 
-        plots_directory = os.path.join('data', 'results_of_strategies', strategy_name, interval, 'plots')
-        os.makedirs(plots_directory, exist_ok=True)
-        output_file = os.path.join(plots_directory, f"{ticker}_price_plot.html")
-        pio.write_html(fig, file=output_file, auto_open=False)
+    fig.update_layout(
+        title=f"Price of {ticker} Over Time ({interval})",
+        xaxis_title="Date",
+        yaxis_title="Price"
+    )
+
+    write_plot(fig, output_file)
+    return output_file
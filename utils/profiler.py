@@ -0,0 +1,166 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+import pandas as pd
+from config.config import PROFILE_MEMORY
+
+logger = logging.getLogger(__name__)
+
+REPORT_PATH = os.path.join('logs', 'run_report.json')
+PROFILE_DIRECTORY = 'logs'
+KEYS = ('strategy', 'ticker', 'interval')
+
+def max_rss_mb():
+    """Пиковый объем памяти процесса (RSS) с момента запуска в МБ, None - если недоступен"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS - байты
+    return max_rss / 1024 ** 2 if sys.platform == 'darwin' else max_rss / 1024
+
+class StageProfiler:
+    """Замер этапов запуска: время (wall и CPU) и пиковая память для каждой записи (этап, стратегия, тикер, интервал).
+
+    stage() - контекстный менеджер этапа, context() задает стратегию, тикер и интервал для вложенных этапов.
+    Время этапа включает вложенные этапы, при exclusive=True - без них.
+    Пиковая память этапа (прирост относительно начала этапа) считается через tracemalloc только при memory=True,
+    иначе для каждой записи сохраняется пиковый RSS процесса (max_rss_mb), он не уменьшается между этапами.
+    """
+
+    def __init__(self, memory=PROFILE_MEMORY):
+        self.memory = memory
+        self.records = []
+        self._context = {}
+        self._peaks = []  # Пиковая память открытых этапов (tracemalloc), от внешнего к вложенному
+        self._tracing = False  # tracemalloc запущен этим объектом и останавливается после внешнего этапа
+        self._nested = []  # Время (wall, CPU) вложенных этапов для каждого открытого этапа
+
+    @contextmanager
+    def context(self, **keys):
+        previous = self._context
+        self._context = {**previous, **keys}
+        try:
+            yield
+        finally:
+            self._context = previous
+
+    @contextmanager
+    def stage(self, name, exclusive=False, **keys):
+        record = {"stage": name, **{key: None for key in KEYS}, **self._context, **keys}
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+            start_memory = current
+        self._nested.append([0.0, 0.0])
+        start, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+            nested_wall, nested_cpu = self._nested.pop()
+            if self._nested:
+                self._nested[-1][0] += wall
+                self._nested[-1][1] += cpu
+            record["wall_s"] = wall - nested_wall if exclusive else wall
+            record["cpu_s"] = cpu - nested_cpu if exclusive else cpu
+            record["peak_mb"] = None
+            if self.memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    # Пик вложенного этапа учитывается и во внешнем этапе
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                elif self._tracing:
+                    tracemalloc.stop()
+                    self._tracing = False
+                record["peak_mb"] = (peak - start_memory) / 1024 ** 2
+            record["max_rss_mb"] = max_rss_mb()
+            self.records.append(record)
+
+    def drain(self):
+        """Возвращает накопленные записи и очищает их (для передачи из процесса пула)"""
+        records, self.records = self.records, []
+        return records
+
+    def extend(self, records):
+        self.records.extend(records)
+
+    def clear(self):
+        self.records = []
+
+    def frame(self):
+        return pd.DataFrame.from_records(self.records, columns=['stage', *KEYS, 'wall_s', 'cpu_s', 'peak_mb', 'max_rss_mb'])
+
+    def summary(self):
+        """Итоги по этапам в порядке первого появления: число записей, суммарное время, пиковая память"""
+        frame = self.frame()
+        summary = frame.groupby('stage', sort=False).agg(
+            count=('stage', 'size'), wall_s=('wall_s', 'sum'), cpu_s=('cpu_s', 'sum'),
+            peak_mb=('peak_mb', 'max'), max_rss_mb=('max_rss_mb', 'max'))
+        return summary
+
+    def table(self):
+        """Таблица итогов по этапам для вывода в консоль"""
+        summary = self.summary()
+        if summary.empty:
+            return "No profiled stages."
+        summary['wall_pct'] = summary['wall_s'] / summary['wall_s'].sum() * 100
+        return summary.to_string(float_format=lambda value: f"{value:.3f}")
+
+    def save_report(self, path=REPORT_PATH, **extra):
+        """Сохраняет отчет запуска в JSON: итоги по этапам и все записи"""
+        summary = self.summary().reset_index()
+        report = {
+            **extra,
+            "max_rss_mb": max_rss_mb(),
+            "stages": _records(summary),
+            "records": _records(self.frame())
+        }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info("Run report saved to %s", path)
+        return report
+
+def _records(frame):
+    """Строки таблицы для JSON (NaN -> null)"""
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+@contextmanager
+def profile_call(path, limit=30):
+    """cProfile для блока кода: статистика сохраняется в path (.prof), топ функций по cumulative - в path.txt"""
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        profile.dump_stats(path)
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(limit)
+        with open(f"{path}.txt", 'w', encoding='utf-8') as f:
+            f.write(stream.getvalue())
+        logger.info("cProfile statistics saved to %s", path)
+
+def profile_path(job, directory=PROFILE_DIRECTORY):
+    strategy_name, interval, ticker = job
+    return os.path.join(directory, f"profile_{strategy_name}_{ticker}_{interval}.prof")
+
+profiler = StageProfiler()
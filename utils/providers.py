@@ -0,0 +1,48 @@
+import logging
+import pandas as pd
+import yfinance as yf
+
+# Настройка логирования для yfinance на уровне ошибок
+logging.getLogger('yfinance').setLevel(logging.ERROR)
+
+class DataProvider:
+    """Интерфейс источника рыночных данных"""
+
+    def fetch(self, tickers, interval, start=None, end=None):
+        """Возвращает словарь {ticker: DataFrame} с барами в диапазоне [start, end)"""
+        raise NotImplementedError("Should implement fetch()")
+
+    def fetch_info(self, ticker):
+        """Возвращает сведения о компании: словарь с ключами name, country, exchange"""
+        raise NotImplementedError("Should implement fetch_info()")
+
+class YFinanceProvider(DataProvider):
+    """Загрузка данных из Yahoo Finance одним пакетным запросом на несколько тикеров"""
+
+    def fetch(self, tickers, interval, start=None, end=None):
+        tickers = list(tickers)
+        data = yf.download(tickers, start=start, end=end, interval=interval, group_by='ticker', progress=False, threads=False)
+        if data is None or data.empty:
+            return {}
+
+        result = {}
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex):
+                level = next((i for i in range(data.columns.nlevels) if ticker in data.columns.get_level_values(i)), None)
+                if level is None:
+                    continue
+                frame = data.xs(ticker, axis=1, level=level)
+            else:
+                frame = data
+            frame = frame.dropna(how='all')
+            if not frame.empty:
+                result[ticker] = frame
+        return result
+
+    def fetch_info(self, ticker):
+        info = yf.Ticker(ticker).info
+        return {
+            "name": info.get("longName", "N/A"),
+            "country": info.get("country", "N/A"),
+            "exchange": info.get("exchange", "N/A")
+        }
@@ -0,0 +1,69 @@
+import logging
+import time
+import numpy as np
+from config.config import TICKERS, INTERVALS, INITIAL_BALANCE
+from utils.data_loader import load_data
+from utils.logger import setup_logging, stop_logging
+from utils.runner import STRATEGIES, get_strategy_class
+
+logger = logging.getLogger(__name__)
+
+# Параметры для воспроизведения: пошаговый режим Trendlines работает только с point_in_time
+REPLAY_PARAMS = {
+    "trendlines_with_breaks": {"slope_mode": "point_in_time"}
+}
+
+def replay(strategy_class, data, params=None):
+    """Подает бары data по одному в strategy.update() и считает те же сигналы пакетно.
+
+    Возвращает словарь streaming и batch - списки (timestamp, signal), и latency_us -
+    время update() на каждый бар в микросекундах.
+    """
+    frame = data.rename(columns=str.lower)
+    columns = [name for name in ('open', 'high', 'low', 'close') if name in frame.columns]
+    # Бары собираются заранее, чтобы в замер попадал только update()
+    bars = [dict(zip(columns, values)) for values in zip(*(frame[name].to_numpy(dtype=np.float64) for name in columns))]
+
+    strategy = strategy_class(data, INITIAL_BALANCE, params=params)
+    streaming = []
+    latency = np.empty(len(bars))
+    for i, bar in enumerate(bars):
+        start = time.perf_counter_ns()
+        signal = strategy.update(bar)
+        latency[i] = (time.perf_counter_ns() - start) / 1000
+        if signal is not None:
+            streaming.append((frame.index[i], signal))
+
+    batch = list(strategy_class(data, INITIAL_BALANCE, params=params).generate_signals())
+    return {"streaming": streaming, "batch": batch, "latency_us": latency}
+
+def verify_replay(strategy_class, data, params=None):
+    """replay() с проверкой: пошаговые сигналы должны совпадать с пакетными. Иначе AssertionError"""
+    result = replay(strategy_class, data, params)
+    streaming, batch = result["streaming"], result["batch"]
+    if streaming != batch:
+        mismatch = next((i for i, (a, b) in enumerate(zip(streaming, batch)) if a != b), min(len(streaming), len(batch)))
+        raise AssertionError(
+            f"{strategy_class.__name__}: сигналы расходятся с сигнала #{mismatch}: "
+            f"streaming {streaming[mismatch:mismatch + 1]}, batch {batch[mismatch:mismatch + 1]} "
+            f"(всего {len(streaming)} и {len(batch)})")
+    return result
+
+def main():
+    setup_logging('logs/replay.log')
+    for strategy_name in STRATEGIES:
+        strategy_class = get_strategy_class(strategy_name)
+        for interval in INTERVALS:
+            for ticker in TICKERS:
+                data = load_data(ticker, interval)
+                if data is None or data.empty:
+                    continue
+                result = verify_replay(strategy_class, data, REPLAY_PARAMS.get(strategy_name))
+                latency = result["latency_us"]
+                logger.info(f"{strategy_name} {ticker} {interval}: {len(result['streaming'])} signals match, "
+                            f"{len(latency)} bars, update() mean {latency.mean():.1f} us, "
+                            f"p50 {np.percentile(latency, 50):.1f} us, p99 {np.percentile(latency, 99):.1f} us")
+    stop_logging()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import os
 import pandas as pd
 import logging
-import yfinance as yf
-from config.config import INITIAL_BALANCE
+from strategies.trade_log import format_trades
+from utils.company_info import company_info_cache
 
 logger = logging.getLogger(__name__)
 
@@ -16,42 +16,45 @@ def save_trade_results(strategy_name, ticker, interval, results):
         logger.error("Trades DataFrame is empty.")
     else:
         logger.info(f"Trades DataFrame columns: {trades_df.columns}")
-        trades_df.to_csv(file_path, index=False)
+        format_trades(trades_df).to_csv(file_path, index=False)
         logger.info(f"Trade results for {ticker} saved to {file_path}")
 
 def get_company_info(ticker):
-    stock = yf.Ticker(ticker)
-    info = stock.info
-    return {
-        "name": info.get("longName", "N/A"),
-        "ticker": ticker,
-        "country": info.get("country", "N/A"),
-        "exchange": info.get("exchange", "N/A")
-    }
+    """Сведения о компании из локального кэша, без обращения к сети (заполняется company_info_cache.prefetch())"""
+    return company_info_cache.get(ticker)
 
-def calculate_results(trades_df):
-    if 'Balance' not in trades_df.columns:
-        logger.error("Missing 'Balance' column in trades DataFrame.")
-        return None
+def metrics_table(all_results):
+    """Таблица показателей (strategies.metrics) по тикерам из списка (тикер, results)"""
+    return pd.DataFrame.from_records([{"ticker": ticker, **results['metrics']} for ticker, results in all_results],
+                                     columns=["ticker"] + (list(all_results[0][1]['metrics']) if all_results else []))
 
-    initial_balance = INITIAL_BALANCE
-    final_balance = trades_df['Balance'].iloc[-1]
-    profit = final_balance - initial_balance
-    profit_percentage = (profit / initial_balance) * 100
-    num_trades = len(trades_df)
-    profitable_trades = trades_df[trades_df['Profit'] > 0]
-    percentage_profitable_trades = (len(profitable_trades) / num_trades) * 100 if num_trades > 0 else 0
-
-    return {
-        "initial_balance": initial_balance,
-        "final_balance": final_balance,
-        "profit": profit,
-        "profit_percentage": profit_percentage,
-        "num_trades": num_trades,
-        "percentage_profitable_trades": percentage_profitable_trades
-    }
+def write_metrics(f, metrics):
+    """Записывает показатели бэктеста в текстовый отчет"""
+    f.write(f"Initial balance: {metrics['initial_balance']:.2f}$\n")
+    f.write(f"Final Balance: {metrics['final_value']:.2f}$\n")
+    f.write("--------------------------------------------\n")
+    f.write(f"Profit: {metrics['profit']:.2f}$\n")
+    f.write(f"Profit Percentage: {metrics['return_pct']:.2f}%\n")
+    f.write(f"Annual return: {metrics['annual_return_pct']:.2f}%\n")
+    f.write(f"Annual volatility: {metrics['annual_volatility_pct']:.2f}%\n")
+    f.write(f"Sharpe ratio: {metrics['sharpe']:.2f}\n")
+    f.write(f"Sortino ratio: {metrics['sortino']:.2f}\n")
+    f.write(f"Max drawdown: {metrics['max_drawdown_pct']:.2f}% ({metrics['max_drawdown_bars']} bars)\n")
+    f.write(f"Exposure: {metrics['exposure_pct']:.2f}%\n")
+    f.write(f"Turnover: {metrics['turnover']:.2f}\n")
+    f.write("--------------------------------------------\n")
+    f.write(f"Number of trades: {metrics['num_trades']}\n")
+    f.write(f"Percentage of profitable trades: {metrics['win_rate_pct']:.2f}%\n")
+    f.write(f"Average trade return: {metrics['avg_trade_return_pct']:.2f}% "
+            f"(median {metrics['median_trade_return_pct']:.2f}%, std {metrics['std_trade_return_pct']:.2f}%)\n")
+    f.write(f"Best / worst trade: {metrics['best_trade_pct']:.2f}% / {metrics['worst_trade_pct']:.2f}%\n")
+    f.write(f"Profit factor: {metrics['profit_factor']:.2f}\n")
 
 def save_summary_results(all_results, strategy_name, interval):
+    """Сохраняет отчет results.txt и таблицу показателей metrics.csv по всем тикерам.
+
+    Показатели берутся из results['metrics'], посчитанных при бэктесте (utils.runner).
+    """
     directory = os.path.join('data', 'results_of_strategies', strategy_name, interval)
     os.makedirs(directory, exist_ok=True)
     summary_file = os.path.join(directory, 'results.txt')
@@ -61,23 +64,33 @@ def save_summary_results(all_results, strategy_name, interval):
     with open(summary_file, 'w') as f:
         for ticker, results in all_results:
             company_info = get_company_info(ticker)
-            results_summary = calculate_results(pd.DataFrame(results['trades']))
-            if results_summary is None:
-                continue
             f.write("============================================\n")
             f.write(f"Full company name: {company_info['name']}\n")
             f.write(f"Ticker: {company_info['ticker']}\n")
             f.write(f"Company country: {company_info['country']}\n")
             f.write(f"Company exchange: {company_info['exchange']}\n")
             f.write("--------------------------------------------\n")
-            f.write(f"Initial balance: {results_summary['initial_balance']:.2f}$\n")
-            f.write(f"Final Balance: {results_summary['final_balance']:.2f}$\n")
-            f.write("--------------------------------------------\n")
-            f.write(f"Profit: {results_summary['profit']:.2f}$\n")
-            f.write(f"Profit Percentage: {results_summary['profit_percentage']:.2f}%\n")
-            f.write("--------------------------------------------\n")
-            f.write(f"Number of trades: {results_summary['num_trades']}\n")
-            f.write(f"Percentage of profitable trades: {results_summary['percentage_profitable_trades']:.2f}%\n")
+            write_metrics(f, results['metrics'])
             f.write("============================================\n\n")
-    
+
+    metrics_table(all_results).to_csv(os.path.join(directory, 'metrics.csv'), index=False)
     logger.info(f"Summary results saved to {summary_file}")
+
+def save_portfolio_results(portfolio, strategy_name, interval):
+    """Сохраняет сделки, кривую стоимости и итоги портфельного бэктеста"""
+    directory = os.path.join('data', 'results_of_strategies', strategy_name, interval, 'portfolio')
+    os.makedirs(directory, exist_ok=True)
+
+    format_trades(portfolio['trades']).to_csv(os.path.join(directory, 'trades.csv'), index=False)
+    equity = portfolio['equity']
+    equity.to_csv(os.path.join(directory, 'equity.csv'), index_label='Date')
+
+    summary_file = os.path.join(directory, 'results.txt')
+    with open(summary_file, 'w') as f:
+        f.write("============================================\n")
+        f.write(f"Portfolio: {', '.join(portfolio['trades']['Ticker'].unique())}\n")
+        f.write("--------------------------------------------\n")
+        write_metrics(f, portfolio['metrics'])
+        f.write("============================================\n")
+
+    logger.info(f"Portfolio results saved to {directory}")
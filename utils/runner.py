@@ -0,0 +1,181 @@
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, nullcontext
+from config.config import INITIAL_BALANCE, WHOLE_SHARES_ONLY, BATCH_BACKTESTS, PORTFOLIO_POSITION_SIZE, INTRABAR_EXITS, PROFILE_JOB
+from strategies.batch import backtest_supertrend_batch
+from strategies.indicators import indicator_cache
+from strategies.metrics import performance_metrics
+from strategies.portfolio import TickerBook, simulate_portfolio
+from utils.data_cache import data_cache
+from utils.data_loader import load_data
+from utils.logger import worker_logging, init_worker_logging
+from utils.profiler import profiler, profile_call, profile_path
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = {
+    "supertrend": "SupertrendStrategy",
+    "trendlines_with_breaks": "TrendlinesWithBreaksStrategy"
+}
+
+# Стратегии с пакетным режимом: функция(datasets, initial_balance, whole_shares_only) -> {тикер: results}
+BATCH_STRATEGIES = {
+    "supertrend": backtest_supertrend_batch
+}
+
+def get_strategy_class(strategy_name):
+    module = importlib.import_module(f'strategies.{strategy_name}')
+    return getattr(module, STRATEGIES[strategy_name])
+
+def make_jobs(strategy_names, intervals, tickers):
+    """Список задач бэктеста (strategy_name, interval, ticker) в детерминированном порядке"""
+    return [(strategy_name, interval, ticker) for strategy_name in strategy_names for interval in intervals for ticker in tickers]
+
+def run_backtest_job(job, profile_job=PROFILE_JOB):
+    """Выполняет одну задачу бэктеста, возвращает (job, results, elapsed). results = None, если нет данных.
+
+    Этапы load, indicators, signals, simulation и metrics записываются в profiler процесса.
+    Задача, совпадающая с profile_job, выполняется под cProfile (utils.profiler.profile_call).
+    """
+    strategy_name, interval, ticker = job
+    start = time.perf_counter()
+    capture = profile_call(profile_path(job)) if profile_job is not None and tuple(profile_job) == job else nullcontext()
+    with capture, profiler.context(strategy=strategy_name, ticker=ticker, interval=interval):
+        with profiler.stage('load'):
+            data = load_data(ticker, interval)
+        if data is None or data.empty:
+            return job, None, time.perf_counter() - start
+
+        strategy_class = get_strategy_class(strategy_name)
+        strategy = strategy_class(data, INITIAL_BALANCE, WHOLE_SHARES_ONLY)
+        results = strategy.backtest(profiler)
+        with profiler.stage('metrics'):
+            results["metrics"] = performance_metrics(results["equity"], results["trades"], interval, INITIAL_BALANCE)
+    return job, results, time.perf_counter() - start
+
+def run_backtest_task(jobs):
+    """Выполняет задачи одного набора данных подряд, чтобы данные загружались в процессе один раз"""
+    outputs = [run_backtest_job(job) for job in jobs]
+    data_cache.log_stats()
+    indicator_cache.log_stats()
+    return outputs
+
+def run_batch_task(jobs):
+    """Выполняет задачи одной стратегии и интервала по всем тикерам сразу в пакетном режиме.
+
+    Время выполнения пакета делится между задачами поровну.
+    """
+    strategy_name, interval, _ = jobs[0]
+    start = time.perf_counter()
+    datasets = {}
+    with profiler.context(strategy=strategy_name, interval=interval):
+        for _, _, ticker in jobs:
+            with profiler.stage('load', ticker=ticker):
+                data = load_data(ticker, interval)
+            if data is not None and not data.empty:
+                datasets[ticker] = data
+        # Индикаторы, сигналы и симуляция пакета замеряются одним этапом на все тикеры
+        with profiler.stage('batch'):
+            batch_results = BATCH_STRATEGIES[strategy_name](datasets, INITIAL_BALANCE, WHOLE_SHARES_ONLY)
+        for ticker, results in batch_results.items():
+            with profiler.stage('metrics', ticker=ticker):
+                results["metrics"] = performance_metrics(results["equity"], results["trades"], interval, INITIAL_BALANCE)
+    elapsed = (time.perf_counter() - start) / len(jobs)
+    data_cache.log_stats()
+    indicator_cache.log_stats()
+    return [(job, batch_results.get(job[2]), elapsed) for job in jobs]
+
+def _run_task(task):
+    """Выполняет задачу и возвращает (результаты, записи profiler этого процесса)"""
+    function, jobs = task
+    outputs = function(jobs)
+    return outputs, profiler.drain()
+
+def _init_worker(log_queue, log_level):
+    init_worker_logging(log_queue, log_level)
+    # При fork процесс пула получает копию записей profiler родителя, они уже учтены
+    profiler.clear()
+
+def make_tasks(jobs, batch=False):
+    """Группирует задачи: пакетные стратегии - по (стратегия, интервал), остальные - по (интервал, тикер).
+
+    Пакетный режим проверяет уровни только по close, поэтому с INTRABAR_EXITS задачи выполняются по тикерам.
+    """
+    batch = batch and not INTRABAR_EXITS
+    tasks = {}
+    for job in jobs:
+        strategy_name, interval, ticker = job
+        if batch and strategy_name in BATCH_STRATEGIES:
+            tasks.setdefault((run_batch_task, strategy_name, interval), []).append(job)
+        else:
+            # Все стратегии одного тикера и интервала работают с одной загрузкой данных
+            tasks.setdefault((run_backtest_task, interval, ticker), []).append(job)
+    return [(key[0], task_jobs) for key, task_jobs in tasks.items()]
+
+def run_backtests(jobs, max_workers=None, batch=BATCH_BACKTESTS):
+    """Запускает задачи бэктеста параллельно в пуле процессов.
+
+    Результаты возвращаются в порядке задач независимо от порядка завершения.
+    max_workers=None использует все ядра, max_workers=1 выполняет задачи последовательно в текущем процессе.
+    batch=True запускает стратегии с пакетным режимом сразу по всем тикерам интервала.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    logger.info("Running %d backtest jobs with %d workers...", len(jobs), max_workers)
+    start = time.perf_counter()
+
+    tasks = make_tasks(jobs, batch)
+
+    outputs = {}
+    with ExitStack() as stack:
+        if max_workers == 1 or len(tasks) <= 1:
+            task_outputs = map(_run_task, tasks)
+        else:
+            # Очередь логов закрывается после остановки пула
+            log_args = stack.enter_context(worker_logging())
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=log_args))
+            task_outputs = executor.map(_run_task, tasks)
+
+        for task_output, records in task_outputs:
+            profiler.extend(records)
+            for job, job_results, elapsed in task_output:
+                outputs[job] = (job_results, elapsed)
+                strategy_name, interval, ticker = job
+                if job_results is None:
+                    logger.warning("No data for %s with interval %s, skipping...", ticker, interval)
+                else:
+                    logger.info("Backtest %s on %s with interval %s finished in %.3fs", strategy_name, ticker, interval, elapsed)
+
+    logger.info("All backtest jobs finished in %.3fs", time.perf_counter() - start)
+    return [(job,) + outputs[job] for job in jobs]
+
+def run_portfolio_backtest(strategy_name, interval, tickers, initial_balance=INITIAL_BALANCE,
+                           position_size=PORTFOLIO_POSITION_SIZE):
+    """Бэктест портфеля: одна стратегия по всем тикерам интервала с общим балансом.
+
+    Возвращает результаты simulate_portfolio() или None, если ни для одного тикера нет данных.
+    Уровни выхода проверяются по close на барах с сигналами, INTRABAR_EXITS здесь не применяется.
+    """
+    start = time.perf_counter()
+    strategy_class = get_strategy_class(strategy_name)
+    books = []
+    simulation_params = None
+    for ticker in tickers:
+        data = load_data(ticker, interval)
+        if data is None or data.empty:
+            logger.warning("No data for %s with interval %s, skipping in portfolio...", ticker, interval)
+            continue
+        strategy = strategy_class(data, initial_balance, WHOLE_SHARES_ONLY)
+        signals = strategy.generate_signals()
+        books.append(TickerBook(ticker, strategy.data.index, strategy.data['close'].to_numpy(), signals))
+        simulation_params = strategy.simulation_params()
+    if not books:
+        return None
+
+    results = simulate_portfolio(books, initial_balance, position_size, WHOLE_SHARES_ONLY, **simulation_params)
+    results["metrics"] = performance_metrics(results["equity"], results["trades"], interval, initial_balance)
+    logger.info("Portfolio backtest %s with interval %s on %d tickers finished in %.3fs",
+                strategy_name, interval, len(books), time.perf_counter() - start)
+    return results
@@ -0,0 +1,140 @@
+import importlib.util
+import logging
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATA_DIRECTORY = os.path.join('data', 'historical_data')
+
+def normalize_data(data):
+    """Приводит данные к единому виду: колонки в нижнем регистре, числовые значения, индекс в UTC"""
+    data = data.copy()
+    if isinstance(data.columns, pd.MultiIndex):
+        # Новые версии yfinance возвращают колонки (Price, Ticker)
+        data.columns = data.columns.get_level_values(0)
+    data.columns = data.columns.astype(str).str.strip().str.lower()
+    data = data.loc[:, ~data.columns.duplicated()]
+
+    index = pd.to_datetime(data.index, errors='coerce', utc=True, format='ISO8601').as_unit('ns')
+    data.index = index
+    data = data[~index.isna()]  # служебные строки заголовка в CSV от yfinance
+    data.index.name = 'datetime'
+    for column in data.columns:
+        data[column] = pd.to_numeric(data[column], errors='coerce').astype(np.float64)
+    return data.sort_index()
+
+class CsvStorage:
+    """Исходный формат хранения: CSV файл на каждый тикер и интервал"""
+    name = 'csv'
+    extension = '.csv'
+
+    def __init__(self, directory=DATA_DIRECTORY):
+        self.directory = directory
+
+    def path(self, ticker, interval):
+        return os.path.join(self.directory, interval, f"{ticker}_{interval}{self.extension}")
+
+    def exists(self, ticker, interval):
+        return os.path.exists(self.path(ticker, interval))
+
+    def read(self, ticker, interval):
+        data = pd.read_csv(self.path(ticker, interval), index_col=0)
+        return normalize_data(data)
+
+    def write(self, ticker, interval, data):
+        file_path = self.path(ticker, interval)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        data.to_csv(file_path)
+        return file_path
+
+class _ArrowStorage(CsvStorage):
+    """Базовый класс для форматов, которым нужна библиотека pyarrow"""
+
+    def __init__(self, directory=DATA_DIRECTORY):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError(f"Для формата хранения '{self.name}' требуется пакет pyarrow (pip install pyarrow).")
+        super().__init__(directory)
+
+class ParquetStorage(_ArrowStorage):
+    name = 'parquet'
+    extension = '.parquet'
+
+    def read(self, ticker, interval):
+        return pd.read_parquet(self.path(ticker, interval))
+
+    def write(self, ticker, interval, data):
+        file_path = self.path(ticker, interval)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        data.to_parquet(file_path)
+        return file_path
+
+class FeatherStorage(_ArrowStorage):
+    name = 'feather'
+    extension = '.feather'
+
+    def read(self, ticker, interval):
+        return pd.read_feather(self.path(ticker, interval)).set_index('datetime')
+
+    def write(self, ticker, interval, data):
+        file_path = self.path(ticker, interval)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        data.reset_index().to_feather(file_path)
+        return file_path
+
+class NpyStorage(CsvStorage):
+    """Каталог с массивами .npy на каждую колонку, читаемыми через memory-map.
+
+    index.npy содержит время в наносекундах UTC (int64), columns.npy - порядок колонок.
+    """
+    name = 'npy'
+    extension = '_npy'
+
+    def read(self, ticker, interval):
+        directory = self.path(ticker, interval)
+        columns = np.load(os.path.join(directory, 'columns.npy')).tolist()
+        nanoseconds = np.load(os.path.join(directory, 'index.npy'), mmap_mode='r')
+        index = pd.DatetimeIndex(np.asarray(nanoseconds).view('datetime64[ns]')).tz_localize('UTC')
+        arrays = {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode='r') for column in columns}
+        data = pd.DataFrame(arrays, index=index, columns=columns)
+        data.index.name = 'datetime'
+        return data
+
+    def write(self, ticker, interval, data):
+        directory = self.path(ticker, interval)
+        tmp_directory = directory + '.tmp'
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        np.save(os.path.join(tmp_directory, 'columns.npy'), np.array(list(data.columns), dtype=str))
+        np.save(os.path.join(tmp_directory, 'index.npy'), data.index.as_unit('ns').asi8)
+        for column in data.columns:
+            np.save(os.path.join(tmp_directory, f"{column}.npy"), data[column].to_numpy(dtype=np.float64))
+        # Подменяем каталог целиком, чтобы читатель не увидел частично записанные данные
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+        return directory
+
+STORAGE_BACKENDS = {
+    CsvStorage.name: CsvStorage,
+    ParquetStorage.name: ParquetStorage,
+    FeatherStorage.name: FeatherStorage,
+    NpyStorage.name: NpyStorage,
+}
+
+def get_storage(storage_format, directory=DATA_DIRECTORY):
+    if storage_format not in STORAGE_BACKENDS:
+        raise ValueError(f"Неизвестный формат хранения данных: {storage_format}")
+    return STORAGE_BACKENDS[storage_format](directory)
+
+def migrate_csv(ticker, interval, storage):
+    """Однократно переносит CSV файл в формат storage, возвращает нормализованные данные или None"""
+    csv_storage = CsvStorage(storage.directory)
+    if not csv_storage.exists(ticker, interval):
+        return None
+    data = csv_storage.read(ticker, interval)
+    if storage.name != csv_storage.name:
+        file_path = storage.write(ticker, interval, data)
+        logger.info(f"Migrated {csv_storage.path(ticker, interval)} to {file_path}")
+    return data
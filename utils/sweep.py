@@ -0,0 +1,123 @@
+import itertools
+import logging
+import os
+import time
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from config.config import TICKERS, INTERVALS, INITIAL_BALANCE, WHOLE_SHARES_ONLY, MAX_WORKERS, SWEEP_GRIDS
+from strategies.metrics import trades_equity, performance_metrics
+from utils.data_loader import load_data
+from utils.logger import setup_logging, stop_logging, worker_logging, init_worker_logging
+from utils.runner import get_strategy_class
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIRECTORY = os.path.join('data', 'results_of_strategies')
+
+def expand_grid(grid):
+    """Все комбинации параметров сетки {имя: [значения]} в виде списка словарей.
+
+    Порядок детерминирован: последний параметр меняется быстрее всего, поэтому комбинации
+    с одинаковыми параметрами индикаторов (первые в сетке) идут подряд и берут индикаторы из кэша.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def summarize(strategy, interval):
+    """Итоговые показатели одного прогона для таблицы результатов (performance_metrics)"""
+    trades = strategy.trades.to_frame()
+    equity = trades_equity(strategy.data.index, strategy.data['close'].to_numpy(), trades, strategy.initial_balance)
+    return performance_metrics(equity, trades, interval, strategy.initial_balance)
+
+def run_sweep_task(task):
+    """Прогоняет часть сетки параметров на одном наборе данных, возвращает список строк результатов"""
+    strategy_name, interval, ticker, param_sets = task
+    data = load_data(ticker, interval)
+    if data is None or data.empty:
+        return []
+
+    strategy_class = get_strategy_class(strategy_name)
+
+    rows = []
+    for params in param_sets:
+        strategy = strategy_class(data, INITIAL_BALANCE, WHOLE_SHARES_ONLY, params)
+        try:
+            strategy.simulate_trading(strategy.generate_signals())
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Sweep {strategy_name} on {ticker} {interval} with {params} failed: {e}")
+            continue
+        rows.append({"strategy": strategy_name, "interval": interval, "ticker": ticker, **params, **summarize(strategy, interval)})
+    return rows
+
+def make_sweep_tasks(strategy_grids, intervals, tickers, chunk_size):
+    """Разбивает сетки на задачи (strategy_name, interval, ticker, param_sets) по chunk_size комбинаций"""
+    tasks = []
+    for strategy_name, grid in strategy_grids.items():
+        param_sets = expand_grid(grid)
+        if param_sets:
+            # Проверка имен параметров до запуска пула
+            get_strategy_class(strategy_name).resolve_params(param_sets[0])
+        for interval in intervals:
+            for ticker in tickers:
+                for start in range(0, len(param_sets), chunk_size):
+                    tasks.append((strategy_name, interval, ticker, param_sets[start:start + chunk_size]))
+    return tasks
+
+def rank_results(rows):
+    """Таблица результатов, отсортированная по доходности внутри каждого (стратегия, интервал, тикер)"""
+    table = pd.DataFrame(rows)
+    if table.empty:
+        return table
+    keys = ['strategy', 'interval', 'ticker']
+    table = table.sort_values(keys + ['return_pct'], ascending=[True, True, True, False], kind='stable')
+    table.insert(3, 'rank', table.groupby(keys).cumcount() + 1)
+    return table.reset_index(drop=True)
+
+def save_sweep_results(table, results_directory=RESULTS_DIRECTORY):
+    """Сохраняет таблицу в sweep.csv в каталоге результатов каждой стратегии и интервала"""
+    paths = []
+    for (strategy_name, interval), group in table.groupby(['strategy', 'interval'], sort=False):
+        directory = os.path.join(results_directory, strategy_name, interval)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'sweep.csv')
+        group.dropna(axis=1, how='all').to_csv(path, index=False)
+        logger.info(f"Sweep results for {strategy_name} {interval} saved to {path}")
+        paths.append(path)
+    return paths
+
+def run_sweep(strategy_grids, intervals, tickers, max_workers=None, chunk_size=64):
+    """Запускает перебор параметров в пуле процессов и возвращает ранжированную таблицу.
+
+    max_workers=None использует все ядра, max_workers=1 выполняет перебор в текущем процессе.
+    Каждая задача загружает данные один раз и прогоняет chunk_size комбинаций подряд.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    tasks = make_sweep_tasks(strategy_grids, intervals, tickers, chunk_size)
+    combinations = sum(len(task[3]) for task in tasks)
+    logger.info(f"Running parameter sweep: {combinations} runs in {len(tasks)} tasks with {max_workers} workers...")
+    start = time.perf_counter()
+
+    rows = []
+    with ExitStack() as stack:
+        if max_workers == 1 or len(tasks) <= 1:
+            task_rows = map(run_sweep_task, tasks)
+        else:
+            log_args = stack.enter_context(worker_logging())
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker_logging, initargs=log_args))
+            task_rows = executor.map(run_sweep_task, tasks)
+        for chunk in task_rows:
+            rows.extend(chunk)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Parameter sweep finished: {len(rows)} runs in {elapsed:.3f}s")
+    return rank_results(rows)
+
+def main():
+    setup_logging('logs/sweep.log')
+    table = run_sweep(SWEEP_GRIDS, INTERVALS, TICKERS, max_workers=MAX_WORKERS)
+    save_sweep_results(table)
+    stop_logging()
+
+if __name__ == "__main__":
+    main()